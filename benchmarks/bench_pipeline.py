@@ -0,0 +1,472 @@
+# Сквозной офлайн-бенчмарк режимов бота: на каждую сеть - локальная EVM-нода (eth-tester или anvil),
+# вместо https://li.quest/v1/quote - заглушка, отдающая рабочие transactionRequest на контракт-"мост".
+# N синтетических аккаунтов проходят режим целиком через main.run_mode; в отчёте tx/s, RPC-вызовов
+# на транзакцию, задержка event loop и память на аккаунт.
+# Ноды и заглушка работают в отдельных процессах, чтобы их CPU не попадал в замеры бота.
+#
+# Запуск из корня репозитория:
+#   python benchmarks/bench_pipeline.py --mode swap --accounts 50 --threads 10
+#   python benchmarks/bench_pipeline.py --mode circular --node anvil --quote-latency 0.3
+# Зависимости: eth-tester (pip install "eth-tester[py-evm]") или anvil из foundry в PATH
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+BENCH_MODES = ("swap", "circular", "withdraw", "balances")
+ACCOUNT_BALANCE_WEI = 10 * 10 ** 18
+BRIDGE_ADDRESS = "0x" + "b1" * 20
+# Рантайм-код "моста": принимает любой вызов с value и возвращает 42
+BRIDGE_CODE = "0x602a60005260206000f3"
+STARGATE_FEE_WEI = 3 * 10 ** 14
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+ETH_TESTER_DEFAULT_SENDER = "0x7E5F4552091A69125d5DfCb7b8C2659029395Bdf"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def to_rpc_json(value):
+    # Ответы eth-tester в формат настоящей ноды: числа и байты - hex-строки
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if isinstance(value, dict) or hasattr(value, "items"):
+        return {key: to_rpc_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_rpc_json(item) for item in value]
+    return value
+
+
+class RpcCounter:
+    def __init__(self):
+        self.requests = 0
+        self.calls = 0
+        self.methods: dict[str, int] = {}
+
+    def count(self, body):
+        self.requests += 1
+        for item in body if isinstance(body, list) else [body]:
+            self.calls += 1
+            method = item.get("method", "?")
+            self.methods[method] = self.methods.get(method, 0) + 1
+
+    def as_dict(self) -> dict:
+        return {"requests": self.requests, "calls": self.calls, "methods": self.methods}
+
+
+async def serve_chain(port: int, chain_id: int, spec_path: str, node: str):
+    with open(spec_path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    counter = RpcCounter()
+    app = web.Application(client_max_size=16 * 1024 ** 2)
+    anvil_process = None
+
+    if node == "eth-tester":
+        from eth_tester import EthereumTester, PyEVMBackend
+        from eth_tester.backends.pyevm.main import get_default_account_state
+        from web3 import EthereumTesterProvider, Web3
+
+        genesis_state = {
+            bytes.fromhex(address[2:]): get_default_account_state(overrides={"balance": spec["balance"]})
+            for address in spec["accounts"]
+        }
+        # eth-tester подставляет этот адрес в eth_call/eth_estimateGas без from - без баланса вызов падает
+        genesis_state[bytes.fromhex(ETH_TESTER_DEFAULT_SENDER[2:])] = get_default_account_state(
+            overrides={"balance": spec["balance"]}
+        )
+        genesis_state[bytes.fromhex(BRIDGE_ADDRESS[2:])] = get_default_account_state(
+            overrides={"code": bytes.fromhex(BRIDGE_CODE[2:])}
+        )
+        backend = PyEVMBackend(genesis_state=genesis_state)
+        backend.chain.chain_id = chain_id
+        # Через менеджер Web3, чтобы hex-параметры запросов приводились к типам eth-tester
+        tester_web3 = Web3(EthereumTesterProvider(EthereumTester(backend)))
+
+        def handle_one(item):
+            method, params = item.get("method"), item.get("params", [])
+            response = {"jsonrpc": "2.0", "id": item.get("id")}
+            if method == "eth_chainId":
+                response["result"] = hex(chain_id)
+                return response
+            try:
+                raw = tester_web3.manager._make_request(method, params)
+            except Exception as e:
+                response["error"] = {"code": -32000, "message": str(e)}
+                return response
+            if "error" in raw:
+                response["error"] = dict(raw["error"])
+            else:
+                response["result"] = to_rpc_json(raw.get("result"))
+            return response
+
+        async def handle_rpc(request):
+            body = await request.json()
+            counter.count(body)
+            result = [handle_one(item) for item in body] if isinstance(body, list) else handle_one(body)
+            return web.json_response(result)
+    else:
+        # anvil за прокси: состояние задаётся через anvil_setBalance/anvil_setCode, прокси считает вызовы
+        anvil_port = free_port()
+        anvil_process = subprocess.Popen(
+            ["anvil", "--port", str(anvil_port), "--chain-id", str(chain_id), "--silent"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        anvil_url = f"http://127.0.0.1:{anvil_port}"
+        session = aiohttp.ClientSession()
+
+        async def anvil_call(method, params):
+            async with session.post(anvil_url, json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params}) as response:
+                return await response.json()
+
+        for _ in range(100):
+            try:
+                await anvil_call("eth_chainId", [])
+                break
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+        for address in spec["accounts"]:
+            await anvil_call("anvil_setBalance", [address, hex(spec["balance"])])
+        await anvil_call("anvil_setCode", [BRIDGE_ADDRESS, BRIDGE_CODE])
+
+        async def handle_rpc(request):
+            raw = await request.read()
+            counter.count(json.loads(raw))
+            async with session.post(anvil_url, data=raw, headers={"Content-Type": "application/json"}) as response:
+                return web.Response(body=await response.read(), content_type="application/json")
+
+    async def handle_stats(request):
+        return web.json_response(counter.as_dict())
+
+    app.router.add_post("/", handle_rpc)
+    app.router.add_get("/stats", handle_stats)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        if anvil_process is not None:
+            anvil_process.terminate()
+
+
+async def serve_lifi(port: int, quote_latency: float):
+    # Заглушка /v1/quote: calldata в формате startBridgeTokensViaStargate на адрес "моста"
+    from bench_stargate_codec import build_calldata
+    counter = RpcCounter()
+
+    async def handle_quote(request):
+        counter.count({"method": "quote"})
+        query = request.query
+        if quote_latency:
+            await asyncio.sleep(quote_latency)
+        amount = int(query["fromAmount"])
+        is_native = query["fromToken"].lower() == ZERO_ADDRESS
+        oft_cmd = b"\x00" if query.get("allowBridges") == "stargateV2Bus" else b""
+        return web.json_response({
+            "action": {"fromAmount": str(amount)},
+            "estimate": {"toAmount": str(amount * 995 // 1000), "approvalAddress": BRIDGE_ADDRESS},
+            "transactionRequest": {
+                "to": BRIDGE_ADDRESS,
+                "data": build_calldata(oft_cmd, amount=amount, receiver=query["fromAddress"]),
+                "value": hex(amount + STARGATE_FEE_WEI if is_native else STARGATE_FEE_WEI),
+                "gasLimit": hex(150000)
+            }
+        })
+
+    async def handle_stats(request):
+        return web.json_response(counter.as_dict())
+
+    app = web.Application()
+    app.router.add_get("/v1/quote", handle_quote)
+    app.router.add_get("/stats", handle_stats)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    await asyncio.Event().wait()
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.05):
+        self._interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self._interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self._interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def percentile(self, pct: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def current_rss() -> int | None:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def fetch_stats(session: aiohttp.ClientSession, url: str) -> dict:
+    async with session.get(f"{url}/stats") as response:
+        return await response.json()
+
+
+async def wait_ready(session: aiohttp.ClientSession, url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Процесс {url} завершился с кодом {process.returncode}")
+        try:
+            return await fetch_stats(session, url)
+        except aiohttp.ClientError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} не ответил за {timeout} сек")
+
+
+def synthetic_accounts(count: int) -> list[tuple[str, str]]:
+    from eth_account import Account
+    accounts = []
+    for i in range(count):
+        key = "0x" + hashlib.sha256(f"bench-account-{i}".encode()).hexdigest()
+        accounts.append((Account.from_key(key).address, key))
+    return accounts
+
+
+async def run_benchmark(args):
+    import main
+    from core.journal import TransactionJournal
+    from core.tokens import TokenRegistry
+    # main настраивает logging при импорте
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    with open(os.path.join(REPO_ROOT, "extra/cfg/networks.json"), "r", encoding="utf-8") as f:
+        networks_list = json.load(f)["network"]
+    with open(os.path.join(REPO_ROOT, "extra/cfg/tokens.json"), "r", encoding="utf-8") as f:
+        tokens_json = json.load(f)
+
+    slugs = args.networks.split(",")
+    known = {net["slug"]: net for net in networks_list}
+    unknown = [slug for slug in slugs if slug not in known]
+    if unknown:
+        raise SystemExit(f"Сети не найдены в networks.json: {', '.join(unknown)}")
+
+    accounts = synthetic_accounts(args.accounts)
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.makedirs(os.path.join(workdir, "data"))
+    spec_path = os.path.join(workdir, "chain_spec.json")
+    with open(spec_path, "w", encoding="utf-8") as f:
+        json.dump({"accounts": [address for address, _ in accounts], "balance": ACCOUNT_BALANCE_WEI}, f)
+
+    processes: list[subprocess.Popen] = []
+    chain_urls = {}
+    for slug in slugs:
+        port = free_port()
+        chain_urls[slug] = f"http://127.0.0.1:{port}"
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), "--serve-chain", str(port),
+            "--chain-id", str(known[slug]["chain_id"]), "--spec", spec_path, "--node", args.node
+        ]))
+    lifi_port = free_port()
+    lifi_url = f"http://127.0.0.1:{lifi_port}"
+    processes.append(subprocess.Popen([
+        sys.executable, os.path.abspath(__file__), "--serve-lifi", str(lifi_port), "--quote-latency", str(args.quote_latency)
+    ]))
+
+    config = {
+        "sourceNetworks": slugs,
+        "destinationNetworks": slugs,
+        "fromTokens": ["ETH"],
+        "toTokens": ["ETH"],
+        "percentageRange": [20, 30],
+        "transactionCount": [args.tx_count, args.tx_count],
+        "transactionDelay": [0, 0],
+        "delayBetweenAccounts": [0, 0],
+        "threads": args.threads,
+        "circularRounds": args.rounds,
+        "withdrawNetwork": slugs[0],
+        "withdrawToken": "ETH",
+        "withdrawMode": "percentage",
+        "withdrawPercentage": [10, 20],
+        "bridgeMode": {"fast": 70, "slow": 30},
+        "random_bridge": 0,
+        "useProxy": False,
+        "lifiBaseUrl": f"{lifi_url}/v1",
+        "checkpointDir": os.path.join(workdir, "checkpoints"),
+        "journalPath": os.path.join(workdir, "journal.jsonl"),
+        "tracePath": os.path.join(workdir, "traces.jsonl"),
+        "networkConfigs": {slug: {"rpc_url": url} for slug, url in chain_urls.items()}
+    }
+    config_path = os.path.join(workdir, "config_bench.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    with open(os.path.join(workdir, "data", "exchange_wallets.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(address for address, _ in synthetic_accounts(3)) + "\n")
+
+    networks_data = {}
+    for slug in slugs:
+        net = dict(known[slug])
+        net["rpc_url"] = chain_urls[slug]
+        net["rpc_urls"] = [chain_urls[slug]]
+        networks_data[slug] = net
+
+    previous_cwd = os.getcwd()
+    # Отчёты режимов, чекпоинты и журнал пишутся во временный каталог
+    os.chdir(workdir)
+    session = aiohttp.ClientSession()
+    try:
+        for url, process in zip(list(chain_urls.values()) + [lifi_url], processes):
+            await wait_ready(session, url, process)
+
+        main.load_config(config_path)
+        main.journal = TransactionJournal.open(backend="jsonl", path=config["journalPath"])
+        main.tokens_data = TokenRegistry(tokens_json["network_token"])
+        main.price_cache.seed({"ETH": 3000.0})
+
+        rpc_before = {slug: await fetch_stats(session, url) for slug, url in chain_urls.items()}
+        rss_before = current_rss()
+        monitor = LoopLagMonitor()
+        monitor.start()
+        started = time.perf_counter()
+        await main.run_mode(args.mode, accounts, networks_data, main.tokens_data,
+                            end_network=slugs[-1], final_token="ETH")
+        elapsed = time.perf_counter() - started
+        monitor.stop()
+        rss_peak = peak_rss()
+        rpc_after = {slug: await fetch_stats(session, url) for slug, url in chain_urls.items()}
+        quotes = (await fetch_stats(session, lifi_url))["calls"]
+
+        main.journal.flush()
+        succeeded = sum(1 for _ in main.journal.iter_results("SUCCESS"))
+        failed = sum(1 for _ in main.journal.iter_results("FAILED"))
+        rpc_requests = sum(rpc_after[slug]["requests"] - rpc_before[slug]["requests"] for slug in slugs)
+        rpc_calls = sum(rpc_after[slug]["calls"] - rpc_before[slug]["calls"] for slug in slugs)
+        methods: dict[str, int] = {}
+        for slug in slugs:
+            for method, count in rpc_after[slug]["methods"].items():
+                methods[method] = methods.get(method, 0) + count - rpc_before[slug]["methods"].get(method, 0)
+
+        sent = succeeded + failed
+        print("")
+        print(f"Режим: {args.mode}, нода: {args.node}, сетей: {len(slugs)}, аккаунтов: {args.accounts}, потоков: {args.threads}")
+        print(f"Время: {elapsed:.2f} сек, транзакций: успешно {succeeded}, с ошибкой {failed}")
+        if sent:
+            print(f"Пропускная способность: {succeeded / elapsed:.2f} tx/s")
+            print(f"RPC на транзакцию: {rpc_calls / sent:.1f} вызовов, {rpc_requests / sent:.1f} HTTP-запросов; котировок LI.FI: {quotes / sent:.2f}")
+        else:
+            print(f"RPC: {rpc_calls} вызовов, {rpc_requests} HTTP-запросов")
+        top_methods = sorted(((count, method) for method, count in methods.items() if count), reverse=True)
+        print("Методы RPC: " + ", ".join(f"{method} {count}" for count, method in top_methods))
+        print(f"Задержка event loop: p50 {monitor.percentile(50) * 1000:.1f} мс, p99 {monitor.percentile(99) * 1000:.1f} мс, "
+              f"max {max(monitor.samples, default=0.0) * 1000:.1f} мс")
+        if rss_before is not None and rss_peak is not None:
+            print(f"Память: пик RSS {rss_peak / 1024 ** 2:.1f} МБ, прирост на аккаунт {max(0, rss_peak - rss_before) / args.accounts / 1024:.1f} КБ")
+        if args.json:
+            with open(os.path.join(previous_cwd, args.json), "w", encoding="utf-8") as f:
+                json.dump({
+                    "mode": args.mode, "node": args.node, "networks": slugs, "accounts": args.accounts,
+                    "threads": args.threads, "seconds": elapsed, "succeeded": succeeded, "failed": failed,
+                    "tx_per_second": succeeded / elapsed, "rpc_calls": rpc_calls, "rpc_requests": rpc_requests,
+                    "rpc_methods": methods, "quotes": quotes,
+                    "loop_lag_ms": {"p50": monitor.percentile(50) * 1000, "p99": monitor.percentile(99) * 1000,
+                                    "max": max(monitor.samples, default=0.0) * 1000},
+                    "rss_peak": rss_peak, "rss_before": rss_before
+                }, f, indent=2)
+    finally:
+        await session.close()
+        if main.journal is not None:
+            main.journal.close()
+        if main.client_registry is not None:
+            from core.signer import signer
+            signer.close()
+            await main.client_registry.close()
+        await main.lifi_client.close()
+        await main.price_cache.close()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        os.chdir(previous_cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"Отчёты и журнал: {workdir}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк режимов бота на локальных нодах")
+    parser.add_argument("--mode", choices=BENCH_MODES, default="swap")
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--tx-count", type=int, default=2, help="транзакций на аккаунт в режиме swap")
+    parser.add_argument("--rounds", type=int, default=1, help="кругов в режиме circular")
+    parser.add_argument("--networks", default="base,optimism,arbitrum_one")
+    parser.add_argument("--node", choices=("eth-tester", "anvil"), default="eth-tester")
+    parser.add_argument("--quote-latency", type=float, default=0.0, help="задержка ответа заглушки LI.FI, сек")
+    parser.add_argument("--json", help="сохранить результаты в JSON-файл")
+    parser.add_argument("--keep", action="store_true", help="не удалять каталог с отчётами и журналом")
+    parser.add_argument("--verbose", action="store_true", help="оставить INFO-логи бота")
+    parser.add_argument("--serve-chain", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--serve-lifi", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--chain-id", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--spec", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.serve_chain:
+        asyncio.run(serve_chain(args.serve_chain, args.chain_id, args.spec, args.node))
+    elif args.serve_lifi:
+        asyncio.run(serve_lifi(args.serve_lifi, args.quote_latency))
+    else:
+        if args.node == "anvil" and shutil.which("anvil") is None:
+            raise SystemExit("anvil не найден в PATH")
+        if args.node == "eth-tester":
+            try:
+                import eth_tester  # noqa: F401
+            except ImportError:
+                raise SystemExit('Нужен eth-tester: pip install "eth-tester[py-evm]"')
+        asyncio.run(run_benchmark(args))
@@ -0,0 +1,45 @@
+# Сравнение перезаписи calldata Stargate: правка по смещениям против полного decode/encode
+# Запуск из корня репозитория: python benchmarks/bench_stargate_codec.py [итераций]
+import os
+import sys
+import timeit
+from eth_abi import encode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.stargate_codec import STARGATE_PARAM_TYPES, STARGATE_SELECTOR, _rewrite_fast, _rewrite_full, rewrite_stargate_calldata
+
+ADDRESS = '0x' + '11' * 20
+
+
+def build_calldata(oft_cmd: bytes, integrator: str = 'lifi-api', extra_options: bytes = b'', amount: int = 10 ** 18,
+                   receiver: str = ADDRESS) -> str:
+    bridge_data = (b'\x01' * 32, 'stargateV2', integrator, receiver, ADDRESS, receiver, amount, 42161, False, False)
+    send_params = (30110, b'\x22' * 32, amount, amount * 99 // 100, extra_options, b'', oft_cmd)
+    stargate_data = (13, send_params, (3 * 10 ** 14, 0), ADDRESS)
+    return '0x' + STARGATE_SELECTOR.hex() + encode(STARGATE_PARAM_TYPES, [bridge_data, stargate_data]).hex()
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    amount = 123456789 * 10 ** 9
+    cases = {
+        'taxi (oftCmd пустой)': build_calldata(b''),
+        'bus (oftCmd 0x00)': build_calldata(b'\x00'),
+        'extraOptions 70 байт': build_calldata(b'', extra_options=b'\x03' * 70),
+        'другой integrator': build_calldata(b'', integrator='some-partner'),
+    }
+    for name, data in cases.items():
+        fast = _rewrite_fast(data, amount)
+        full = _rewrite_full(data, amount)
+        assert fast == full, f'{name}: результаты не совпадают'
+        assert rewrite_stargate_calldata(data, amount) == full
+
+        full_time = timeit.timeit(lambda: _rewrite_full(data, amount), number=iterations)
+        fast_time = timeit.timeit(lambda: _rewrite_fast(data, amount), number=iterations)
+        print(f'{name:<24} decode/encode: {full_time / iterations * 1e6:8.1f} мкс  '
+              f'по смещениям: {fast_time / iterations * 1e6:6.1f} мкс  x{full_time / fast_time:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,11 @@
 class Settings:
-    def __init__(self, to_network, allowance, delay_after_approve, gas_amount, gas_price_limits=None):
+    def __init__(self, to_network, allowance, delay_after_approve, gas_amount, gas_price_limits=None,
+                 bridge_mode=None, random_bridge=0, approval_policy="buffered"):
         self.to_network = to_network
         self.allowance = allowance
         self.delay_after_approve = delay_after_approve
         self.gas_amount = gas_amount
-        self.gas_price_limits = gas_price_limits
\ No newline at end of file
+        self.gas_price_limits = gas_price_limits
+        self.bridge_mode = bridge_mode or {"fast": 70, "slow": 30}
+        self.random_bridge = random_bridge
+        self.approval_policy = approval_policy
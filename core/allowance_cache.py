@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from core import erc20
+from utils.multicall import aggregate3, MulticallUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# keccak("Approval(address,address,uint256)")
+APPROVAL_TOPIC = bytes.fromhex("8c5be1e5ebec7d5bd14f71427d1e84f3dd0314c0f7b2291e5b200ac8c7c3b925")
+MAX_UINT256 = erc20.MAX_UINT256
+APPROVAL_POLICIES = ("exact", "buffered", "max")
+
+
+def approval_amount(policy: str, amount: int, buffer_factor: float) -> int:
+    # exact - ровно сумма свапа, buffered - с запасом allowance_factor, max - бесконечный approve
+    if policy == "exact":
+        return amount
+    if policy == "buffered":
+        return int(amount * buffer_factor)
+    if policy == "max":
+        return MAX_UINT256
+    raise ValueError(f"Неизвестная approvalPolicy: {policy}. Допустимо: {', '.join(APPROVAL_POLICIES)}")
+
+
+def _to_bytes(value) -> bytes:
+    if isinstance(value, str):
+        return bytes.fromhex(value.removeprefix("0x"))
+    return bytes(value)
+
+
+class AllowanceCache:
+    # allowance по (chain_id, owner, token, spender) на всю сессию: заполняется multicall-ом
+    # для всех аккаунтов перед режимом и preflight-батчами, обновляется из квитанций approve
+    # и уменьшается на сумму каждого успешного свапа. Allowance меняют только наши же
+    # транзакции, поэтому повторно из сети он читается лишь после неудачной транзакции
+
+    def __init__(self, chunk_size: int = 200):
+        self._chunk_size = chunk_size
+        self._allowances: dict[tuple[int, str, str, str], int] = {}
+        self._unsupported_networks = set()
+
+    def configure(self, chunk_size: int | None = None):
+        if chunk_size:
+            self._chunk_size = chunk_size
+
+    @staticmethod
+    def _key(client, owner: str, token_address: str, spender: str) -> tuple[int, str, str, str]:
+        return client.network.chain_id, owner.lower(), token_address.lower(), spender.lower()
+
+    def get(self, client, owner: str, token_address: str, spender: str) -> int | None:
+        return self._allowances.get(self._key(client, owner, token_address, spender))
+
+    def set(self, client, owner: str, token_address: str, spender: str, allowance: int):
+        self._allowances[self._key(client, owner, token_address, spender)] = allowance
+
+    def invalidate(self, client, owner: str, token_address: str, spender: str):
+        self._allowances.pop(self._key(client, owner, token_address, spender), None)
+
+    def spend(self, client, owner: str, token_address: str, spender: str, amount: int):
+        # transferFrom спендера уменьшает allowance; бесконечный approve большинство токенов не трогает
+        key = self._key(client, owner, token_address, spender)
+        allowance = self._allowances.get(key)
+        if allowance is not None and allowance != MAX_UINT256:
+            self._allowances[key] = max(allowance - amount, 0)
+
+    def update_from_receipt(self, client, receipt, owner: str, token_address: str, spender: str, approved_amount: int):
+        if receipt.get("status") != 1:
+            self.invalidate(client, owner, token_address, spender)
+            return
+        allowance = approved_amount
+        owner_topic, spender_topic = erc20.address_word(owner), erc20.address_word(spender)
+        for log in receipt.get("logs") or []:
+            topics = [_to_bytes(topic) for topic in log.get("topics") or []]
+            if (len(topics) == 3 and topics[0] == APPROVAL_TOPIC and topics[1] == owner_topic
+                    and topics[2] == spender_topic and str(log.get("address", "")).lower() == token_address.lower()):
+                data = _to_bytes(log.get("data") or b"")
+                if len(data) >= 32:
+                    allowance = erc20.decode_uint(data)
+        self.set(client, owner, token_address, spender, allowance)
+
+    async def prefetch(self, client, owners: list[str], tokens: list, spender: str) -> int:
+        # Один Multicall3 на чанк вместо allowance() на каждую транзакцию; возвращает число загруженных значений
+        slug = client.network.slug
+        pairs = [
+            (owner, token) for token in tokens if not token.is_native for owner in owners
+            if self.get(client, owner, token.address, spender) is None
+        ]
+        if not pairs or slug in self._unsupported_networks:
+            return 0
+        calls = [(token.address, erc20.allowance_data(owner, spender)) for owner, token in pairs]
+        try:
+            results = await aggregate3(client, calls, self._chunk_size)
+        except MulticallUnavailableError as e:
+            logger.warning(f"{e}. Allowance будет запрашиваться в preflight каждой транзакции.")
+            self._unsupported_networks.add(slug)
+            return 0
+        except Exception as e:
+            logger.warning(f"Не удалось получить allowance через Multicall3 в сети {slug}: {e}")
+            return 0
+        loaded = 0
+        for (owner, token), (success, return_data) in zip(pairs, results):
+            if success and len(return_data) >= 32:
+                self.set(client, owner, token.address, spender, erc20.decode_uint(return_data))
+                loaded += 1
+        return loaded
+
+    async def prefetch_many(self, jobs: list[tuple[object, list[str], list, str]]) -> int:
+        # jobs: [(client, owners, tokens, spender)] - сети опрашиваются параллельно
+        loaded = await asyncio.gather(*(self.prefetch(*job) for job in jobs))
+        return sum(loaded)
+
+
+allowance_cache = AllowanceCache()
@@ -1,5 +1,15 @@
 from web3 import Web3
-import asyncio
+from core.nonce_manager import nonce_manager
+from core.gas_oracle import gas_oracles
+from core.signer import signer
+from core.tracing import tracer
+from core import erc20
+from core.gas_limits import gas_limits
+
+NONCE_ERRORS = (
+    "nonce too low", "nonce too high", "invalid nonce", "invalid transaction nonce",
+    "replacement transaction underpriced"
+)
 
 class AccountClient:
     def __init__(self, address: str, private_key: str, client):
@@ -10,77 +20,51 @@ class AccountClient:
     async def commit_transaction(self, txn_dict):
 
         web3 = self.client.web3
-        block_id = "pending"
-        try:
-            network_slug = getattr(self.client.network, 'slug', '')
-        except Exception:
-            network_slug = ''
-        if network_slug == 'abstract':
-            block_id = 'latest'
-        nonce = await asyncio.to_thread(
-            web3.eth.get_transaction_count,
-            self.address,
-            block_id
-        )
-        txn_dict['nonce'] = nonce
-        signed_txn = web3.eth.account.sign_transaction(txn_dict, self.private_key)
-        raw = signed_txn.raw_transaction
-        tx_hash = web3.eth.send_raw_transaction(raw)
-        return f"0x{tx_hash.hex()}"
+        attempt = 0
+        while True:
+            nonce = await nonce_manager.allocate(self.client, self.address)
+            txn_dict['nonce'] = nonce
+            signed_txn = None
+            try:
+                with tracer.span("sign", nonce=nonce):
+                    signed_txn = await signer.sign(self.address, self.private_key, txn_dict)
+                with tracer.span("send", nonce=nonce):
+                    tx_hash = await web3.eth.send_raw_transaction(signed_txn.raw_transaction)
+            except Exception as e:
+                error_text = str(e).lower()
+                if "already known" in error_text and signed_txn is not None:
+                    # Эта же транзакция уже в мемпуле
+                    return f"0x{signed_txn.hash.hex()}"
+                if any(marker in error_text for marker in NONCE_ERRORS):
+                    if attempt < 1:
+                        attempt += 1
+                        await nonce_manager.resync(self.client, self.address)
+                        continue
+                    nonce_manager.invalidate(self.client, self.address)
+                    raise
+                # Неизвестно, дошла ли транзакция до мемпула: следующий nonce берём из сети
+                nonce_manager.invalidate(self.client, self.address)
+                raise
+            except BaseException:
+                # Отмена (таймаут свапа) во время подписи или отправки: nonce не должен потеряться
+                nonce_manager.invalidate(self.client, self.address)
+                raise
+            return f"0x{tx_hash.hex()}"
 
     async def get_token_allowance(self, token, spender_address):
-        contract = self.client.web3.eth.contract(
-            address=Web3.to_checksum_address(token.address),
-            abi=[
-                {
-                    "constant": True,
-                    "inputs": [
-                        {"name": "_owner", "type": "address"},
-                        {"name": "_spender", "type": "address"}
-                    ],
-                    "name": "allowance",
-                    "outputs": [{"name": "", "type": "uint256"}],
-                    "type": "function"
-                }
-            ]
-        )
-        allowance = contract.functions.allowance(
-            Web3.to_checksum_address(self.address),
-            Web3.to_checksum_address(spender_address)
-        ).call()
-        return allowance
+        return await erc20.allowance(self.client, token.address, self.address, spender_address)
 
     async def approve_token_spend(self, token, amount, spender_address):
-        contract = self.client.web3.eth.contract(
-            address=Web3.to_checksum_address(token.address),
-            abi=[
-                {
-                    "constant": False,
-                    "inputs": [
-                        {"name": "_spender", "type": "address"},
-                        {"name": "_value", "type": "uint256"}
-                    ],
-                    "name": "approve",
-                    "outputs": [{"name": "", "type": "bool"}],
-                    "type": "function"
-                }
-            ]
-        )
-        # Estimate gas for approve
-        gas_estimate = contract.functions.approve(
-            Web3.to_checksum_address(spender_address),
-            amount
-        ).estimate_gas({"from": self.address})
-
-        # Build transaction dict
-        txn_dict = contract.functions.approve(
-            Web3.to_checksum_address(spender_address),
-            amount
-        ).build_transaction({
+        txn_dict = {
             "from": self.address,
-            # The nonce will be injected in commit_transaction
-            # using block identifier logic above
-            "gas": int(gas_estimate * 1.2),
-            "gasPrice": self.client.web3.eth.gas_price
-        })
+            "to": Web3.to_checksum_address(token.address),
+            "value": 0,
+            "data": erc20.hex_data(erc20.approve_data(spender_address, amount)),
+            "chainId": self.client.network.chain_id
+        }
+        # Gas limit from past approves of this token/spender route, estimated on a miss.
+        # The nonce will be allocated in commit_transaction
+        # by the shared nonce manager
+        txn_dict["gas"] = await gas_limits.resolve(self.client, txn_dict)
+        txn_dict["gasPrice"] = await gas_oracles.get(self.client).gas_price()
         return await self.commit_transaction(txn_dict)
@@ -1,5 +1,14 @@
-from web3 import Web3
-from utils.proxy_utils import get_proxy
+import asyncio
+import time
+import aiohttp
+from web3 import AsyncWeb3
+from web3.exceptions import TimeExhausted
+from web3.middleware import ExtraDataToPOAMiddleware
+from utils.proxy_utils import get_proxy, make_connector, request_proxy
+from core.receipt_watcher import receipt_watchers
+from core.rpc_provider import MultiEndpointProvider
+from core.metrics import metrics
+from core.nonce_manager import nonce_manager
 
 class Network:
     def __init__(self, slug: str, chain_id: int, txn_explorer_url: str):
@@ -8,21 +17,86 @@ class Network:
         self.txn_explorer_url = txn_explorer_url
 
 class Client:
-    def __init__(self, network_slug: str, rpc_url: str, chain_id: int, txn_explorer_url: str = "", use_proxy: bool = False):
+    def __init__(self, network_slug: str, rpc_url: str | list[str], chain_id: int, txn_explorer_url: str = "",
+                 use_proxy: bool = False, proxy: str | None = None, provider_options: dict | None = None):
         self._network = Network(slug=network_slug, chain_id=chain_id, txn_explorer_url=txn_explorer_url)
-        if use_proxy:
+        if use_proxy and proxy is None:
             proxy = get_proxy()
-            if proxy:
-                self.web3 = Web3(Web3.HTTPProvider(rpc_url, request_kwargs={"proxies": {"http": proxy, "https": proxy}}))
-            else:
-                self.web3 = Web3(Web3.HTTPProvider(rpc_url))
-        else:
-            self.web3 = Web3(Web3.HTTPProvider(rpc_url))
+        self.proxy = proxy
+        # socks-прокси задан коннектором сессии (ClientRegistry), в запрос передаётся только http(s)
+        request_kwargs = {"proxy": request_proxy(proxy)} if request_proxy(proxy) else None
+        rpc_urls = [rpc_url] if isinstance(rpc_url, str) else rpc_url
+        self.web3 = AsyncWeb3(MultiEndpointProvider(rpc_urls, request_kwargs=request_kwargs, network=network_slug,
+                                                        **(provider_options or {})))
 
     @property
     def network(self):
         return self._network
 
-    def wait_for_transaction_receipt(self, tx_hash, timeout=3600, poll_latency=2):
-        receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout, poll_latency=poll_latency)
-        return receipt
\ No newline at end of file
+    async def wait_for_transaction_receipt(self, tx_hash, timeout=3600, kind: str = "other", sender: str | None = None):
+        # Вызывается сразу после отправки, поэтому время ожидания - это время подтверждения
+        started = time.monotonic()
+        try:
+            receipt = await receipt_watchers.get(self).wait_for_receipt(tx_hash, timeout=timeout)
+        except TimeExhausted:
+            # Транзакция могла выпасть из мемпула - nonce отправителя перечитается из сети
+            if sender:
+                nonce_manager.invalidate(self, sender)
+            raise
+        metrics.observe("tx_confirmation_seconds", time.monotonic() - started, {"network": self._network.slug, "kind": kind})
+        return receipt
+
+
+class ClientRegistry:
+    # Один долгоживущий Client на (сеть, прокси) и одна keep-alive сессия на каждый RPC endpoint сети
+    # (для socks-прокси - на пару endpoint и прокси: прокси задаётся коннектором сессии)
+
+    def __init__(self, pool_size: int = 10, provider_options: dict | None = None):
+        self._pool_size = pool_size
+        self._provider_options = provider_options or {}
+        self._clients: dict[tuple[str, str | None], Client] = {}
+        self._sessions: dict[tuple[str, str | None], aiohttp.ClientSession] = {}
+        self._lock = asyncio.Lock()
+
+    def _get_session(self, rpc_url: str, proxy: str | None = None) -> aiohttp.ClientSession:
+        key = (rpc_url, None if request_proxy(proxy) else proxy)
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                raise_for_status=True,
+                connector=make_connector(key[1], limit_per_host=self._pool_size),
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+            self._sessions[key] = session
+        return session
+
+    async def get_client(self, network_slug: str, net_info: dict, use_proxy: bool = False) -> Client:
+        proxy = get_proxy() if use_proxy else None
+        key = (network_slug, proxy)
+        async with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = Client(
+                    network_slug=network_slug,
+                    rpc_url=net_info.get("rpc_urls") or net_info["rpc_url"],
+                    chain_id=net_info["chain_id"],
+                    txn_explorer_url=net_info.get("txn_explorer_url", ""),
+                    proxy=proxy,
+                    provider_options={"latency_hints": net_info.get("rpc_latencies"), **self._provider_options}
+                )
+                await client.web3.provider.cache_async_sessions(lambda rpc_url: self._get_session(rpc_url, proxy))
+                # Для abstract используем default_block='latest'
+                if network_slug == "abstract":
+                    client.web3.eth.default_block = "latest"
+                client.web3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+                self._clients[key] = client
+            return client
+
+    async def close(self):
+        async with self._lock:
+            for client in self._clients.values():
+                await client.web3.provider.disconnect()
+            for session in self._sessions.values():
+                await session.close()
+            self._sessions.clear()
+            self._clients.clear()
@@ -1,8 +1,9 @@
 import logging
 import copy
 from eth_typing import ChecksumAddress
-from web3 import Web3
 from web3.types import TxParams
+from core.gas_oracle import gas_oracles
+from core.gas_limits import gas_limits
 
 logger = logging.getLogger(__name__)
 
@@ -35,26 +36,22 @@ class TransactionBuilder:
         self._draft_txn_dict["data"] = data
         return self
 
-    async def prepare_transaction(self) -> TxParams:
+    async def prepare_transaction(self, token: str | None = None) -> TxParams:
         txn_dict = copy.deepcopy(self._draft_txn_dict)
 
         from_address = txn_dict.get("from")
         if not from_address:
             raise ValueError("`from` address is required in the transaction.")
 
-        txn_dict["nonce"] = self.client.web3.eth.get_transaction_count(from_address)
+        # nonce выдаёт nonce_manager при отправке в AccountClient.commit_transaction
 
-        gas_estimate = self.client.web3.eth.estimate_gas(txn_dict)
-        txn_dict["gas"] = gas_estimate
+        # Заданный лимит (gasLimit из котировки) не переоценивается
+        txn_dict["gas"] = await gas_limits.resolve(self.client, txn_dict, token)
 
-        slug = getattr(self.client.network, 'slug', '')
-        block_id = 'pending' if slug != 'abstract' else 'latest'
-        base_fee = self.client.web3.eth.get_block(block_id)['baseFeePerGas']
-        max_priority_fee = self.client.web3.eth.max_priority_fee
-        max_fee_per_gas = base_fee + max_priority_fee
+        fees = await gas_oracles.get(self.client).get()
 
-        txn_dict["maxFeePerGas"] = max_fee_per_gas
-        txn_dict["maxPriorityFeePerGas"] = max_priority_fee
+        txn_dict["maxFeePerGas"] = fees.max_fee_per_gas
+        txn_dict["maxPriorityFeePerGas"] = fees.priority_fee
 
         return txn_dict
 
@@ -64,7 +61,8 @@ class TransactionBuilder:
         to_address: ChecksumAddress,
         value: int,
         data: str,
-        gas: int = None
+        gas: int = None,
+        token: str | None = None
     ) -> TxParams:
         self.add_from_address(from_address)
         self.add_to_address(to_address)
@@ -74,20 +72,8 @@ class TransactionBuilder:
         if gas is not None:
             self._draft_txn_dict["gas"] = gas
 
-        return await self.prepare_transaction()
-
-    async def send_transaction(self, txn_dict: TxParams, private_key: str):
-
-        web3 = self.client.web3
-
-        signed_txn = web3.eth.account.sign_transaction(txn_dict, private_key)
-        logger.info(f"Подписанная транзакция: {signed_txn}")
-
-        tx_hash = web3.eth.send_raw_transaction(signed_txn.raw_transaction)
-        logger.info(f"Транзакция отправлена. Хэш: {tx_hash.hex()}")
-
-        return tx_hash
+        return await self.prepare_transaction(token)
 
     async def wait_for_receipt(self, tx_hash):
-        receipt = self.client.web3.eth.wait_for_transaction_receipt(tx_hash)
+        receipt = await self.client.wait_for_transaction_receipt(tx_hash)
         return receipt
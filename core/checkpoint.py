@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointStore:
+    # Прогресс каждого аккаунта в режиме: план, выполненные индексы, позиция кругового прогона
+    # и последний отправленный хэш. Файл перезаписывается атомарно (tmp + os.replace)
+
+    def __init__(self, path: str, params: dict | None = None, save_interval: float = 2.0):
+        self._path = path
+        self._save_interval = save_interval
+        self._last_save = 0.0
+        self._save_handle: asyncio.TimerHandle | None = None
+        self._data = {"params": params or {}, "accounts": {}}
+
+    @classmethod
+    def open(cls, mode: str, resume: bool = False, directory: str = "data/checkpoints", params: dict | None = None):
+        store = cls(os.path.join(directory, f"{mode}.json"), params)
+        if not resume:
+            return store
+        try:
+            with open(store._path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            logger.info(f"Чекпоинт {store._path} не найден, начинаю прогон с начала")
+            return store
+        except json.JSONDecodeError:
+            logger.warning(f"Чекпоинт {store._path} повреждён, начинаю прогон с начала")
+            return store
+        if params is not None and data.get("params") != params:
+            logger.warning(f"Параметры прогона изменились ({data.get('params')} -> {params}), чекпоинт не используется")
+            return store
+        store._data = data
+        logger.info(f"Продолжаю прогон из чекпоинта {store._path}: аккаунтов в чекпоинте {len(data['accounts'])}")
+        return store
+
+    def bind_session(self, session_id: str) -> str:
+        # Сессия журнала прогона: продолженный прогон пишет в ту же сессию, и отчёты
+        # включают транзакции, выполненные до сбоя
+        if "session" not in self._data:
+            self._data["session"] = session_id
+            self._save_soon()
+        return self._data["session"]
+
+    def get(self, address: str) -> dict | None:
+        return self._data["accounts"].get(address)
+
+    def is_finished(self, address: str) -> bool:
+        state = self.get(address)
+        return state is not None and state.get("finished", False)
+
+    def start(self, address: str, planned: int) -> dict:
+        state = self._data["accounts"].get(address)
+        if state is None:
+            state = {"planned": planned, "completed": [], "finished": False, "last_tx": None}
+            self._data["accounts"][address] = state
+            self._save_soon()
+        return state
+
+    def completed(self, address: str) -> set[int]:
+        state = self.get(address)
+        return set(state["completed"]) if state else set()
+
+    def pending_tx(self, address: str) -> dict | None:
+        state = self.get(address)
+        if state and state.get("last_tx") and state["last_tx"]["status"] == "pending":
+            return state["last_tx"]
+        return None
+
+    def set_circular(self, address: str, order: list[str], round: int, position: int, tx_index: int):
+        state = self._data["accounts"][address]
+        state["circular"] = {"order": order, "round": round, "position": position, "tx_index": tx_index}
+        self._save_soon()
+
+    def mark_sent(self, address: str, tx_index: int, network_slug: str, txn_hash: str):
+        state = self._data["accounts"][address]
+        state["last_tx"] = {"index": tx_index, "network": network_slug, "hash": txn_hash, "status": "pending"}
+        # Хэш в полёте пишем сразу: без него при рестарте транзакция может уйти повторно
+        self.save()
+
+    def mark_done(self, address: str, tx_index: int, status: str | None):
+        state = self._data["accounts"][address]
+        if tx_index not in state["completed"]:
+            state["completed"].append(tx_index)
+        last_tx = state.get("last_tx")
+        if last_tx and last_tx["index"] == tx_index:
+            last_tx["status"] = (status or "skipped").lower()
+        self._save_soon()
+
+    def finish(self, address: str):
+        self._data["accounts"][address]["finished"] = True
+        self._save_soon()
+
+    def _save_soon(self):
+        if time.monotonic() - self._last_save >= self._save_interval:
+            self.save()
+            return
+        if self._save_handle is None:
+            delay = self._save_interval - (time.monotonic() - self._last_save)
+            self._save_handle = asyncio.get_running_loop().call_later(delay, self.save)
+
+    def save(self):
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path)
+        self._last_save = time.monotonic()
+
+    def close(self):
+        self.save()
@@ -1,16 +1,14 @@
 # deposit_from_exchange.py
 import asyncio
 import logging
-import csv
 import random
-from datetime import datetime
 import ccxt.async_support as ccxt
 from data.api_keys import API
 from utils.proxy_utils import get_proxy_dict
 
 logger = logging.getLogger(__name__)
 
-async def deposit_from_exchange(accounts, config_json, stats, successful_transactions, failed_transactions):
+async def deposit_from_exchange(accounts, config_json, journal):
     logger.info("Запуск вывода с биржи на кошельки...")
 
     cex_name = config_json.get("depositCex", "binance").lower()
@@ -131,7 +129,7 @@ async def deposit_from_exchange(accounts, config_json, stats, successful_transac
                     }
                 )
             logger.info(f"[{address}] Вывел {amount:.{decimal_places}f} {symbol_withdraw} с {cex_name} (Кошелек #{wallet_number})")
-            successful_transactions.append({
+            journal.record_result({
                 "WalletAddress": address,
                 "TransactionIndex": wallet_number,
                 "SourceNetwork": cex_name,
@@ -142,10 +140,10 @@ async def deposit_from_exchange(accounts, config_json, stats, successful_transac
                 "USDVolume": amount,  # Предполагаем USDT = 1 USD
                 "Status": "SUCCESS",
                 "Error": ""
-            })
+            }, summary=False)
         except Exception as e:
             logger.error(f"[{address}] Не удалось вывести {amount:.{decimal_places}f} {symbol_withdraw} с {cex_name}: {e}")
-            failed_transactions.append({
+            journal.record_result({
                 "WalletAddress": address,
                 "TransactionIndex": wallet_number,
                 "SourceNetwork": cex_name,
@@ -156,7 +154,7 @@ async def deposit_from_exchange(accounts, config_json, stats, successful_transac
                 "USDVolume": 0,
                 "Status": "FAILED",
                 "Error": str(e)
-            })
+            }, summary=False)
 
     def get_random_delay(delay_config):
         if isinstance(delay_config, list) and len(delay_config) == 2:
@@ -188,42 +186,6 @@ async def deposit_from_exchange(accounts, config_json, stats, successful_transac
         await exchange.close()
 
     # Сохранение результатов
-    current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    all_pairs = set()
-    for wal, info in stats.items():
-        for pair_nt in info["net_token_dollars"]:
-            all_pairs.add(pair_nt)
-    col_names = [f"{net_slug}-{token_sym}" for (net_slug, token_sym) in all_pairs]
-    col_names.sort()
-
-    fieldnames_summary = ["Date", "WalletAddress", "TotalTransactions"] + col_names
-    with open("deposit_summary.csv", "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames_summary, delimiter=';')
-        writer.writeheader()
-        for wal, info in stats.items():
-            row = {"WalletAddress": wal, "TotalTransactions": info["transactions_count"], "Date": current_date}
-            for (net_slug, token_sym) in all_pairs:
-                col_name = f"{net_slug}-{token_sym}"
-                usd_amount = info["net_token_dollars"].get((net_slug, token_sym), 0.0)
-                row[col_name] = f"{usd_amount:.2f}$"
-            writer.writerow(row)
-
-    if successful_transactions:
-        fieldnames_success = ["WalletAddress", "TransactionIndex", "SourceNetwork", "FromToken",
-                              "DestinationNetwork", "ToToken", "Amount", "USDVolume", "Status", "Error"]
-        with open("deposit_successful_transactions.csv", "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames_success, delimiter=';')
-            writer.writeheader()
-            for row in successful_transactions:
-                writer.writerow(row)
-
-    if failed_transactions:
-        fieldnames_failed = ["WalletAddress", "TransactionIndex", "SourceNetwork", "FromToken",
-                             "DestinationNetwork", "ToToken", "Amount", "USDVolume", "Status", "Error"]
-        with open("deposit_failed_transactions.csv", "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames_failed, delimiter=';')
-            writer.writeheader()
-            for row in failed_transactions:
-                writer.writerow(row)
+    journal.write_reports("deposit_")
 
     logger.info("Вывод с биржи завершен! Итоги сохранены в deposit_summary.csv, deposit_successful_transactions.csv и deposit_failed_transactions.csv.")
\ No newline at end of file
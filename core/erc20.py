@@ -0,0 +1,76 @@
+from web3 import Web3
+
+# Селекторы ERC-20: первые 4 байта keccak сигнатуры
+BALANCE_OF_SELECTOR = bytes.fromhex("70a08231")   # balanceOf(address)
+ALLOWANCE_SELECTOR = bytes.fromhex("dd62ed3e")    # allowance(address,address)
+APPROVE_SELECTOR = bytes.fromhex("095ea7b3")      # approve(address,uint256)
+TRANSFER_SELECTOR = bytes.fromhex("a9059cbb")     # transfer(address,uint256)
+DECIMALS_SELECTOR = bytes.fromhex("313ce567")     # decimals()
+
+MAX_UINT256 = 2 ** 256 - 1
+
+
+def address_word(address: str) -> bytes:
+    # Адрес, выровненный до 32 байт; checksum для calldata не нужен
+    raw = bytes.fromhex(address[2:] if address[:2] in ("0x", "0X") else address)
+    if len(raw) != 20:
+        raise ValueError(f"Некорректный адрес: {address}")
+    return bytes(12) + raw
+
+
+def uint_word(value: int) -> bytes:
+    if not 0 <= value <= MAX_UINT256:
+        raise ValueError(f"Значение вне диапазона uint256: {value}")
+    return value.to_bytes(32, "big")
+
+
+def balance_of_data(owner: str) -> bytes:
+    return BALANCE_OF_SELECTOR + address_word(owner)
+
+
+def allowance_data(owner: str, spender: str) -> bytes:
+    return ALLOWANCE_SELECTOR + address_word(owner) + address_word(spender)
+
+
+def approve_data(spender: str, amount: int) -> bytes:
+    return APPROVE_SELECTOR + address_word(spender) + uint_word(amount)
+
+
+def transfer_data(to: str, amount: int) -> bytes:
+    return TRANSFER_SELECTOR + address_word(to) + uint_word(amount)
+
+
+def decimals_data() -> bytes:
+    return DECIMALS_SELECTOR
+
+
+def decode_uint(raw) -> int:
+    # Пустой ответ (нет контракта) считается нулём, как и раньше в preflight
+    if isinstance(raw, str):
+        raw = bytes.fromhex(raw.removeprefix("0x"))
+    return int.from_bytes(raw[:32], "big") if raw else 0
+
+
+def decode_bool(raw) -> bool:
+    # Токены вроде USDT в approve/transfer ничего не возвращают - это успех
+    return decode_uint(raw) != 0 if raw else True
+
+
+def hex_data(data: bytes) -> str:
+    return "0x" + data.hex()
+
+
+async def _call(client, token_address: str, data: bytes):
+    return await client.web3.eth.call({"to": Web3.to_checksum_address(token_address), "data": hex_data(data)})
+
+
+async def balance_of(client, token_address: str, owner: str) -> int:
+    return decode_uint(await _call(client, token_address, balance_of_data(owner)))
+
+
+async def allowance(client, token_address: str, owner: str, spender: str) -> int:
+    return decode_uint(await _call(client, token_address, allowance_data(owner, spender)))
+
+
+async def decimals(client, token_address: str) -> int:
+    return decode_uint(await _call(client, token_address, decimals_data()))
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from contextvars import ContextVar
+from core.gas_oracle import gas_oracles
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Семафор потоков, занятый текущим аккаунтом: на время ожидания газа слот отдаётся другим аккаунтам
+concurrency_slot: ContextVar[asyncio.Semaphore | None] = ContextVar("concurrency_slot", default=None)
+
+
+class GasGate:
+    # Один на сеть: пока есть ожидающие аккаунты, фоновая задача на каждый новый блок обновляет
+    # цену газа в общем оракуле и будит всех, чей лимит она уже не превышает
+
+    def __init__(self, client, poll_interval: float = 1.0):
+        self._client = client
+        self._poll_interval = poll_interval
+        self._condition = asyncio.Condition()
+        self._gas_price: int | None = None
+        self._waiters = 0
+        self._last_block = None
+        self._task: asyncio.Task | None = None
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._last_block = None
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        oracle = gas_oracles.get(self._client)
+        while self._waiters:
+            try:
+                block_number = await self._client.web3.eth.block_number
+                if block_number != self._last_block:
+                    self._last_block = block_number
+                    gas_price = await oracle.refresh_gas_price()
+                    async with self._condition:
+                        self._gas_price = gas_price
+                        self._condition.notify_all()
+            except Exception as e:
+                logger.debug(f"Ошибка при обновлении цены газа в сети {self._client.network.slug}: {e}")
+            if self._waiters:
+                await asyncio.sleep(self._poll_interval)
+
+    async def wait_below(self, limit_wei: int) -> int:
+        # Возвращает цену газа, при которой аккаунт пропущен
+        gas_price = await gas_oracles.get(self._client).gas_price()
+        if gas_price <= limit_wei:
+            return gas_price
+
+        slot = concurrency_slot.get()
+        if slot is not None:
+            slot.release()
+            # Аккаунт без слота не занимает поток - в accounts_in_progress его не считаем
+            metrics.gauge_add("accounts_in_progress", -1)
+            metrics.gauge_add("accounts_waiting_gas", 1)
+        self._waiters += 1
+        try:
+            async with self._condition:
+                self._gas_price = gas_price
+                self._ensure_running()
+                await self._condition.wait_for(lambda: self._gas_price <= limit_wei)
+                return self._gas_price
+        finally:
+            self._waiters -= 1
+            if slot is not None:
+                metrics.gauge_add("accounts_waiting_gas", -1)
+                # Слот возвращается и при отмене: его отпустит async with семафора.
+                # shield - чтобы повторная отмена не оставила семафор с лишним слотом
+                try:
+                    await asyncio.shield(slot.acquire())
+                finally:
+                    metrics.gauge_add("accounts_in_progress", 1)
+
+
+class GasGateRegistry:
+
+    def __init__(self, poll_interval: float = 1.0):
+        self._poll_interval = poll_interval
+        self._gates: dict[str, GasGate] = {}
+
+    def configure(self, poll_interval: float):
+        self._poll_interval = poll_interval
+        for gate in self._gates.values():
+            gate._poll_interval = poll_interval
+
+    def get(self, client) -> GasGate:
+        slug = client.network.slug
+        gate = self._gates.get(slug)
+        if gate is None:
+            gate = self._gates[slug] = GasGate(client, poll_interval=self._poll_interval)
+        return gate
+
+
+gas_gates = GasGateRegistry()
@@ -0,0 +1,76 @@
+import logging
+from collections import deque
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MIN_GAS_LIMIT = 21000
+
+
+def _selector(data) -> str:
+    if not data:
+        return ""
+    if isinstance(data, str):
+        return data[2:10].lower() if data[:2] in ("0x", "0X") else data[:8].lower()
+    return bytes(data[:4]).hex()
+
+
+class GasLimitPolicy:
+    # Лимит газа для отправки: переданный в транзакции (например gasLimit из котировки LI.FI)
+    # используется как есть; иначе берётся перцентиль gasUsed прошлых квитанций того же маршрута
+    # (сеть, to, селектор, токен) с запасом, и только при промахе вызывается eth_estimateGas
+
+    def __init__(self, percentile: float = 0.95, margin: float = 1.25, estimate_margin: float = 1.2,
+                 min_samples: int = 3, max_samples: int = 100):
+        self._percentile = percentile
+        self._margin = margin
+        self._estimate_margin = estimate_margin
+        self._min_samples = min_samples
+        self._max_samples = max_samples
+        self._samples: dict[tuple[int, str, str, str], deque] = {}
+
+    def configure(self, margin: float | None = None, min_samples: int | None = None):
+        if margin:
+            self._margin = margin
+        if min_samples:
+            self._min_samples = min_samples
+
+    @staticmethod
+    def route_key(client, to: str | None, data, token: str | None = None) -> tuple[int, str, str, str]:
+        # Для approve/transfer токен и есть to; для моста передаётся адрес отправляемого токена
+        to = (to or "").lower()
+        return client.network.chain_id, to, _selector(data), (token or to).lower()
+
+    def cached_limit(self, key) -> int | None:
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self._min_samples:
+            return None
+        ordered = sorted(samples)
+        value = ordered[min(int(len(ordered) * self._percentile), len(ordered) - 1)]
+        return max(int(value * self._margin), MIN_GAS_LIMIT)
+
+    def record(self, client, to: str | None, data, receipt, token: str | None = None):
+        # Квитанция с ошибкой не говорит, сколько газа нужно успешной транзакции
+        if receipt is None or receipt.get("status") != 1 or not receipt.get("gasUsed"):
+            return
+        key = self.route_key(client, to, data, token)
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self._max_samples)
+        samples.append(int(receipt["gasUsed"]))
+
+    async def resolve(self, client, txn_dict: dict, token: str | None = None) -> int:
+        network = client.network.slug
+        if txn_dict.get("gas"):
+            metrics.inc("gas_limit_source_total", {"network": network, "source": "provided"})
+            return int(txn_dict["gas"])
+        limit = self.cached_limit(self.route_key(client, txn_dict.get("to"), txn_dict.get("data"), token))
+        if limit is not None:
+            metrics.inc("gas_limit_source_total", {"network": network, "source": "cache"})
+            return limit
+        metrics.inc("gas_limit_source_total", {"network": network, "source": "estimate"})
+        estimate = await client.web3.eth.estimate_gas(txn_dict)
+        return int(estimate * self._estimate_margin)
+
+
+gas_limits = GasLimitPolicy()
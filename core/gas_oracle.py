@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class GasSnapshot:
+    def __init__(self, base_fee: int, priority_fee: int, gas_price: int, block_number: int | None,
+                 base_fee_multiplier: float = 2.0):
+        self.base_fee = base_fee
+        self.priority_fee = priority_fee
+        self.gas_price = gas_price
+        self.block_number = block_number
+        self.base_fee_multiplier = base_fee_multiplier
+        self.updated_at = time.monotonic()
+
+    @property
+    def max_fee_per_gas(self) -> int:
+        # Запас на рост base fee, пока транзакция ждёт включения (x2 выдерживает ~6 полных блоков)
+        return int(self.base_fee * self.base_fee_multiplier) + self.priority_fee
+
+
+class GasOracle:
+    # Один на сеть: base fee, priority fee (перцентиль eth_feeHistory) и legacy gas price
+    # обновляются не чаще раза в ttl секунд, все аккаунты читают общий снимок
+
+    def __init__(self, client, ttl: float = 3.0, history_blocks: int = 5, reward_percentile: int = 50,
+                 base_fee_multiplier: float = 2.0):
+        self._client = client
+        self._ttl = ttl
+        self._base_fee_multiplier = base_fee_multiplier
+        self._history_blocks = history_blocks
+        self._reward_percentile = reward_percentile
+        self._snapshot: GasSnapshot | None = None
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() - self._snapshot.updated_at < self._ttl
+
+    def snapshot_from_fee_history(self, fee_history: dict, gas_price: int) -> GasSnapshot | None:
+        # Последний элемент baseFeePerGas - base fee следующего блока. Нулевая медиана чаевых
+        # (пустые блоки) не годится - тогда чаевые берутся из eth_maxPriorityFeePerGas
+        rewards = sorted(reward[0] for reward in fee_history.get("reward") or [] if reward)
+        if not rewards or not fee_history.get("baseFeePerGas") or not rewards[len(rewards) // 2]:
+            return None
+        base_fee = fee_history["baseFeePerGas"][-1]
+        block_number = fee_history["oldestBlock"] + len(fee_history["baseFeePerGas"]) - 2
+        return GasSnapshot(base_fee, rewards[len(rewards) // 2], gas_price, block_number, self._base_fee_multiplier)
+
+    async def _fetch_from_fee_history(self):
+        web3 = self._client.web3
+        fee_history, gas_price = await asyncio.gather(
+            web3.eth.fee_history(self._history_blocks, "latest", [self._reward_percentile]),
+            web3.eth.gas_price
+        )
+        snapshot = self.snapshot_from_fee_history(fee_history, gas_price)
+        if snapshot is None:
+            priority_fee = await web3.eth.max_priority_fee
+            block_number = fee_history["oldestBlock"] + len(fee_history["baseFeePerGas"]) - 2
+            snapshot = GasSnapshot(fee_history["baseFeePerGas"][-1], priority_fee, gas_price, block_number,
+                                   self._base_fee_multiplier)
+        return snapshot
+
+    async def _fetch_from_block(self):
+        web3 = self._client.web3
+        block_id = "latest" if self._client.network.slug == "abstract" else "pending"
+        block, priority_fee, gas_price = await asyncio.gather(
+            web3.eth.get_block(block_id),
+            web3.eth.max_priority_fee,
+            web3.eth.gas_price
+        )
+        return GasSnapshot(block["baseFeePerGas"], priority_fee, gas_price, block.get("number"), self._base_fee_multiplier)
+
+    async def _fetch(self) -> GasSnapshot:
+        try:
+            return await self._fetch_from_fee_history()
+        except Exception as e:
+            logger.debug(f"eth_feeHistory недоступен в сети {self._client.network.slug}: {e}")
+            return await self._fetch_from_block()
+
+    async def get(self) -> GasSnapshot:
+        if self._is_fresh():
+            return self._snapshot
+        async with self._lock:
+            if self._is_fresh():
+                return self._snapshot
+            self._snapshot = await self._fetch()
+            return self._snapshot
+
+    def cached(self) -> GasSnapshot | None:
+        return self._snapshot if self._is_fresh() else None
+
+    def seed(self, snapshot: GasSnapshot):
+        # Снимок, полученный в составе чужого batch-запроса (preflight)
+        if not self._is_fresh():
+            self._snapshot = snapshot
+
+    async def gas_price(self) -> int:
+        return (await self.get()).gas_price
+
+    async def refresh_gas_price(self) -> int:
+        # Новый блок: снимок обновляется независимо от ttl, чтобы ожидающие газ увидели свежую цену
+        async with self._lock:
+            self._snapshot = await self._fetch()
+            return self._snapshot.gas_price
+
+
+class GasOracleRegistry:
+
+    def __init__(self, ttl: float = 3.0, base_fee_multiplier: float = 2.0):
+        self._ttl = ttl
+        self._base_fee_multiplier = base_fee_multiplier
+        self._oracles: dict[str, GasOracle] = {}
+
+    def configure(self, ttl: float, base_fee_multiplier: float | None = None):
+        self._ttl = ttl
+        if base_fee_multiplier:
+            self._base_fee_multiplier = base_fee_multiplier
+        for oracle in self._oracles.values():
+            oracle._ttl = ttl
+            oracle._base_fee_multiplier = self._base_fee_multiplier
+
+    def get(self, client) -> GasOracle:
+        slug = client.network.slug
+        oracle = self._oracles.get(slug)
+        if oracle is None:
+            oracle = self._oracles[slug] = GasOracle(client, ttl=self._ttl, base_fee_multiplier=self._base_fee_multiplier)
+        return oracle
+
+
+gas_oracles = GasOracleRegistry()
@@ -0,0 +1,214 @@
+import csv
+import json
+import os
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+from core.metrics import error_class, metrics
+
+# После этих событий буфер сбрасывается сразу: отправленная транзакция и её итог не должны
+# теряться при аварийном завершении до следующей записи
+DURABLE_EVENTS = {"tx_sent", "tx_success", "tx_failed", "tx_reconciled"}
+
+REPORT_FIELDS = ["WalletAddress", "TransactionIndex", "SourceNetwork", "FromToken",
+                 "DestinationNetwork", "ToToken", "Amount", "USDVolume", "Status", "Error"]
+
+
+class JsonlJournalBackend:
+    # Append-only JSONL: события буферизуются и сбрасываются на диск с fsync пачками
+    # (события из DURABLE_EVENTS - сразу)
+
+    def __init__(self, path: str, flush_every: int = 20, flush_interval: float = 1.0):
+        self._path = path
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._buffer: list[str] = []
+        self._last_flush = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def append(self, event: dict):
+        self._buffer.append(json.dumps(event, ensure_ascii=False))
+        if len(self._buffer) >= self._flush_every or time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def iter_events(self, session_id: str | None = None):
+        self.flush()
+        # Файл хранит все прошлые сессии: чужие строки отсекаются по подстроке, без json.loads
+        marker = json.dumps({"session": session_id})[1:-1] if session_id is not None else None
+        with open(self._path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or (marker is not None and marker not in line):
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # Недописанная строка после аварийного завершения
+                    continue
+                if session_id is None or event.get("session") == session_id:
+                    yield event
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class SqliteJournalBackend:
+
+    def __init__(self, path: str, flush_every: int = 20, flush_interval: float = 1.0):
+        self._flush_every = flush_every
+        self._flush_interval = flush_interval
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=FULL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session TEXT, ts REAL, event TEXT, payload TEXT)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS events_session ON events(session)")
+        self._connection.commit()
+
+    def append(self, event: dict):
+        self._connection.execute(
+            "INSERT INTO events (session, ts, event, payload) VALUES (?, ?, ?, ?)",
+            (event.get("session"), event.get("ts"), event.get("event"), json.dumps(event, ensure_ascii=False))
+        )
+        self._pending += 1
+        if self._pending >= self._flush_every or time.monotonic() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._connection.commit()
+            self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def iter_events(self, session_id: str | None = None):
+        self.flush()
+        if session_id is None:
+            cursor = self._connection.execute("SELECT payload FROM events ORDER BY id")
+        else:
+            cursor = self._connection.execute("SELECT payload FROM events WHERE session = ? ORDER BY id", (session_id,))
+        for (payload,) in cursor:
+            yield json.loads(payload)
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+
+class TransactionJournal:
+    # Журнал событий жизненного цикла транзакций; отчёты CSV строятся из него по запросу
+
+    def __init__(self, backend, session_id: str | None = None):
+        self._backend = backend
+        self.session_id = session_id or uuid.uuid4().hex
+
+    @classmethod
+    def open(cls, backend: str = "jsonl", path: str | None = None, session_id: str | None = None):
+        if backend == "sqlite":
+            return cls(SqliteJournalBackend(path or "data/journal.sqlite3"), session_id)
+        if backend == "jsonl":
+            return cls(JsonlJournalBackend(path or "data/journal.jsonl"), session_id)
+        raise ValueError(f"Неизвестный тип журнала: {backend}. Поддерживаются: jsonl, sqlite")
+
+    def record(self, event: str, **fields):
+        self._backend.append({"session": self.session_id, "ts": time.time(), "event": event, **fields})
+        if event in DURABLE_EVENTS:
+            self._backend.flush()
+
+    def record_result(self, row: dict, summary: bool = True):
+        event = "tx_success" if row.get("Status") == "SUCCESS" else "tx_failed"
+        self.record(event, summary=summary, **row)
+        metrics.inc("transactions_total", {
+            "network": row.get("SourceNetwork", ""),
+            "status": row.get("Status", ""),
+            "error_class": error_class(row.get("Error")) if event == "tx_failed" else ""
+        })
+
+    def iter_results(self, status: str | None = None):
+        for event in self._backend.iter_events(self.session_id):
+            if event["event"] not in ("tx_success", "tx_failed"):
+                continue
+            if status is not None and event.get("Status") != status:
+                continue
+            yield event
+
+    @staticmethod
+    def _add_to_stats(stats: dict, row: dict):
+        if not row.get("summary", True):
+            return
+        wallet_stats = stats.setdefault(row["WalletAddress"], {"transactions_count": 0, "net_token_dollars": {}})
+        wallet_stats["transactions_count"] += 1
+        pair = (row["SourceNetwork"], row["FromToken"])
+        wallet_stats["net_token_dollars"][pair] = wallet_stats["net_token_dollars"].get(pair, 0.0) + row["USDVolume"]
+
+    def build_stats(self) -> dict:
+        stats = {}
+        for row in self.iter_results("SUCCESS"):
+            self._add_to_stats(stats, row)
+        return stats
+
+    def write_reports(self, prefix: str = "") -> list[str]:
+        # Один проход по журналу: статистика для summary и строки обоих CSV транзакций
+        paths = {"SUCCESS": f"{prefix}successful_transactions.csv", "FAILED": f"{prefix}failed_transactions.csv"}
+        stats = {}
+        files, writers = {}, {}
+        try:
+            for row in self.iter_results():
+                status = row.get("Status")
+                if status == "SUCCESS":
+                    self._add_to_stats(stats, row)
+                if status not in paths:
+                    continue
+                writer = writers.get(status)
+                if writer is None:
+                    files[status] = open(paths[status], "w", newline="", encoding="utf-8-sig")
+                    writer = writers[status] = csv.DictWriter(files[status], fieldnames=REPORT_FIELDS, delimiter=';',
+                                                              extrasaction="ignore")
+                    writer.writeheader()
+                writer.writerow(row)
+        finally:
+            for f in files.values():
+                f.close()
+
+        current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        all_pairs = set()
+        for info in stats.values():
+            all_pairs.update(info["net_token_dollars"])
+        col_names = sorted(f"{net_slug}-{token_sym}" for (net_slug, token_sym) in all_pairs)
+
+        summary_path = f"{prefix}summary.csv"
+        with open(summary_path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.DictWriter(f, fieldnames=["Date", "WalletAddress", "TotalTransactions"] + col_names, delimiter=';')
+            writer.writeheader()
+            for wal, info in stats.items():
+                row = {"WalletAddress": wal, "TotalTransactions": info["transactions_count"], "Date": current_date}
+                for (net_slug, token_sym) in all_pairs:
+                    usd_amount = info["net_token_dollars"].get((net_slug, token_sym), 0.0)
+                    row[f"{net_slug}-{token_sym}"] = f"{usd_amount:.2f}$"
+                writer.writerow(row)
+        return [summary_path] + [paths[status] for status in paths if status in files]
+
+    def flush(self):
+        self._backend.flush()
+
+    def close(self):
+        self._backend.close()
@@ -1,27 +1,28 @@
-import logging
-import requests
-from requests.exceptions import Timeout
-import asyncio
 import random
-import json
+import time
 from web3 import Web3
 from core.baseSwap import BaseSwapCommand
-from data.config import JUMPER_NETWORKS_NAME, JUMPER_CHAIN_IDS
+from data.config import JUMPER_CHAIN_IDS
 from utils.allowance_approve import check_allowance_or_approve
 from libraries.funcutils import random_sleep
 from core.builder import TransactionBuilder
-from utils.binance_token import get_token_price
-from utils.proxy_utils import get_proxy_dict
-from eth_abi import encode, decode
-
-with open("data/config_bridge.json", "r", encoding="utf-8") as f:
-    config_json = json.load(f)
+from core.gas_gate import gas_gates
+from core.lifi_client import lifi_client
+from core.stargate_codec import rewrite_stargate_calldata
+from core.metrics import metrics
+from core.tracing import tracer
+from core.allowance_cache import allowance_cache
+from core.gas_limits import gas_limits
 
 class BaseJumperCompatibleCommand(BaseSwapCommand):
     def __init__(self, transaction_builder_cls=TransactionBuilder, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._transaction_builder = transaction_builder_cls(self._client)
         self._bridge_mode = None
+        # Вызывается с хэшем сразу после отправки транзакции, до ожидания квитанции
+        self.on_transaction_sent = None
+        # PreflightSnapshot: балансы, allowance, nonce и газ, полученные одним batch-запросом
+        self.preflight = None
 
     async def _get_swap_data(self) -> dict:
         if self._from_token is None:
@@ -31,21 +32,15 @@ class BaseJumperCompatibleCommand(BaseSwapCommand):
 
         from_token = Web3.to_checksum_address(self._from_token.address)
         to_token = Web3.to_checksum_address(self._to_token.address)
-        base_url = "https://li.quest/v1/quote"
         from_chain = JUMPER_CHAIN_IDS[self._client.network.slug]
         to_chain = JUMPER_CHAIN_IDS[self._settings.to_network.lower()]
         from_address = Web3.to_checksum_address(self._account_client.address)
-        try:
-            token_price = await get_token_price(self._from_token.symbol)
-        except ValueError:
-            token_price = 1.0
-
         ether_amount = float(self._from_token_amount.Ether)
         decimals = int(self._from_token.decimals)
         from_amount = int(ether_amount * (10 ** decimals))
 
-        bridge_mode_config = config_json.get("bridgeMode", {"fast": 70, "slow": 30})
-        random_bridge_chance = config_json.get("random_bridge", 0)
+        bridge_mode_config = self._settings.bridge_mode
+        random_bridge_chance = self._settings.random_bridge
         rand_val = random.random() * 100
 
         params = {
@@ -67,27 +62,28 @@ class BaseJumperCompatibleCommand(BaseSwapCommand):
                 params["allowBridges"] = "stargateV2Bus"
                 self._bridge_mode = "slow"
 
-        req = requests.Request("GET", base_url, params=params).prepare()
-        full_url = req.url
-
-        proxies = get_proxy_dict()
-        try:
-            response = requests.get(
-                full_url,
-                headers={"accept": "application/json"},
-                timeout=30,
-                proxies=proxies
-            )
-            if not response.ok:
-                raise ValueError(f"Ошибка API Stargate: {response.status_code}, {response.text}")
-        except Timeout:
-            raise
-        quote = response.json()
+        with tracer.span("quote"):
+            tracer.annotate(bridge_mode=self._bridge_mode)
+            quote = await lifi_client.get_quote(params)
         if 'action' not in quote or 'estimate' not in quote:
             raise ValueError(f"Некорректный ответ API: {quote}")
 
         return quote
 
+    async def wait_for_gas_price(self):
+        # Вызывается до _swap и вне его таймаута: ожидание газа может длиться сколько угодно
+        if not self._settings.gas_price_limits or self._client.network.slug not in self._settings.gas_price_limits:
+            return
+        allowed_gas_price_gwei = self._settings.gas_price_limits[self._client.network.slug]
+        allowed_gas_price = allowed_gas_price_gwei * (10 ** 9)
+
+        # Общий для сети шлюз отпускает аккаунт на первом блоке с ценой не выше лимита,
+        # а слот потоков на время ожидания отдаётся другим аккаунтам
+        wait_started = time.monotonic()
+        with tracer.span("gas_wait", gas_price_limit_gwei=allowed_gas_price_gwei):
+            await gas_gates.get(self._client).wait_below(int(allowed_gas_price))
+        metrics.observe("gas_wait_seconds", time.monotonic() - wait_started, {"network": self._client.network.slug})
+
     async def _swap(self):
         quote_data = await self._get_swap_data()
         tx_request = quote_data["transactionRequest"]
@@ -98,93 +94,81 @@ class BaseJumperCompatibleCommand(BaseSwapCommand):
             self._from_token_amount.Wei = api_from_amount
             self._from_token_amount.Ether = api_from_amount / (10 ** self._from_token.decimals)
 
-        data = tx_request['data']
-        new_data = data
-
+        new_data = tx_request['data']
         if self._bridge_mode in ["fast", "slow"]:
-            if data.startswith('0x'):
-                data = data[2:]
-            function_selector = data[:8]
-            encoded_params = bytes.fromhex(data[8:])
-
-            param_types = [
-                '(bytes32,string,string,address,address,address,uint256,uint256,bool,bool)',
-                '(uint16,(uint32,bytes32,uint256,uint256,bytes,bytes,bytes),(uint256,uint256),address)'
-            ]
-
-            try:
-                decoded_params = decode(param_types, encoded_params)
-                tuple1 = list(decoded_params[0])
-                if tuple1[2] == 'lifi-api':
-                    tuple1[2] = 'jumper.exchange'
-                tuple1[6] = api_from_amount
-                tuple2 = list(decoded_params[1])
-                tuple2_inner = list(tuple2[1])
-                tuple2_inner[2] = api_from_amount
-                tuple2_inner[6] = bytes([0])
-                tuple2[1] = tuple(tuple2_inner)
-                new_encoded_params = encode(param_types, [tuple(tuple1), tuple(tuple2)])
-                new_data = '0x' + function_selector + new_encoded_params.hex()
-            except Exception as e:
-                raise ValueError(f"Не удалось перекодировать данные транзакции: {e}")
+            new_data = rewrite_stargate_calldata(new_data, api_from_amount)
 
         value_hex = tx_request.get("value", "0x0")
         value_int = int(value_hex, 16)
 
-        gas_limit_hex = tx_request.get("gasLimit", "0x5208")
-        gas_limit_int = int(gas_limit_hex, 16)
+        # Без gasLimit в котировке лимит выберет gas_limits (кэш gasUsed маршрута или оценка)
+        gas_limit_hex = tx_request.get("gasLimit")
+        gas_limit_int = int(gas_limit_hex, 16) if gas_limit_hex else None
 
+        spender_address = quote_data['estimate']['approvalAddress']
         if not self._is_from_token_native:
-            await check_allowance_or_approve(
-                account_client=self._account_client,
-                token_amount=self._from_token_amount,
-                allowance_factor=self._settings.allowance,
-                spender_address=quote_data['estimate']['approvalAddress']
+            with tracer.span("allowance"):
+                approved = await check_allowance_or_approve(
+                    account_client=self._account_client,
+                    token_amount=self._from_token_amount,
+                    allowance_factor=self._settings.allowance,
+                    spender_address=spender_address,
+                    known_allowance=self.preflight.allowance_for(spender_address) if self.preflight else None,
+                    approval_policy=self._settings.approval_policy
+                )
+            if approved:
+                with tracer.span("delay_after_approve"):
+                    await random_sleep(*self._settings.delay_after_approve)
+
+        adjusted_gas = int(gas_limit_int * 1.2) if gas_limit_int else None
+        gas_token = None if self._is_from_token_native else self._from_token.address
+
+        with tracer.span("build"):
+            txn_dict = await self._transaction_builder.build_transaction_with_raw_data(
+                from_address=Web3.to_checksum_address(self._account_client.address),
+                to_address=Web3.to_checksum_address(tx_request['to']),
+                value=value_int,
+                data=new_data,
+                gas=adjusted_gas,
+                token=gas_token
             )
-            await random_sleep(*self._settings.delay_after_approve)
-
-        if self._settings.gas_price_limits and self._client.network.slug in self._settings.gas_price_limits:
-            allowed_gas_price_gwei = self._settings.gas_price_limits[self._client.network.slug]
-            allowed_gas_price = allowed_gas_price_gwei * (10 ** 9)
-            current_gas_price = self._client.web3.eth.gas_price
-
-            while current_gas_price > allowed_gas_price:
-                await asyncio.sleep(60)
-                current_gas_price = self._client.web3.eth.gas_price
-
-        adjusted_gas = int(gas_limit_int * 1.2)
-
-        txn_dict = await self._transaction_builder.build_transaction_with_raw_data(
-            from_address=Web3.to_checksum_address(self._account_client.address),
-            to_address=Web3.to_checksum_address(tx_request['to']),
-            value=value_int,
-            data=new_data,
-            gas=adjusted_gas
-        )
-
-        max_retries = 1
-        retry = 0
-        while True:
-            try:
-                txn_hash = await self._account_client.commit_transaction(txn_dict)
-                break
-            except Exception as e:
-                error_text = str(e).lower()
-                if "max fee per gas" in error_text and "less than" in error_text and retry < max_retries:
-                    if "maxFeePerGas" in txn_dict:
-                        old_fee = txn_dict["maxFeePerGas"]
-                        txn_dict["maxFeePerGas"] = int(old_fee * 1.1)
-                        retry += 1
-                        continue
-                raise
+
         try:
-            receipt = self._client.web3.eth.wait_for_transaction_receipt(
-                txn_hash,
-                timeout=300,
-                poll_latency=5
-            )
-        except Exception as e:
+            max_retries = 1
+            retry = 0
+            while True:
+                try:
+                    txn_hash = await self._account_client.commit_transaction(txn_dict)
+                    break
+                except Exception as e:
+                    error_text = str(e).lower()
+                    if "max fee per gas" in error_text and "less than" in error_text and retry < max_retries:
+                        if "maxFeePerGas" in txn_dict:
+                            old_fee = txn_dict["maxFeePerGas"]
+                            txn_dict["maxFeePerGas"] = int(old_fee * 1.1)
+                            retry += 1
+                            continue
+                    raise
+            if self.on_transaction_sent is not None:
+                self.on_transaction_sent(txn_hash)
+            with tracer.span("receipt", tx_hash=txn_hash):
+                receipt = await self._client.wait_for_transaction_receipt(
+                    txn_hash, timeout=300, kind="bridge", sender=self._account_client.address
+                )
+        except BaseException:
+            # Транзакция могла уйти в сеть (ошибка после отправки, таймаут квитанции или отмена свапа):
+            # сколько allowance потрачено - неизвестно, в следующий раз он читается из сети
+            if not self._is_from_token_native:
+                allowance_cache.invalidate(self._client, self._account_client.address, self._from_token.address,
+                                           spender_address)
             raise
+        gas_limits.record(self._client, txn_dict["to"], txn_dict["data"], receipt, token=gas_token)
+        if not self._is_from_token_native:
+            if receipt.get("status") == 1:
+                allowance_cache.spend(self._client, self._account_client.address, self._from_token.address,
+                                      spender_address, int(self._from_token_amount.Wei))
+            else:
+                allowance_cache.invalidate(self._client, self._account_client.address, self._from_token.address, spender_address)
 
         to_amount_raw = quote_data.get("estimate", {}).get("toAmount")
         if to_amount_raw is not None:
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+import aiohttp
+from utils.proxy_utils import get_proxy, is_socks_proxy, make_connector, request_proxy
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LifiQuoteClient:
+    # Общая aiohttp-сессия для li.quest: ограничение параллельных запросов,
+    # повторы на 429/5xx с учётом rate-limit заголовков и замер задержки каждого запроса
+
+    def __init__(self, base_url: str = "https://li.quest/v1", concurrency: int = 5, max_retries: int = 4,
+                 timeout: float = 30, pool_size: int = 20):
+        self.base_url = base_url
+        self._concurrency = concurrency
+        self._max_retries = max_retries
+        self._timeout = timeout
+        self._pool_size = pool_size
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._sessions: dict[str | None, aiohttp.ClientSession] = {}
+        self.latencies = deque(maxlen=1000)
+
+    def configure(self, base_url: str | None = None, concurrency: int | None = None):
+        if base_url:
+            self.base_url = base_url.rstrip("/")
+        if concurrency and concurrency != self._concurrency:
+            self._concurrency = concurrency
+            self._semaphore = asyncio.Semaphore(concurrency)
+
+    def _get_session(self, proxy: str | None = None) -> aiohttp.ClientSession:
+        # Общая сессия для запросов без прокси и через http(s)-прокси, своя - на каждый socks-прокси
+        key = proxy if is_socks_proxy(proxy) else None
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = self._sessions[key] = aiohttp.ClientSession(
+                connector=make_connector(key, limit=self._pool_size),
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+                headers={"accept": "application/json"}
+            )
+        return session
+
+    def _retry_delay(self, headers, attempt: int) -> float:
+        for header in ("Retry-After", "RateLimit-Reset", "X-RateLimit-Reset"):
+            value = headers.get(header)
+            if not value:
+                continue
+            try:
+                delay = float(value)
+                # Некоторые API отдают unix-время сброса лимита, а не секунды
+                if delay > 1e9:
+                    delay -= time.time()
+                return max(delay, 0.5)
+            except ValueError:
+                try:
+                    return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.5)
+                except (TypeError, ValueError):
+                    continue
+        return min(2 ** attempt, 30)
+
+    def latency_summary(self) -> dict:
+        if not self.latencies:
+            return {"count": 0}
+        ordered = sorted(self.latencies)
+        return {
+            "count": len(ordered),
+            "p50": ordered[len(ordered) // 2],
+            "p95": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)],
+            "max": ordered[-1]
+        }
+
+    async def get_quote(self, params: dict) -> dict:
+        url = f"{self.base_url}/quote"
+        query = {key: str(value) for key, value in params.items()}
+        last_error = None
+        for attempt in range(self._max_retries + 1):
+            delay = None
+            proxy = get_proxy()
+            session = self._get_session(proxy)
+            async with self._semaphore:
+                started = time.monotonic()
+                try:
+                    async with session.get(url, params=query, proxy=request_proxy(proxy)) as response:
+                        text = await response.text()
+                        self.latencies.append(time.monotonic() - started)
+                        metrics.observe("lifi_quote_duration_seconds", time.monotonic() - started)
+                        metrics.inc("lifi_quote_responses_total", {"status": str(response.status)})
+                        if response.status in RETRY_STATUSES:
+                            last_error = f"{response.status}, {text}"
+                            delay = self._retry_delay(response.headers, attempt)
+                        elif response.status >= 400:
+                            raise ValueError(f"Ошибка API Stargate: {response.status}, {text}")
+                        else:
+                            return json.loads(text)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    self.latencies.append(time.monotonic() - started)
+                    metrics.observe("lifi_quote_duration_seconds", time.monotonic() - started)
+                    metrics.inc("lifi_quote_responses_total", {"status": type(e).__name__})
+                    last_error = f"{type(e).__name__}: {e}"
+                    delay = min(2 ** attempt, 30)
+            if attempt < self._max_retries:
+                logger.info(f"Запрос котировки LI.FI не удался ({last_error}), повтор через {delay:.1f} сек")
+                await asyncio.sleep(delay)
+        raise ValueError(f"Ошибка API Stargate после {self._max_retries + 1} попыток: {last_error}")
+
+    async def close(self):
+        for session in self._sessions.values():
+            if not session.closed:
+                await session.close()
+        self._sessions.clear()
+
+
+lifi_client = LifiQuoteClient()
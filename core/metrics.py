@@ -0,0 +1,161 @@
+import logging
+import math
+import os
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм в секундах: от быстрых RPC до ожидания газа и подтверждений
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+METRIC_HELP = {
+    "rpc_request_duration_seconds": "Длительность JSON-RPC запроса по сети и методу",
+    "rpc_errors_total": "Ошибки JSON-RPC по сети, методу и классу ошибки",
+    "lifi_quote_duration_seconds": "Длительность запроса котировки LI.FI",
+    "lifi_quote_responses_total": "Ответы LI.FI по HTTP-статусу",
+    "tx_confirmation_seconds": "Время от отправки транзакции до квитанции",
+    "gas_wait_seconds": "Ожидание снижения цены газа до лимита из gasPriceLimits",
+    "delay_seconds": "Настроенные задержки между транзакциями и аккаунтами",
+    "accounts_in_progress": "Аккаунты, занимающие слот потоков прямо сейчас",
+    "accounts_waiting_gas": "Аккаунты, отдавшие слот потоков на время ожидания газа",
+    "transactions_total": "Транзакции по сети, статусу и классу ошибки",
+    "gas_limit_source_total": "Откуда взят лимит газа: provided, cache или estimate",
+}
+
+
+def error_class(error) -> str:
+    # Грубая классификация ошибок для меток: сообщения RPC и API различаются от сети к сети
+    text = str(error).lower()
+    if isinstance(error, TimeoutError) or "timeout" in text or "timed out" in text:
+        return "timeout"
+    if "insufficient" in text:
+        return "insufficient_funds"
+    if "nonce" in text:
+        return "nonce"
+    if "revert" in text or "on-chain" in text:
+        return "reverted"
+    if "max fee per gas" in text or "underpriced" in text:
+        return "gas_price"
+    if "api" in text or "котировк" in text:
+        return "quote"
+    return type(error).__name__ if isinstance(error, BaseException) else "other"
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    # Счётчики, gauge и гистограммы в памяти процесса; отдаются в формате Prometheus
+    # на /metrics (если задан metricsPort) и сохраняются в файл в конце режима
+
+    def __init__(self):
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._gauges: dict[tuple[str, tuple], float] = {}
+        self._histograms: dict[tuple[str, tuple], Histogram] = {}
+        self._runner: web.AppRunner | None = None
+
+    @staticmethod
+    def _key(name: str, labels: dict | None) -> tuple[str, tuple]:
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name: str, labels: dict | None = None, value: float = 1):
+        key = self._key(name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge_add(self, name: str, value: float, labels: dict | None = None):
+        key = self._key(name, labels)
+        self._gauges[key] = self._gauges.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: dict | None = None):
+        key = self._key(name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(value)
+
+    @staticmethod
+    def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = []
+        for key, value in pairs:
+            value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+            escaped.append(f'{key}="{value}"')
+        return "{" + ",".join(escaped) + "}"
+
+    @staticmethod
+    def _format_value(value: float) -> str:
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+    def render(self) -> str:
+        lines = []
+        families: dict[str, list] = {}
+        for (name, labels), value in self._counters.items():
+            families.setdefault(name, ["counter", []])[1].append((labels, value))
+        for (name, labels), value in self._gauges.items():
+            families.setdefault(name, ["gauge", []])[1].append((labels, value))
+        for (name, labels), histogram in self._histograms.items():
+            families.setdefault(name, ["histogram", []])[1].append((labels, histogram))
+
+        for name in sorted(families):
+            kind, samples = families[name]
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, sample in sorted(samples, key=lambda item: item[0]):
+                if kind != "histogram":
+                    lines.append(f"{name}{self._format_labels(labels)} {self._format_value(sample)}")
+                    continue
+                # counts уже накопительные: observe увеличивает все корзины с границей >= значения
+                for bound, count in zip(sample.buckets, sample.counts):
+                    lines.append(f"{name}_bucket{self._format_labels(labels, (('le', self._format_value(bound)),))} {count}")
+                lines.append(f"{name}_bucket{self._format_labels(labels, (('le', '+Inf'),))} {sample.count}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {self._format_value(sample.sum)}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {sample.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        logger.info(f"Метрики сохранены в {path}")
+
+    async def start_server(self, port: int, host: str = "127.0.0.1"):
+        if self._runner is not None:
+            return
+
+        async def handle_metrics(request):
+            return web.Response(text=self.render(), content_type="text/plain", charset="utf-8",
+                                headers={"X-Content-Type-Options": "nosniff"})
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+
+    async def stop_server(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics = MetricsRegistry()
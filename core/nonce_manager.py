@@ -0,0 +1,60 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NonceManager:
+    # Локальная выдача nonce по (chain_id, address): синхронизация с сетью при первой выдаче,
+    # дальше nonce выдаются из памяти и живут всю сессию между режимами. После ошибки отправки
+    # или таймаута квитанции счётчик сбрасывается и перечитывается из сети при следующей выдаче
+
+    def __init__(self):
+        self._next_nonce: dict[tuple[int, str], int] = {}
+        self._locks: dict[tuple[int, str], asyncio.Lock] = {}
+
+    def _key(self, client, address: str) -> tuple[int, str]:
+        return client.network.chain_id, address.lower()
+
+    def _lock(self, key) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    @staticmethod
+    def block_id(client) -> str:
+        return "latest" if client.network.slug == "abstract" else "pending"
+
+    async def _fetch(self, client, address: str) -> int:
+        return await client.web3.eth.get_transaction_count(address, self.block_id(client))
+
+    def is_synced(self, client, address: str) -> bool:
+        return self._key(client, address) in self._next_nonce
+
+    def seed(self, client, address: str, nonce: int):
+        # Nonce из preflight-батча; уже выданные локально nonce не перезаписываем
+        self._next_nonce.setdefault(self._key(client, address), nonce)
+
+    def invalidate(self, client, address: str):
+        self._next_nonce.pop(self._key(client, address), None)
+
+    async def allocate(self, client, address: str) -> int:
+        key = self._key(client, address)
+        async with self._lock(key):
+            if key not in self._next_nonce:
+                self._next_nonce[key] = await self._fetch(client, address)
+            nonce = self._next_nonce[key]
+            self._next_nonce[key] = nonce + 1
+            return nonce
+
+    async def resync(self, client, address: str) -> int:
+        key = self._key(client, address)
+        async with self._lock(key):
+            nonce = await self._fetch(client, address)
+            logger.info(f"[{address}] Nonce пересинхронизирован с сетью {client.network.slug}: {nonce}")
+            self._next_nonce[key] = nonce
+            return nonce
+
+
+nonce_manager = NonceManager()
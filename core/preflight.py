@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from web3 import Web3
+from core.gas_oracle import gas_oracles
+from core.nonce_manager import nonce_manager
+from core.allowance_cache import allowance_cache
+from core import erc20
+from data.config import LIFI_DIAMOND_ADDRESS, LIFI_DIAMOND_ADDRESSES
+
+logger = logging.getLogger(__name__)
+
+FEE_HISTORY_BLOCKS = 5
+FEE_HISTORY_PERCENTILE = 50
+
+
+def get_lifi_spender(network_slug: str) -> str:
+    return LIFI_DIAMOND_ADDRESSES.get(network_slug, LIFI_DIAMOND_ADDRESS)
+
+
+def _to_int(value) -> int:
+    if isinstance(value, str):
+        return int(value, 16) if value not in ("0x", "") else 0
+    return int(value)
+
+
+class PreflightSnapshot:
+    # Всё, что нужно транзакции до отправки, одним снимком
+
+    def __init__(self, token, native_token, token_balance_wei: int, native_balance_wei: int,
+                 allowance: int | None, spender: str | None, nonce: int | None, gas):
+        self.token = token
+        self.native_token = native_token
+        self.token_balance_wei = token_balance_wei
+        self.native_balance_wei = native_balance_wei
+        self.allowance = allowance
+        self.spender = spender
+        self.nonce = nonce
+        self.gas = gas
+
+    @property
+    def token_balance(self) -> float:
+        return self.token_balance_wei / (10 ** self.token.decimals)
+
+    @property
+    def native_balance(self) -> float:
+        return self.native_balance_wei / (10 ** self.native_token.decimals)
+
+    def allowance_for(self, spender: str) -> int | None:
+        if self.allowance is None or self.spender is None or spender.lower() != self.spender.lower():
+            return None
+        return self.allowance
+
+
+async def _preflight_sequential(client, address, token, native_token, spender, allowance):
+    web3 = client.web3
+    calls = [web3.eth.get_balance(address)]
+    if not token.is_native:
+        calls.append(web3.eth.call({"to": Web3.to_checksum_address(token.address),
+                                    "data": erc20.hex_data(erc20.balance_of_data(address))}))
+        if spender and allowance is None:
+            calls.append(web3.eth.call({"to": Web3.to_checksum_address(token.address),
+                                        "data": erc20.hex_data(erc20.allowance_data(address, spender))}))
+    results = await asyncio.gather(*calls)
+    native_balance = results[0]
+    token_balance = erc20.decode_uint(results[1]) if not token.is_native else native_balance
+    if len(results) > 2:
+        allowance = erc20.decode_uint(results[2])
+        allowance_cache.set(client, address, token.address, spender, allowance)
+    gas = await gas_oracles.get(client).get()
+    return PreflightSnapshot(token, native_token, token_balance, native_balance, allowance, spender, None, gas)
+
+
+async def run_preflight(client, address: str, token, native_token, spender: str | None = None) -> PreflightSnapshot:
+    # Независимые чтения перед свапом одним JSON-RPC batch; nonce и газ, уже известные локально, не запрашиваются
+    address = Web3.to_checksum_address(address)
+    if token.is_native:
+        spender = None
+    oracle = gas_oracles.get(client)
+    gas = oracle.cached()
+    # Allowance из кэша (prefetch перед режимом или прошлый свап) повторно не запрашивается
+    cached_allowance = allowance_cache.get(client, address, token.address, spender) if spender else None
+
+    requests = [("eth_getBalance", [address, "latest"])]
+    if not token.is_native:
+        token_address = Web3.to_checksum_address(token.address)
+        requests.append(("eth_call", [{"to": token_address, "data": erc20.hex_data(erc20.balance_of_data(address))}, "latest"]))
+        if spender and cached_allowance is None:
+            requests.append(("eth_call", [
+                {"to": token_address, "data": erc20.hex_data(erc20.allowance_data(address, spender))},
+                "latest"
+            ]))
+    need_nonce = not nonce_manager.is_synced(client, address)
+    if need_nonce:
+        requests.append(("eth_getTransactionCount", [address, nonce_manager.block_id(client)]))
+    if gas is None:
+        requests.append(("eth_gasPrice", []))
+        requests.append(("eth_feeHistory", [hex(FEE_HISTORY_BLOCKS), "latest", [FEE_HISTORY_PERCENTILE]]))
+
+    try:
+        responses = await client.web3.provider.make_batch_request(requests)
+        if not isinstance(responses, list) or len(responses) != len(requests):
+            raise ValueError(f"некорректный ответ на batch: {responses}")
+    except Exception as e:
+        logger.debug(f"Batch-запросы недоступны в сети {client.network.slug}: {e}")
+        return await _preflight_sequential(client, address, token, native_token, spender, cached_allowance)
+
+    results = iter(responses)
+
+    def next_result(required: bool = True):
+        response = next(results)
+        if "error" in response:
+            if required:
+                raise ValueError(f"Ошибка RPC в preflight ({client.network.slug}): {response['error']}")
+            return None
+        return response["result"]
+
+    native_balance = _to_int(next_result())
+    token_balance = native_balance
+    allowance = cached_allowance
+    if not token.is_native:
+        token_balance = _to_int(next_result())
+        if spender and cached_allowance is None:
+            allowance = _to_int(next_result())
+            allowance_cache.set(client, address, token.address, spender, allowance)
+    nonce = None
+    if need_nonce:
+        nonce = _to_int(next_result())
+        nonce_manager.seed(client, address, nonce)
+    if gas is None:
+        gas_price = next_result(required=False)
+        fee_history = next_result(required=False)
+        if gas_price is not None and fee_history is not None:
+            gas = oracle.snapshot_from_fee_history({
+                "baseFeePerGas": [_to_int(value) for value in fee_history["baseFeePerGas"]],
+                "reward": [[_to_int(value) for value in reward] for reward in fee_history.get("reward") or []],
+                "oldestBlock": _to_int(fee_history["oldestBlock"])
+            }, _to_int(gas_price))
+        if gas is not None:
+            oracle.seed(gas)
+        else:
+            # feeHistory без reward или не поддерживается - оракул запросит газ сам
+            gas = await oracle.get()
+
+    return PreflightSnapshot(token, native_token, token_balance, native_balance, allowance, spender, nonce, gas)
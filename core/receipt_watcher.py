@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from web3.datastructures import AttributeDict
+from web3.exceptions import TimeExhausted
+from web3._utils.method_formatters import receipt_formatter
+
+logger = logging.getLogger(__name__)
+
+
+class ReceiptWatcher:
+    # Один на сеть: следит за новыми блоками и на каждый блок проверяет все ожидаемые
+    # хэши одним batch-запросом eth_getTransactionReceipt
+
+    def __init__(self, client, poll_interval: float = 1.0, max_batch_size: int = 100):
+        self._client = client
+        self._poll_interval = poll_interval
+        self._max_batch_size = max_batch_size
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self._last_block = None
+        self._task: asyncio.Task | None = None
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._last_block = None
+            self._task = asyncio.create_task(self._run())
+
+    async def _fetch_receipts(self, hashes: list[str]) -> list[dict | None]:
+        provider = self._client.web3.provider
+        receipts = []
+        for i in range(0, len(hashes), self._max_batch_size):
+            chunk = hashes[i:i + self._max_batch_size]
+            try:
+                responses = await provider.make_batch_request(
+                    [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in chunk]
+                )
+                receipts.extend(response.get("result") if isinstance(response, dict) else None for response in responses)
+            except Exception as e:
+                logger.debug(f"Batch-запрос квитанций не удался в сети {self._client.network.slug}: {e}")
+                responses = await asyncio.gather(
+                    *(provider.make_request("eth_getTransactionReceipt", [tx_hash]) for tx_hash in chunk),
+                    return_exceptions=True
+                )
+                receipts.extend(response.get("result") if isinstance(response, dict) else None for response in responses)
+        return receipts
+
+    async def _check_pending(self):
+        hashes = list(self._pending)
+        receipts = await self._fetch_receipts(hashes)
+        for tx_hash, raw_receipt in zip(hashes, receipts):
+            if not raw_receipt:
+                continue
+            receipt = AttributeDict.recursive(receipt_formatter(raw_receipt))
+            for future in self._pending.pop(tx_hash, []):
+                if not future.done():
+                    future.set_result(receipt)
+
+    async def _run(self):
+        while self._pending:
+            try:
+                block_number = await self._client.web3.eth.block_number
+                if block_number != self._last_block:
+                    self._last_block = block_number
+                    await self._check_pending()
+            except Exception as e:
+                logger.debug(f"Ошибка при проверке квитанций в сети {self._client.network.slug}: {e}")
+            if self._pending:
+                await asyncio.sleep(self._poll_interval)
+
+    async def wait_for_receipt(self, tx_hash, timeout: float = 300):
+        if isinstance(tx_hash, (bytes, bytearray)):
+            tx_hash = "0x" + bytes(tx_hash).hex()
+        tx_hash = tx_hash.lower()
+        if not tx_hash.startswith("0x"):
+            tx_hash = "0x" + tx_hash
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(tx_hash, []).append(future)
+        self._ensure_running()
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeExhausted(f"Transaction {tx_hash} is not in the chain after {timeout} seconds")
+        finally:
+            waiters = self._pending.get(tx_hash)
+            if waiters is not None and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._pending[tx_hash]
+
+
+class ReceiptWatcherRegistry:
+
+    def __init__(self, poll_interval: float = 1.0):
+        self._poll_interval = poll_interval
+        self._watchers: dict[str, ReceiptWatcher] = {}
+
+    def configure(self, poll_interval: float):
+        self._poll_interval = poll_interval
+        for watcher in self._watchers.values():
+            watcher._poll_interval = poll_interval
+
+    def get(self, client) -> ReceiptWatcher:
+        slug = client.network.slug
+        watcher = self._watchers.get(slug)
+        if watcher is None:
+            watcher = self._watchers[slug] = ReceiptWatcher(client, poll_interval=self._poll_interval)
+        return watcher
+
+
+receipt_watchers = ReceiptWatcherRegistry()
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from aiohttp import ClientError
+from web3 import AsyncHTTPProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+from core.metrics import error_class, metrics
+
+logger = logging.getLogger(__name__)
+
+# Запросы, которые должны идти в один и тот же endpoint: отправка и nonce для неё
+PINNED_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction", "eth_getTransactionCount"}
+ENDPOINT_ERRORS = (ClientError, asyncio.TimeoutError, TimeoutError, OSError)
+
+
+class Endpoint:
+    def __init__(self, url: str, provider: AsyncHTTPProvider, index: int):
+        self.url = url
+        self.provider = provider
+        self.index = index
+        self.ewma: float | None = None
+        self.latencies = deque(maxlen=200)
+        self.head: int | None = None
+        self.ejected_until = 0.0
+        self.errors = 0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def p95(self) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+
+class MultiEndpointProvider(AsyncJSONBaseProvider):
+    # Несколько RPC одной сети за одним провайдером: чтение идёт в самый быстрый здоровый endpoint
+    # (EWMA задержки), медленное чтение дублируется во второй после порога p95, запись закреплена
+    # за одним endpoint, а endpoint'ы с ошибками или отстающим блоком временно исключаются
+
+    def __init__(self, rpc_urls: list[str], request_kwargs: dict | None = None, latency_hints: dict | None = None,
+                 hedge: bool = True, hedge_min_samples: int = 20, eject_seconds: float = 30, max_lag: int = 5,
+                 ewma_alpha: float = 0.3, head_interval: float = 15, network: str = "", **kwargs):
+        super().__init__(**kwargs)
+        if not rpc_urls:
+            raise ValueError("Не указан ни один RPC")
+        provider_kwargs = {} if len(rpc_urls) == 1 else {"exception_retry_configuration": None}
+        self.endpoints = [
+            Endpoint(url, AsyncHTTPProvider(url, request_kwargs=request_kwargs, **provider_kwargs), index)
+            for index, url in enumerate(dict.fromkeys(rpc_urls))
+        ]
+        # Задержки из проверки RPC при старте; endpoint без замеров пробуется в первую очередь
+        for endpoint in self.endpoints:
+            endpoint.ewma = (latency_hints or {}).get(endpoint.url)
+        self._hedge = hedge
+        self._hedge_min_samples = hedge_min_samples
+        self._eject_seconds = eject_seconds
+        self._max_lag = max_lag
+        self._ewma_alpha = ewma_alpha
+        self._head_interval = head_interval
+        self._heads_sampled_at = 0.0
+        self._head_task: asyncio.Task | None = None
+        self._pinned: Endpoint | None = None
+        self._network = network
+
+    def __str__(self):
+        return f"RPC connection {', '.join(endpoint.url for endpoint in self.endpoints)}"
+
+    @property
+    def endpoint_uri(self):
+        return self._ranked()[0].url
+
+    def _ranked(self) -> list[Endpoint]:
+        return sorted(self.endpoints, key=lambda endpoint: (
+            not endpoint.healthy,
+            endpoint.ewma if endpoint.ewma is not None else 0.0,
+            endpoint.index
+        ))
+
+    def _record_success(self, endpoint: Endpoint, latency: float):
+        endpoint.latencies.append(latency)
+        endpoint.errors = 0
+        if endpoint.ewma is None or endpoint.ewma == float("inf"):
+            endpoint.ewma = latency
+        else:
+            endpoint.ewma = self._ewma_alpha * latency + (1 - self._ewma_alpha) * endpoint.ewma
+
+    def _eject(self, endpoint: Endpoint, reason: str):
+        if len(self.endpoints) == 1:
+            return
+        endpoint.errors += 1
+        endpoint.ejected_until = time.monotonic() + self._eject_seconds * min(endpoint.errors, 10)
+        if self._pinned is endpoint:
+            self._pinned = None
+        logger.warning(f"RPC {endpoint.url} исключён на {self._eject_seconds * min(endpoint.errors, 10):.0f} сек: {reason}")
+
+    def _track_head(self, endpoint: Endpoint, method: str, response: dict):
+        if method != "eth_blockNumber" or "result" not in response:
+            return
+        head = response["result"]
+        endpoint.head = int(head, 16) if isinstance(head, str) else int(head)
+
+    def _maybe_sample_heads(self):
+        # Блок читается только у выбранного endpoint, поэтому отставание остальных видно лишь
+        # при периодическом опросе eth_blockNumber у всех сразу; опрос запускается самими запросами
+        if len(self.endpoints) == 1 or time.monotonic() - self._heads_sampled_at < self._head_interval:
+            return
+        if self._head_task is None or self._head_task.done():
+            self._heads_sampled_at = time.monotonic()
+            self._head_task = asyncio.ensure_future(self._sample_heads())
+
+    async def _sample_heads(self):
+        for endpoint in self.endpoints:
+            endpoint.head = None
+        await asyncio.gather(*(self._call(endpoint, "eth_blockNumber", []) for endpoint in self.endpoints),
+                             return_exceptions=True)
+        heads = [endpoint.head for endpoint in self.endpoints if endpoint.head is not None]
+        if not heads:
+            return
+        best_head = max(heads)
+        for endpoint in self.endpoints:
+            if endpoint.head is not None and endpoint.healthy and best_head - endpoint.head > self._max_lag:
+                self._eject(endpoint, f"отстаёт на {best_head - endpoint.head} блоков")
+
+    def _observe(self, method: str, latency: float, error=None):
+        labels = {"network": self._network, "method": method}
+        metrics.observe("rpc_request_duration_seconds", latency, labels)
+        if error is not None:
+            metrics.inc("rpc_errors_total", {**labels, "error_class": error_class(error)})
+
+    async def _call(self, endpoint: Endpoint, method, params):
+        started = time.monotonic()
+        try:
+            response = await endpoint.provider.make_request(method, params)
+        except ENDPOINT_ERRORS as e:
+            self._observe(method, time.monotonic() - started, e)
+            self._eject(endpoint, f"{type(e).__name__}: {e}")
+            raise
+        latency = time.monotonic() - started
+        self._observe(method, latency, response.get("error", {}).get("message", "rpc_error") if "error" in response else None)
+        self._record_success(endpoint, latency)
+        self._track_head(endpoint, method, response)
+        return response
+
+    async def _call_with_failover(self, endpoints: list[Endpoint], method, params):
+        last_error = None
+        for endpoint in endpoints:
+            try:
+                return await self._call(endpoint, method, params)
+            except ENDPOINT_ERRORS as e:
+                last_error = e
+        raise last_error
+
+    async def _hedged_call(self, primary: Endpoint, backup: Endpoint, rest: list[Endpoint], method, params):
+        started = time.monotonic()
+        tasks = [asyncio.ensure_future(self._call(primary, method, params))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=primary.p95())
+            if not done:
+                # Основной endpoint не уложился в свой p95 - дублируем запрос во второй
+                tasks.append(asyncio.ensure_future(self._call(backup, method, params)))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                    # Отменённый запрос не даёт замера - учитываем хотя бы прошедшее время, иначе
+                    # медленный endpoint так и останется основным
+                    if task is tasks[0]:
+                        elapsed = time.monotonic() - started
+                        primary.ewma = self._ewma_alpha * elapsed + (1 - self._ewma_alpha) * primary.ewma
+        remaining = rest if len(tasks) > 1 else [backup] + rest
+        if remaining:
+            return await self._call_with_failover(remaining, method, params)
+        return tasks[-1].result()
+
+    async def make_request(self, method, params):
+        self._maybe_sample_heads()
+        if method in PINNED_METHODS:
+            return await self._pinned_request(method, params)
+        ranked = self._ranked()
+        primary = ranked[0]
+        if (self._hedge and len(ranked) > 1 and ranked[1].healthy
+                and len(primary.latencies) >= self._hedge_min_samples):
+            return await self._hedged_call(primary, ranked[1], ranked[2:], method, params)
+        return await self._call_with_failover(ranked, method, params)
+
+    async def _pinned_request(self, method, params):
+        if self._pinned is None or not self._pinned.healthy:
+            self._pinned = self._ranked()[0]
+        try:
+            return await self._call(self._pinned, method, params)
+        except ENDPOINT_ERRORS:
+            # Закреплённый endpoint недоступен - переносим запись на следующий
+            if len(self.endpoints) == 1:
+                raise
+            self._pinned = self._ranked()[0]
+            return await self._call(self._pinned, method, params)
+
+    async def make_batch_request(self, batch_requests):
+        self._maybe_sample_heads()
+        endpoints = self._ranked()
+        pinned = any(method in PINNED_METHODS for method, _ in batch_requests)
+        if pinned:
+            # nonce из batch (preflight) читается у того же endpoint, через который уходят транзакции
+            if self._pinned is None or not self._pinned.healthy:
+                self._pinned = endpoints[0]
+            endpoints = [self._pinned] + [endpoint for endpoint in endpoints if endpoint is not self._pinned]
+        last_error = None
+        for endpoint in endpoints:
+            started = time.monotonic()
+            try:
+                responses = await endpoint.provider.make_batch_request(batch_requests)
+            except ENDPOINT_ERRORS as e:
+                self._observe("batch", time.monotonic() - started, e)
+                self._eject(endpoint, f"{type(e).__name__}: {e}")
+                last_error = e
+                continue
+            self._observe("batch", time.monotonic() - started)
+            self._record_success(endpoint, time.monotonic() - started)
+            if pinned:
+                # Закреплённый endpoint недоступен - запись переносится туда, где прочитан nonce
+                self._pinned = endpoint
+            return responses
+        raise last_error
+
+    async def cache_async_sessions(self, get_session):
+        for endpoint in self.endpoints:
+            await endpoint.provider.cache_async_session(get_session(endpoint.url))
+
+    async def disconnect(self):
+        # Сессии принадлежат ClientRegistry и закрываются им
+        if self._head_task is not None and not self._head_task.done():
+            self._head_task.cancel()
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple
+from eth_account import Account
+from eth_account.signers.local import LocalAccount
+
+logger = logging.getLogger(__name__)
+
+
+class SignedTx(NamedTuple):
+    raw_transaction: bytes
+    hash: bytes
+
+
+# Кэш ключей внутри процесса-подписчика
+_worker_accounts: dict[str, LocalAccount] = {}
+
+
+def _worker_sign(items: list[tuple[str, dict]]) -> list[tuple[bytes, bytes]]:
+    results = []
+    for private_key, txn_dict in items:
+        account = _worker_accounts.get(private_key)
+        if account is None:
+            account = _worker_accounts[private_key] = Account.from_key(private_key)
+        signed = account.sign_transaction(txn_dict)
+        results.append((bytes(signed.raw_transaction), bytes(signed.hash)))
+    return results
+
+
+class TransactionSigner:
+    # Подпись транзакций вне event loop: запросы, пришедшие за одну итерацию цикла,
+    # собираются в пакет и подписываются в пуле процессов одним вызовом.
+    # workers=0 - подпись прямо в event loop (без пула)
+
+    def __init__(self, workers: int | None = None, max_batch_size: int = 64):
+        self._workers = min(4, os.cpu_count() or 1) if workers is None else workers
+        self._max_batch_size = max_batch_size
+        self._pool: ProcessPoolExecutor | None = None
+        self._accounts: dict[str, LocalAccount] = {}
+        self._queue: list[tuple[str, dict, asyncio.Future]] = []
+        self._flush_handle: asyncio.Handle | None = None
+        self._signed = 0
+        self._batches = 0
+        self._busy = 0.0
+        self._in_flight = 0
+        self._busy_since = 0.0
+
+    def configure(self, workers: int | None = None, max_batch_size: int | None = None):
+        if workers is not None and workers != self._workers:
+            self._shutdown_pool()
+            self._workers = workers
+        if max_batch_size:
+            self._max_batch_size = max_batch_size
+
+    def get_account(self, address: str, private_key: str) -> LocalAccount:
+        # Приватный ключ разбирается один раз на адрес
+        account = self._accounts.get(address.lower())
+        if account is None:
+            account = Account.from_key(private_key)
+            if account.address.lower() != address.lower():
+                raise ValueError(f"Приватный ключ не соответствует адресу {address}")
+            self._accounts[address.lower()] = account
+        return account
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: дочерний процесс не наследует потоки и сокеты event loop
+            self._pool = ProcessPoolExecutor(max_workers=self._workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _sign_inline(self, address: str, private_key: str, txn_dict: dict) -> SignedTx:
+        started = time.perf_counter()
+        signed = self.get_account(address, private_key).sign_transaction(txn_dict)
+        self._record(1, time.perf_counter() - started)
+        return SignedTx(bytes(signed.raw_transaction), bytes(signed.hash))
+
+    def _record(self, count: int, elapsed: float):
+        self._signed += count
+        self._batches += 1
+        self._busy += elapsed
+
+    def _batch_started(self):
+        # Пакеты в пуле идут параллельно - считаем время, когда идёт хотя бы один
+        if self._in_flight == 0:
+            self._busy_since = time.perf_counter()
+        self._in_flight += 1
+
+    def _batch_finished(self, count: int):
+        self._in_flight -= 1
+        elapsed = time.perf_counter() - self._busy_since if self._in_flight == 0 else 0.0
+        if self._in_flight == 0:
+            self._busy_since = 0.0
+        self._record(count, elapsed)
+
+    async def sign(self, address: str, private_key: str, txn_dict: dict) -> SignedTx:
+        if self._workers <= 0:
+            return self._sign_inline(address, private_key, txn_dict)
+        self.get_account(address, private_key)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((private_key, dict(txn_dict), future))
+        if len(self._queue) >= self._max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._queue = self._queue, []
+        if batch:
+            asyncio.ensure_future(self._sign_batch(batch))
+
+    async def _sign_batch(self, batch: list[tuple[str, dict, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        items = [(private_key, txn_dict) for private_key, txn_dict, _ in batch]
+        self._batch_started()
+        try:
+            results = await loop.run_in_executor(self._get_pool(), _worker_sign, items)
+        except (BrokenProcessPool, OSError) as e:
+            logger.warning(f"Пул подписи недоступен ({type(e).__name__}: {e}), подписываю в основном процессе")
+            self._shutdown_pool()
+            self._workers = 0
+            results = []
+            for private_key, txn_dict in items:
+                signed = Account.from_key(private_key).sign_transaction(txn_dict)
+                results.append((bytes(signed.raw_transaction), bytes(signed.hash)))
+        except Exception as e:
+            self._batch_finished(0)
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self._batch_finished(len(batch))
+        for (_, _, future), (raw_transaction, tx_hash) in zip(batch, results):
+            if not future.done():
+                future.set_result(SignedTx(raw_transaction, tx_hash))
+
+    def stats(self) -> dict:
+        return {
+            "signed": self._signed,
+            "batches": self._batches,
+            "seconds": self._busy,
+            "tx_per_second": self._signed / self._busy if self._busy else 0.0
+        }
+
+    def _shutdown_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def close(self):
+        if self._signed:
+            stats = self.stats()
+            logger.info(
+                f"Подписано транзакций: {stats['signed']} за {stats['seconds']:.2f} сек "
+                f"({stats['tx_per_second']:.0f} tx/s, пакетов: {stats['batches']})"
+            )
+        self._shutdown_pool()
+
+
+signer = TransactionSigner()
@@ -0,0 +1,139 @@
+from eth_abi import encode, decode
+
+# startBridgeTokensViaStargate(BridgeData, StargateData) из LI.FI
+STARGATE_SELECTOR = bytes.fromhex('14d53077')
+STARGATE_PARAM_TYPES = [
+    '(bytes32,string,string,address,address,address,uint256,uint256,bool,bool)',
+    '(uint16,(uint32,bytes32,uint256,uint256,bytes,bytes,bytes),(uint256,uint256),address)'
+]
+
+LIFI_INTEGRATOR = b'lifi-api'
+JUMPER_INTEGRATOR = b'jumper.exchange'
+BUS_OFT_CMD = bytes([0])
+
+SELECTOR_SIZE = 4
+WORD = 32
+
+
+class StargateLayoutError(ValueError):
+    pass
+
+
+def _padded(length: int) -> int:
+    return (length + WORD - 1) // WORD * WORD
+
+
+class StargateCalldata:
+    # Разметка calldata Stargate, разобранная один раз: позиции нужных полей в буфере.
+    # Суммы и строки/bytes той же длины в словах правятся на месте, без полного перекодирования
+
+    def __init__(self, data: str | bytes):
+        if isinstance(data, str):
+            data = bytes.fromhex(data[2:] if data.startswith('0x') else data)
+        self.buffer = bytearray(data)
+        if self.buffer[:SELECTOR_SIZE] != STARGATE_SELECTOR:
+            # Другая функция фасада - разметка смещений к ней неприменима
+            raise StargateLayoutError(f"селектор 0x{self.buffer[:SELECTOR_SIZE].hex()} не startBridgeTokensViaStargate")
+
+        # BridgeData: integrator - третье поле, minAmount - седьмое
+        bridge_data = self._offset(SELECTOR_SIZE, SELECTOR_SIZE)
+        self.integrator_pos = self._offset(bridge_data + 2 * WORD, bridge_data)
+        self.bridge_amount_pos = self._check(bridge_data + 6 * WORD)
+
+        # StargateData.sendParams: amountLD - третье поле, oftCmd - седьмое
+        stargate_data = self._offset(SELECTOR_SIZE + WORD, SELECTOR_SIZE)
+        send_params = self._offset(stargate_data + WORD, stargate_data)
+        self.send_amount_pos = self._check(send_params + 2 * WORD)
+        self.oft_cmd_pos = self._offset(send_params + 6 * WORD, send_params)
+
+    def _check(self, pos: int) -> int:
+        if pos + WORD > len(self.buffer):
+            raise StargateLayoutError(f"смещение {pos} за пределами calldata ({len(self.buffer)} байт)")
+        return pos
+
+    def _word(self, pos: int) -> int:
+        return int.from_bytes(self.buffer[self._check(pos):pos + WORD], 'big')
+
+    def _offset(self, pos: int, base: int) -> int:
+        return self._check(base + self._word(pos))
+
+    def _read_bytes(self, pos: int) -> bytes:
+        length = self._word(pos)
+        if pos + WORD + length > len(self.buffer):
+            raise StargateLayoutError(f"длина {length} по смещению {pos} за пределами calldata")
+        return bytes(self.buffer[pos + WORD:pos + WORD + length])
+
+    def _write_bytes(self, pos: int, value: bytes):
+        old_size = _padded(self._word(pos))
+        new_size = _padded(len(value))
+        end = pos + WORD + old_size
+        if new_size != old_size and end != len(self.buffer):
+            # Меняется размер поля не в конце calldata - пришлось бы сдвигать все смещения после него
+            raise StargateLayoutError(f"поле по смещению {pos} нельзя изменить на месте")
+        self.buffer[pos:end] = len(value).to_bytes(WORD, 'big') + value.ljust(new_size, b'\x00')
+
+    @property
+    def integrator(self) -> bytes:
+        return self._read_bytes(self.integrator_pos)
+
+    @property
+    def amount(self) -> int:
+        return self._word(self.bridge_amount_pos)
+
+    @property
+    def oft_cmd(self) -> bytes:
+        return self._read_bytes(self.oft_cmd_pos)
+
+    def set_amount(self, amount: int):
+        word = amount.to_bytes(WORD, 'big')
+        self.buffer[self.bridge_amount_pos:self.bridge_amount_pos + WORD] = word
+        self.buffer[self.send_amount_pos:self.send_amount_pos + WORD] = word
+
+    def set_integrator(self, integrator: bytes):
+        self._write_bytes(self.integrator_pos, integrator)
+
+    def set_oft_cmd(self, oft_cmd: bytes):
+        # oftCmd - последнее поле calldata, поэтому его можно и удлинить
+        self._write_bytes(self.oft_cmd_pos, oft_cmd)
+
+    def to_hex(self) -> str:
+        return '0x' + self.buffer.hex()
+
+
+def _rewrite_full(data: str, amount: int) -> str:
+    # Полное декодирование и кодирование обоих кортежей - для calldata с нестандартной разметкой
+    if data.startswith('0x'):
+        data = data[2:]
+    function_selector = data[:8]
+    decoded_params = decode(STARGATE_PARAM_TYPES, bytes.fromhex(data[8:]))
+    tuple1 = list(decoded_params[0])
+    if tuple1[2] == LIFI_INTEGRATOR.decode():
+        tuple1[2] = JUMPER_INTEGRATOR.decode()
+    tuple1[6] = amount
+    tuple2 = list(decoded_params[1])
+    tuple2_inner = list(tuple2[1])
+    tuple2_inner[2] = amount
+    tuple2_inner[6] = BUS_OFT_CMD
+    tuple2[1] = tuple(tuple2_inner)
+    return '0x' + function_selector + encode(STARGATE_PARAM_TYPES, [tuple(tuple1), tuple(tuple2)]).hex()
+
+
+def _rewrite_fast(data: str, amount: int) -> str:
+    calldata = StargateCalldata(data)
+    if calldata.integrator == LIFI_INTEGRATOR:
+        calldata.set_integrator(JUMPER_INTEGRATOR)
+    calldata.set_amount(amount)
+    calldata.set_oft_cmd(BUS_OFT_CMD)
+    return calldata.to_hex()
+
+
+def rewrite_stargate_calldata(data: str, amount: int) -> str:
+    # Подставляет сумму из котировки, integrator jumper.exchange и oftCmd автобуса
+    try:
+        return _rewrite_fast(data, amount)
+    except (StargateLayoutError, ValueError, OverflowError):
+        pass
+    try:
+        return _rewrite_full(data, amount)
+    except Exception as e:
+        raise ValueError(f"Не удалось перекодировать данные транзакции: {e}")
@@ -0,0 +1,60 @@
+class Token:
+    # Неизменяемый объект токена; экземпляры создаются один раз в TokenRegistry и переиспользуются
+    __slots__ = ("symbol", "address", "decimals", "is_native")
+
+    def __init__(self, symbol: str, address: str, decimals: int, is_native: bool):
+        object.__setattr__(self, "symbol", symbol)
+        object.__setattr__(self, "address", address)
+        object.__setattr__(self, "decimals", decimals)
+        object.__setattr__(self, "is_native", is_native)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Token неизменяем")
+
+    def __repr__(self):
+        return f"Token(symbol={self.symbol}, address={self.address}, decimals={self.decimals}, is_native={self.is_native})"
+
+
+class TokenAmount:
+    __slots__ = ("token", "Ether", "Wei")
+
+    def __init__(self, token: Token, amount: float):
+        self.token = token
+        self.Ether = amount
+        self.Wei = int(amount * (10 ** token.decimals))
+
+
+class TokenRegistry:
+    # Индекс tokens.json: (сеть, символ) -> Token и нативный токен для каждой сети
+
+    def __init__(self, token_entries: list[dict]):
+        self._by_symbol: dict[tuple[str, str], Token] = {}
+        self._native: dict[str, Token] = {}
+        for entry in token_entries:
+            network_slug = entry["network"]
+            is_native = entry["params"].get("is_native", False)
+            key = (network_slug, entry["symbol"])
+            token = self._by_symbol.get(key)
+            if token is None:
+                token = Token(
+                    symbol=entry["symbol"],
+                    address=entry["address"],
+                    decimals=entry["decimals"],
+                    is_native=is_native
+                )
+                self._by_symbol[key] = token
+            if is_native and network_slug not in self._native:
+                self._native[network_slug] = token if token.is_native else Token(
+                    symbol=entry["symbol"],
+                    address=entry["address"],
+                    decimals=entry["decimals"],
+                    is_native=True
+                )
+
+    def get(self, network_slug: str, token_symbol: str | None = None) -> Token | None:
+        if token_symbol:
+            return self._by_symbol.get((network_slug, token_symbol))
+        return self._native.get(network_slug)
+
+    def native(self, network_slug: str) -> Token | None:
+        return self._native.get(network_slug)
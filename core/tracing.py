@@ -0,0 +1,183 @@
+import argparse
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "layerzero-bot"
+# Коды статуса span в OTLP
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, name: str, parent: "Span | None", attributes: dict):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        # Атрибуты родителя (аккаунт, сеть, режим моста) наследуются, чтобы любой span можно было отфильтровать
+        self.attributes = {**parent.attributes, **attributes} if parent is not None else dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items() if value is not None],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_UNSET}
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        return span
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Tracer:
+    # Span'ы этапов транзакции (preflight, котировка, approve, ожидание газа, сборка, подпись,
+    # отправка, квитанция). Текущий span хранится в contextvar, поэтому вложенность сохраняется
+    # между await и в задачах asyncio. Завершённые span'ы пишутся в JSON Lines в формате
+    # OTLP ExportTraceServiceRequest - его читает ресивер otlpjsonfile коллектора OpenTelemetry.
+    # Без tracePath трассировка выключена и span() ничего не делает
+
+    def __init__(self, path: str | None = None, flush_every: int = 200):
+        self._path = path
+        self._flush_every = flush_every
+        self._finished: list[Span] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self._path is not None
+
+    def configure(self, path: str | None = None, flush_every: int | None = None):
+        if path:
+            self._path = path
+        if flush_every:
+            self._flush_every = flush_every
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        if self._path is None:
+            yield None
+            return
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self._finished.append(span)
+            if len(self._finished) >= self._flush_every:
+                self.flush()
+
+    def annotate(self, **attributes):
+        # Атрибут, который становится известен по ходу (например, режим моста после котировки),
+        # записывается в текущий span и во все его родительские
+        span = _current_span.get()
+        while span is not None:
+            span.attributes.update(attributes)
+            span = span.parent
+
+    def flush(self):
+        if not self._finished or self._path is None:
+            return
+        spans, self._finished = self._finished, []
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": [span.to_otlp() for span in spans]}]
+            }]
+        }
+        try:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"Не удалось записать трассировку в {self._path}: {e}")
+
+
+tracer = Tracer()
+
+
+def _load_traces(path: str) -> dict[str, list[dict]]:
+    traces: dict[str, list[dict]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource_spans in json.loads(line)["resourceSpans"]:
+                for scope_spans in resource_spans["scopeSpans"]:
+                    for span in scope_spans["spans"]:
+                        traces.setdefault(span["traceId"], []).append(span)
+    return traces
+
+
+def _print_waterfall(spans: list[dict], width: int = 50):
+    by_id = {span["spanId"]: span for span in spans}
+    children: dict[str | None, list[dict]] = {}
+    for span in spans:
+        parent_id = span.get("parentSpanId")
+        children.setdefault(parent_id if parent_id in by_id else None, []).append(span)
+    roots = children.get(None, [])
+    start = min(int(span["startTimeUnixNano"]) for span in spans)
+    end = max(int(span["endTimeUnixNano"]) for span in spans)
+    scale = width / max(end - start, 1)
+
+    def walk(span: dict, depth: int):
+        begin, finish = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+        offset = int((begin - start) * scale)
+        bar = " " * offset + "█" * max(1, int((finish - begin) * scale))
+        mark = " !" if span.get("status", {}).get("code") == STATUS_ERROR else ""
+        print(f"{'  ' * depth + span['name']:<28} {(finish - begin) / 1e9:>8.2f}s |{bar:<{width}}|{mark}")
+        for child in sorted(children.get(span["spanId"], []), key=lambda item: int(item["startTimeUnixNano"])):
+            walk(child, depth + 1)
+
+    attributes = {item["key"]: next(iter(item["value"].values())) for item in roots[0]["attributes"]} if roots else {}
+    print(f"\ntrace {spans[0]['traceId']} " + " ".join(f"{key}={value}" for key, value in attributes.items()))
+    for root in sorted(roots, key=lambda item: int(item["startTimeUnixNano"])):
+        walk(root, 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Водопад самых долгих транзакций из файла трассировки")
+    parser.add_argument("path", help="файл из tracePath")
+    parser.add_argument("--slowest", type=int, default=5, help="сколько транзакций показать")
+    args = parser.parse_args()
+
+    def duration(spans: list[dict]) -> int:
+        return max(int(span["endTimeUnixNano"]) for span in spans) - min(int(span["startTimeUnixNano"]) for span in spans)
+
+    loaded = _load_traces(args.path)
+    print(f"Транзакций в файле: {len(loaded)}")
+    for trace_spans in sorted(loaded.values(), key=duration, reverse=True)[:args.slowest]:
+        _print_waterfall(trace_spans)
@@ -31,3 +31,16 @@ JUMPER_CHAIN_IDS = {
     "abstract": 2741
 
 }
+
+MULTICALL3_ADDRESS = "0xcA11bde05779b3779954B2Ac9c2B47f9f3f6BD8D"
+
+MULTICALL3_ADDRESSES = {
+    "zksync_era": "0xF9cda624FBC7e059355ce98a31693d299FACd963"
+}
+
+# LI.FI Diamond - spender для approve при свапах через li.quest
+LIFI_DIAMOND_ADDRESS = "0x1231DEB6f5749EF6cE6943a275A1D3E7486F4EaE"
+
+LIFI_DIAMOND_ADDRESSES = {
+    "zksync_era": "0x341e94069f53234fE6DabeF707aD424830525715"
+}
@@ -1,21 +1,29 @@
 # main.py
+import argparse
 import asyncio
 import logging
 import json
 import random
 import csv
 from datetime import datetime
-from web3 import Web3
-from web3.middleware import ExtraDataToPOAMiddleware
-import requests
+from typing import TYPE_CHECKING
 import platform
-from utils.binance_token import get_token_price
-from core.builder import TransactionBuilder
-from core.baseAccountClient import AccountClient
-from core.base_client import Client
+from eth_utils import to_checksum_address
+from utils.binance_token import get_token_price, price_cache
 from core.Settings import Settings
-from core.jumper_exchange import BaseJumperCompatibleCommand
-from core.deposit_from_exchange import deposit_from_exchange
+from core.tokens import Token, TokenAmount, TokenRegistry
+from core.gas_oracle import gas_oracles
+from core.gas_gate import concurrency_slot, gas_gates
+from core.lifi_client import lifi_client
+from core.journal import TransactionJournal
+from core.checkpoint import CheckpointStore
+from core.metrics import metrics
+from core.tracing import tracer
+from core.gas_limits import gas_limits
+from utils.rpc_probe import probe_networks, format_probe_table
+
+if TYPE_CHECKING:
+    from core.base_client import Client
 
 logging.basicConfig(
     level=logging.INFO,
@@ -23,25 +31,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger("Main")
 
-stats = {}
-successful_transactions = []
-failed_transactions = []
+MODES = ("balances", "swap", "circular", "withdraw", "deposit")
 
-if platform.system() == "Windows":
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+config_json: dict = {}
+journal: TransactionJournal | None = None
+client_registry = None
+balance_engine = None
 
-class Token:
-    def __init__(self, symbol: str, address: str, decimals: int, is_native: bool):
-        self.symbol = symbol
-        self.address = address
-        self.decimals = decimals
-        self.is_native = is_native
 
-class TokenAmount:
-    def __init__(self, token: Token, amount: float):
-        self.token = token
-        self.Ether = amount
-        self.Wei = int(amount * (10 ** token.decimals))
+if platform.system() == "Windows":
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 def load_json(file_path):
     try:
@@ -58,56 +57,61 @@ def validate_networks(config):
     if len(set(source_networks)) == 1 and len(set(destination_networks)) == 1 and source_networks[0] == destination_networks[0]:
         raise ValueError(f"Ошибка: Исходная и целевая сети совпадают ({source_networks[0]}), транзакция невозможна.")
 
+def get_used_networks():
+    used = set(config_json.get("sourceNetworks", [])) | set(config_json.get("destinationNetworks", []))
+    if config_json.get("withdrawNetwork"):
+        used.add(config_json["withdrawNetwork"])
+    return used
+
 async def check_rpc_health(networks_data):
     print("Проверка доступности RPC...")
-    faulty_rpcs = []
-    for net_slug, net_info in networks_data.items():
-        rpc_url = net_info.get("rpc_url")
-        if not rpc_url:
+    candidates = {}
+    faulty_networks = []
+    for net_slug in sorted(get_used_networks()):
+        net_info = networks_data.get(net_slug)
+        if not net_info or not net_info.get("rpc_urls"):
             print(f"Сеть {net_slug}: RPC не указан в конфигурации")
-            faulty_rpcs.append((net_slug, rpc_url, "RPC не указан"))
+            faulty_networks.append(net_slug)
             continue
+        candidates[net_slug] = net_info["rpc_urls"]
+
+    max_lag = config_json.get("rpcMaxLagBlocks", 5)
+    ranked = await probe_networks(
+        candidates,
+        samples=config_json.get("rpcProbeSamples", 3),
+        timeout=config_json.get("rpcProbeTimeout", 5),
+        max_lag=max_lag
+    )
+    print(format_probe_table(ranked, network_names))
 
-        web3 = Web3(Web3.HTTPProvider(rpc_url))
-        try:
-            is_connected = await asyncio.to_thread(web3.is_connected)
-            if not is_connected:
-                faulty_rpcs.append((net_slug, rpc_url, "Нет соединения"))
-                continue
-            block_number = await asyncio.to_thread(lambda: web3.eth.block_number)
-            if block_number is None:
-                faulty_rpcs.append((net_slug, rpc_url, "Не удалось получить block_number"))
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 429:
-                faulty_rpcs.append((net_slug, rpc_url, "Ошибка 429: Too Many Requests"))
-            else:
-                faulty_rpcs.append((net_slug, rpc_url, f"Ошибка HTTP: {str(e)}"))
-        except Exception as e:
-            faulty_rpcs.append((net_slug, rpc_url, f"Ошибка: {str(e)}"))
+    for net_slug, results in ranked.items():
+        if not results[0].healthy:
+            faulty_networks.append(net_slug)
+            continue
+        # Самый быстрый не отстающий endpoint становится основным для сети
+        networks_data[net_slug]["rpc_url"] = results[0].rpc_url
+        networks_data[net_slug]["rpc_urls"] = [result.rpc_url for result in results]
+        # Отстающий endpoint получает бесконечную задержку: провайдер ранжирует по EWMA и иначе
+        # мог бы сделать его основным
+        networks_data[net_slug]["rpc_latencies"] = {
+            result.rpc_url: result.p50 if result.healthy and result.lag is not None and result.lag <= max_lag
+            else float("inf") for result in results
+        }
 
-    if faulty_rpcs:
-        print("\nОбнаружены проблемы с RPC:")
-        for slug, url, error in faulty_rpcs:
-            net_name = network_names.get(slug, slug)
-            print(f"- {net_name}: {url} ({error})")
+    if faulty_networks:
+        print("\nНет рабочих RPC для сетей: " + ", ".join(network_names.get(slug, slug) for slug in faulty_networks))
         print("Рекомендуется заменить проблемные RPC в config_bridge.json перед продолжением.")
     else:
         print("Все RPC работают корректно.")
     print("")
 
 def load_accounts(file_path):
-    accounts = []
+    from utils.accounts import load_accounts as load_account_lines
     try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            for line in file:
-                address, private_key = line.strip().split(',')
-                checksum_address = Web3.to_checksum_address(address.strip())
-                accounts.append((checksum_address, private_key.strip()))
+        return load_account_lines(file_path, cache_path=config_json.get("accountsCachePath", "data/accounts_cache.json"),
+                                  workers=config_json.get("accountsWorkers"))
     except FileNotFoundError:
         raise FileNotFoundError(f"Файл {file_path} не найден.")
-    except ValueError:
-        raise ValueError("Формат accounts.txt должен быть 'address,private_key'.")
-    return accounts
 
 def load_exchange_wallets(file_path):
     exchange_wallets = []
@@ -116,7 +120,7 @@ def load_exchange_wallets(file_path):
             for line in file:
                 address = line.strip()
                 if address:
-                    checksum_address = Web3.to_checksum_address(address)
+                    checksum_address = to_checksum_address(address)
                     exchange_wallets.append(checksum_address)
         return exchange_wallets
     except FileNotFoundError:
@@ -125,7 +129,54 @@ def load_exchange_wallets(file_path):
     except ValueError as e:
         raise ValueError(f"Ошибка в формате exchange_wallets.txt: {e}")
 
-config_json = load_json("data/config_bridge.json")
+def load_config(config_path):
+    global config_json
+    config_json = load_json(config_path)
+    lifi_client.configure(
+        base_url=config_json.get("lifiBaseUrl"),
+        concurrency=config_json.get("quoteConcurrency", config_json.get("threads", 1))
+    )
+    tracer.configure(path=config_json.get("tracePath"))
+    return config_json
+
+def init_chain_stack():
+    # web3 и всё, что на нём построено, импортируется только для режимов, работающих с сетями
+    global client_registry, balance_engine
+    if client_registry is not None:
+        return
+    from core.base_client import ClientRegistry
+    from core.receipt_watcher import receipt_watchers
+    from utils.balances import BalanceEngine
+    from core.signer import signer
+    from core.allowance_cache import allowance_cache, APPROVAL_POLICIES
+    if config_json.get("approvalPolicy", "buffered") not in APPROVAL_POLICIES:
+        raise ValueError(f"approvalPolicy должна быть одной из: {', '.join(APPROVAL_POLICIES)}")
+    from utils.proxy_utils import unsupported_aiohttp_proxies
+    unsupported_proxies = unsupported_aiohttp_proxies()
+    if unsupported_proxies:
+        # Иначе ошибка всплывёт только при первом запросе через такой прокси. Котировки LI.FI
+        # идут через прокси и при useProxy=false, поэтому проверка не зависит от него
+        schemes = sorted({proxy.split("://", 1)[0] for proxy in unsupported_proxies})
+        raise ValueError(
+            f"В data/proxies.txt {len(unsupported_proxies)} прокси со схемой {', '.join(schemes)}: "
+            f"поддерживаются http(s), а socks4/socks5 - при установленном aiohttp-socks"
+        )
+    client_registry = ClientRegistry(
+        pool_size=config_json.get("rpcPoolSize", 10),
+        provider_options={
+            "hedge": config_json.get("rpcHedge", True),
+            "eject_seconds": config_json.get("rpcEjectSeconds", 30),
+            "max_lag": config_json.get("rpcMaxLagBlocks", 5),
+            "head_interval": config_json.get("rpcHeadInterval", 15)
+        }
+    )
+    balance_engine = BalanceEngine(chunk_size=config_json.get("multicallChunkSize", 200))
+    gas_oracles.configure(ttl=config_json.get("gasOracleTtl", 3), base_fee_multiplier=config_json.get("baseFeeMultiplier", 2))
+    receipt_watchers.configure(poll_interval=config_json.get("receiptPollInterval", 1))
+    gas_gates.configure(poll_interval=config_json.get("gasGatePollInterval", 1))
+    signer.configure(workers=config_json.get("signerWorkers"), max_batch_size=config_json.get("signerBatchSize"))
+    allowance_cache.configure(chunk_size=config_json.get("multicallChunkSize", 200))
+    gas_limits.configure(margin=config_json.get("gasLimitMargin"), min_samples=config_json.get("gasLimitMinSamples"))
 
 def load_networks():
     networks_json = load_json("extra/cfg/networks.json")
@@ -133,61 +184,75 @@ def load_networks():
     network_overrides = config_json.get("networkConfigs", {})
     for net in networks_list:
         slug = net.get("slug")
-        if slug in network_overrides and "rpc_url" in network_overrides[slug]:
-            net["rpc_url"] = network_overrides[slug]["rpc_url"]
+        override = network_overrides.get(slug, {})
+        override_urls = list(override.get("rpc_urls", []))
+        if "rpc_url" in override:
+            override_urls.insert(0, override["rpc_url"])
+        # RPC из networks.json остаётся запасным endpoint'ом после указанных в конфиге
+        default_urls = [net["rpc_url"]] if net.get("rpc_url") else []
+        net["rpc_urls"] = list(dict.fromkeys(override_urls + default_urls))
+        if override_urls:
+            net["rpc_url"] = override_urls[0]
     return {net["slug"]: net for net in networks_list}
 
 def get_network_by_slug(slug, networks_data):
     return networks_data.get(slug)
 
-def get_token_for_network(network_slug, token_symbol=None, all_tokens=None):
-    for t in all_tokens:
-        if t["network"] == network_slug:
-            if token_symbol and t["symbol"] == token_symbol:
-                return Token(
-                    symbol=t["symbol"],
-                    address=t["address"],
-                    decimals=t["decimals"],
-                    is_native=t["params"].get("is_native", False)
-                )
-            elif not token_symbol and t["params"].get("is_native", False):
-                return Token(
-                    symbol=t["symbol"],
-                    address=t["address"],
-                    decimals=t["decimals"],
-                    is_native=True
-                )
-    return None
+def get_token_for_network(network_slug, token_symbol=None, all_tokens: TokenRegistry = None):
+    return all_tokens.get(network_slug, token_symbol)
 
-async def get_token_balance(client: Client, account_address: str, token_obj: Token):
-    web3 = client.web3
-    if token_obj.is_native:
-        balance_wei = web3.eth.get_balance(account_address)
-        return balance_wei / (10 ** token_obj.decimals)
-    abi_balance_of = [
-        {
-            "constant": True,
-            "inputs": [{"name": "_owner", "type": "address"}],
-            "name": "balanceOf",
-            "outputs": [{"name": "", "type": "uint256"}],
-            "type": "function"
-        }
-    ]
-    contract = web3.eth.contract(
-        address=Web3.to_checksum_address(token_obj.address),
-        abi=abi_balance_of
-    )
+async def get_token_balance(client: "Client", account_address: str, token_obj: Token):
+    return await balance_engine.get_balance(client, account_address, token_obj)
+
+def get_random_delay(delay_config, kind: str = "transaction"):
+    if isinstance(delay_config, list) and len(delay_config) == 2:
+        delay = random.uniform(delay_config[0], delay_config[1])
+    else:
+        delay = delay_config
+    metrics.observe("delay_seconds", delay, {"kind": kind})
+    return delay
+
+async def prefetch_prices(token_symbols):
     try:
-        balance_wei = contract.functions.balanceOf(Web3.to_checksum_address(account_address)).call()
-        return balance_wei / (10 ** token_obj.decimals)
+        await price_cache.prefetch(token_symbols)
     except Exception as e:
-        logger.error(f"Ошибка при получении баланса ERC20: {e}")
-        return 0
+        logger.warning(f"Не удалось заранее получить цены токенов {token_symbols}: {e}")
+
+async def prefetch_allowances(accounts, networks_data, source_networks, token_symbols):
+    # allowance всех аккаунтов на LI.FI diamond одним Multicall3 на сеть вместо запроса в каждой транзакции
+    from core.allowance_cache import allowance_cache
+    from core.preflight import get_lifi_spender
+    owners = [address for address, _ in accounts]
+    jobs = []
+    for net_slug in source_networks:
+        net_info = get_network_by_slug(net_slug, networks_data)
+        tokens = [get_token_for_network(net_slug, symbol, tokens_data) for symbol in token_symbols]
+        tokens = [token for token in tokens if token is not None and not token.is_native]
+        if not net_info or not tokens:
+            continue
+        client = await client_registry.get_client(net_slug, net_info, config_json.get("useProxy", False))
+        jobs.append((client, owners, tokens, get_lifi_spender(net_slug)))
+    if not jobs:
+        return
+    loaded = await allowance_cache.prefetch_many(jobs)
+    logger.info(f"Allowance загружен заранее: {loaded} значений в {len(jobs)} сетях")
 
-def get_random_delay(delay_config):
-    if isinstance(delay_config, list) and len(delay_config) == 2:
-        return random.uniform(delay_config[0], delay_config[1])
-    return delay_config
+def log_quote_latency():
+    summary = lifi_client.latency_summary()
+    if summary["count"]:
+        logger.info(f"Котировки LI.FI: {summary['count']} запросов, p50 {summary['p50']:.2f} сек, "
+                    f"p95 {summary['p95']:.2f} сек, max {summary['max']:.2f} сек")
+
+def use_journal_session(session_id: str):
+    if session_id != journal.session_id:
+        logger.info(f"Журнал транзакций: продолжаю сессию {session_id} прерванного прогона")
+        journal.session_id = session_id
+
+def dump_metrics(prefix: str = ""):
+    try:
+        metrics.dump(f"{prefix}metrics.prom")
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить метрики: {e}")
 
 network_names = {
     "base": "Base",
@@ -203,7 +268,8 @@ async def process_one_transaction(
     source_net_slug, from_symbol,
     dest_net_slug, to_symbol,
     min_pct, max_pct,
-    transaction_delay_config
+    transaction_delay_config,
+    checkpoint: CheckpointStore | None = None
 ):
     logger.info(f"[{address}] Начинаю транзакцию {tx_index}/{total_tx_count}")
     from_token_obj = get_token_for_network(source_net_slug, from_symbol, tokens_data)
@@ -221,25 +287,36 @@ async def process_one_transaction(
         return
 
     use_proxy = config_json.get("useProxy", False)
-    client = Client(
-        network_slug=source_net_slug,
-        rpc_url=net_info["rpc_url"],
-        chain_id=net_info["chain_id"],
-        txn_explorer_url=net_info.get("txn_explorer_url", ""),
-        use_proxy=use_proxy
-    )
+    client = await client_registry.get_client(source_net_slug, net_info, use_proxy)
     if use_proxy:
         logger.info(f"[{address}] Использую прокси для сети {source_net_slug}")
 
-    # Устанавливаем default_block='latest' для сети abstract
-    if source_net_slug == "abstract":
-        client.web3.eth.default_block = "latest"
-        logger.info(f"[{address}] Установлен default_block='latest' для сети {source_net_slug}")
-
-    client.web3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+    native_token = get_token_for_network(source_net_slug, None, tokens_data)
+    if not native_token:
+        logger.error(f"[{address}] Нативный токен не найден в сети {source_net_slug}.")
+        return
 
-    logger.info(f"[{address}] Проверка баланса {from_symbol} в сети {source_net_slug}")
-    balance_float = await get_token_balance(client, address, from_token_obj)
+    logger.info(f"[{address}] Проверка баланса {from_symbol} и {native_token.symbol} в сети {source_net_slug}")
+    from core.preflight import run_preflight, get_lifi_spender
+    try:
+        with tracer.span("preflight"):
+            preflight = await run_preflight(client, address, from_token_obj, native_token, get_lifi_spender(source_net_slug))
+    except Exception as e:
+        logger.error(f"[{address}] Не удалось получить балансы в сети {source_net_slug}: {e}")
+        journal.record_result({
+            "WalletAddress": address,
+            "TransactionIndex": tx_index,
+            "SourceNetwork": source_net_slug,
+            "FromToken": from_symbol,
+            "DestinationNetwork": dest_net_slug,
+            "ToToken": to_symbol,
+            "Amount": 0,
+            "USDVolume": 0,
+            "Status": "FAILED",
+            "Error": f"Preflight failed: {e}"
+        })
+        return "FAILED"
+    balance_float, native_balance = preflight.token_balance, preflight.native_balance
     logger.info(f"[{address}] Баланс {from_symbol} в сети {source_net_slug}: {balance_float:.6f}")
     if balance_float <= 0:
         logger.error(f"[{address}] Баланс 0 для {from_token_obj.symbol} в сети {source_net_slug}.")
@@ -251,19 +328,12 @@ async def process_one_transaction(
         gas_price = 1000000000  # 1 Gwei для abstract
         logger.info(f"[{address}] Используем фиксированную цену газа 1 Gwei для сети {source_net_slug}")
     else:
-        logger.info(f"[{address}] Получение gas_price для сети {source_net_slug}")
-        gas_price = client.web3.eth.gas_price
+        gas_price = preflight.gas.gas_price
 
     gas_cost = gas_price * gas_limit / 10**18
     gas_buffer = gas_cost * 1.2  # Уменьшаем множитель до 1.2
     logger.info(f"[{address}] Расчётная стоимость газа: {gas_cost:.6f} ETH, резерв газа: {gas_buffer:.6f} ETH")
 
-    native_token = get_token_for_network(source_net_slug, None, tokens_data)
-    if not native_token:
-        logger.error(f"[{address}] Нативный токен не найден в сети {source_net_slug}.")
-        return
-    logger.info(f"[{address}] Проверка баланса нативного токена ({native_token.symbol}) в сети {source_net_slug}")
-    native_balance = await get_token_balance(client, address, native_token)
     logger.info(f"[{address}] Баланс нативного токена ({native_token.symbol}) в сети {source_net_slug}: {native_balance:.6f}")
 
     # Рассчитываем сумму для свапа с учётом газа
@@ -278,7 +348,7 @@ async def process_one_transaction(
             logger.info(f"[{address}] Сумма скорректирована до 95% баланса: {amount_to_bridge:.6f} {from_symbol}")
         if native_balance < gas_buffer:
             logger.error(f"[{address}] Недостаточно газа: требуется {gas_buffer:.6f} {native_token.symbol}, доступно {native_balance:.6f}")
-            failed_transactions.append({
+            journal.record_result({
                 "WalletAddress": address,
                 "TransactionIndex": tx_index,
                 "SourceNetwork": source_net_slug,
@@ -290,7 +360,7 @@ async def process_one_transaction(
                 "Status": "FAILED",
                 "Error": f"Insufficient gas: need {gas_buffer:.6f} {native_token.symbol}, have {native_balance:.6f}"
             })
-            return
+            return "FAILED"
     else:
         # Для нативного токена (ETH) учитываем сумму транзакции и газ
         total_required = amount_to_bridge + gas_buffer
@@ -300,7 +370,7 @@ async def process_one_transaction(
             logger.info(f"[{address}] Сумма скорректирована из-за недостаточного баланса: {amount_to_bridge:.6f} {from_symbol}")
         if amount_to_bridge <= 0:
             logger.error(f"[{address}] Сумма для перевода после корректировки <= 0: {amount_to_bridge:.6f} {from_symbol}")
-            failed_transactions.append({
+            journal.record_result({
                 "WalletAddress": address,
                 "TransactionIndex": tx_index,
                 "SourceNetwork": source_net_slug,
@@ -312,7 +382,7 @@ async def process_one_transaction(
                 "Status": "FAILED",
                 "Error": f"Insufficient funds: need {total_required:.6f} {native_token.symbol}, have {native_balance:.6f}"
             })
-            return
+            return "FAILED"
 
     logger.info(f"[{address}] Сумма для перевода: {amount_to_bridge:.6f} {from_symbol}")
     logger.info(f"[{address}] Общая требуемая сумма (сумма + газ): {amount_to_bridge + gas_buffer:.6f} {native_token.symbol}")
@@ -324,8 +394,15 @@ async def process_one_transaction(
         allowance=1.1,
         delay_after_approve=(1, 3),
         gas_amount=False,
-        gas_price_limits=gas_price_limits
+        gas_price_limits=gas_price_limits,
+        bridge_mode=config_json.get("bridgeMode"),
+        random_bridge=config_json.get("random_bridge", 0),
+        approval_policy=config_json.get("approvalPolicy", "buffered")
     )
+    # eth_abi и сборщик свапа нужны только в режимах свапа
+    from core.builder import TransactionBuilder
+    from core.baseAccountClient import AccountClient
+    from core.jumper_exchange import BaseJumperCompatibleCommand
     swap_command = BaseJumperCompatibleCommand(
         transaction_builder_cls=TransactionBuilder,
         client=client,
@@ -336,9 +413,25 @@ async def process_one_transaction(
         to_token=to_token_obj,
         is_from_token_native=from_token_obj.is_native
     )
+
+    def on_transaction_sent(txn_hash):
+        journal.record(
+            "tx_sent", WalletAddress=address, TransactionIndex=tx_index, SourceNetwork=source_net_slug, TxHash=txn_hash
+        )
+        if checkpoint is not None:
+            checkpoint.mark_sent(address, tx_index, source_net_slug, txn_hash)
+
+    swap_command.on_transaction_sent = on_transaction_sent
+    swap_command.preflight = preflight
+    journal.record(
+        "tx_started", WalletAddress=address, TransactionIndex=tx_index, SourceNetwork=source_net_slug,
+        FromToken=from_symbol, DestinationNetwork=dest_net_slug, ToToken=to_symbol, Amount=amount_to_bridge
+    )
     try:
+        await swap_command.wait_for_gas_price()
         logger.info(f"[{address}] Выполнение свопа для сети {source_net_slug}")
         txn_hash, to_amount = await asyncio.wait_for(swap_command._swap(), timeout=300)
+        status = "SUCCESS"
         bridge_mode = getattr(swap_command, '_bridge_mode', 'unknown')
         source_net_name = network_names.get(source_net_slug, source_net_slug)
         dest_net_name = network_names.get(dest_net_slug, dest_net_slug)
@@ -350,19 +443,15 @@ async def process_one_transaction(
         logger.info(hash_line)
 
         try:
-            token_price = await get_token_price(from_symbol)
+            token_price = price_cache.get_cached_price(from_symbol)
+            if token_price is None:
+                token_price = await get_token_price(from_symbol)
             logger.info(f"[{address}] Цена токена {from_symbol}: {token_price:.2f} USD")
         except Exception as e:
             logger.warning(f"[{address}] Не удалось получить цену токена {from_symbol}: {e}")
             token_price = 0.0
         usd_volume = amount_to_bridge * token_price
-        if address not in stats:
-            stats[address] = {"transactions_count": 0, "net_token_dollars": {}}
-        stats[address]["transactions_count"] += 1
-        pair = (source_net_slug, from_symbol)
-        current_dollars = stats[address]["net_token_dollars"].get(pair, 0.0)
-        stats[address]["net_token_dollars"][pair] = current_dollars + usd_volume
-        successful_transactions.append({
+        journal.record_result({
             "WalletAddress": address,
             "TransactionIndex": tx_index,
             "SourceNetwork": source_net_slug,
@@ -375,8 +464,9 @@ async def process_one_transaction(
             "Error": ""
         })
     except asyncio.TimeoutError:
+        status = "FAILED"
         logger.error(f"[{address}] Tx {tx_index}/{total_tx_count} - Таймаут при выполнении свапа (5 минут)")
-        failed_transactions.append({
+        journal.record_result({
             "WalletAddress": address,
             "TransactionIndex": tx_index,
             "SourceNetwork": source_net_slug,
@@ -389,6 +479,7 @@ async def process_one_transaction(
             "Error": "Timeout after 5 minutes"
         })
     except Exception as e:
+        status = "FAILED"
         error_text = str(e)
         source_net_name = network_names.get(source_net_slug, source_net_slug)
         dest_net_name = network_names.get(dest_net_slug, dest_net_slug)
@@ -397,7 +488,7 @@ async def process_one_transaction(
                          f"{amount_to_bridge:.6f} {from_token_obj.symbol}({source_net_name}) "
                          f"=> {to_token_obj.symbol}({dest_net_name}). Ошибка: {error_text}")
         logger.error(error_summary)
-        failed_transactions.append({
+        journal.record_result({
             "WalletAddress": address,
             "TransactionIndex": tx_index,
             "SourceNetwork": source_net_slug,
@@ -410,9 +501,12 @@ async def process_one_transaction(
             "Error": error_text
         })
 
+    tracer.annotate(status=status)
     delay_tx = get_random_delay(transaction_delay_config)
     logger.info(f"[{address}] Завершил Tx {tx_index}/{total_tx_count}. Задержка {delay_tx:.2f} сек между транзакциями.")
-    await asyncio.sleep(delay_tx)
+    with tracer.span("delay"):
+        await asyncio.sleep(delay_tx)
+    return status
 
 async def send_transaction(
     address, _priv, tx_index, total_tx_count,
@@ -426,13 +520,7 @@ async def send_transaction(
         return
 
     use_proxy = config_json.get("useProxy", False)
-    client = Client(
-        network_slug=network_slug,
-        rpc_url=net_info["rpc_url"],
-        chain_id=net_info["chain_id"],
-        txn_explorer_url=net_info.get("txn_explorer_url", ""),
-        use_proxy=use_proxy
-    )
+    client = await client_registry.get_client(network_slug, net_info, use_proxy)
     if use_proxy:
         logger.info(f"[{address}] Использую прокси для подключения к RPC сети {network_slug}")
 
@@ -448,73 +536,61 @@ async def send_transaction(
 
     amount_to_send = min(amount, balance)
     web3 = client.web3
-    nonce = web3.eth.get_transaction_count(address)
-    gas_price = web3.eth.gas_price
+    gas_price = await gas_oracles.get(client).gas_price()
 
     if token_obj.is_native:
         tx = {
-            'nonce': nonce,
             'to': to_address,
             'value': web3.to_wei(amount_to_send, 'ether'),
             'gasPrice': gas_price,
             'chainId': net_info["chain_id"]
         }
         try:
-            gas_limit = web3.eth.estimate_gas(tx)
-            tx['gas'] = int(gas_limit * 1.2)
+            tx['gas'] = await gas_limits.resolve(client, tx)
         except Exception as e:
             logger.warning(f"[{address}] Не удалось оценить газ: {e}. Использую запасной лимит 30000.")
             tx['gas'] = 30000
     else:
-        erc20_abi = [
-            {
-                "constant": False,
-                "inputs": [
-                    {"name": "_to", "type": "address"},
-                    {"name": "_value", "type": "uint256"}
-                ],
-                "name": "transfer",
-                "outputs": [{"name": "", "type": "bool"}],
-                "type": "function"
-            }
-        ]
-        contract = web3.eth.contract(address=token_obj.address, abi=erc20_abi)
-        tx = contract.functions.transfer(
-            to_address,
-            int(amount_to_send * 10 ** token_obj.decimals)
-        ).build_transaction({
-            'nonce': nonce,
+        from core import erc20
+        tx = {
+            'from': address,
+            'to': to_checksum_address(token_obj.address),
+            'value': 0,
+            'data': erc20.hex_data(erc20.transfer_data(to_address, int(amount_to_send * 10 ** token_obj.decimals))),
             'gasPrice': gas_price,
             'chainId': net_info["chain_id"]
-        })
+        }
         try:
-            gas_limit = web3.eth.estimate_gas(tx)
-            tx['gas'] = int(gas_limit * 1.2)
+            tx['gas'] = await gas_limits.resolve(client, tx)
         except Exception as e:
             logger.warning(f"[{address}] Не удалось оценить газ: {e}. Использую запасной лимит 100000.")
             tx['gas'] = 100000
 
+    journal.record(
+        "tx_started", WalletAddress=address, TransactionIndex=tx_index, SourceNetwork=network_slug,
+        FromToken=token_symbol, DestinationNetwork=network_slug, ToToken=token_symbol, Amount=amount_to_send
+    )
+    from core.baseAccountClient import AccountClient
     try:
-        signed_tx = web3.eth.account.sign_transaction(tx, private_key=_priv)
-        tx_hash = web3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        tx_receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
+        tx_hash = await AccountClient(address, _priv, client).commit_transaction(tx)
+        journal.record(
+            "tx_sent", WalletAddress=address, TransactionIndex=tx_index, SourceNetwork=network_slug, TxHash=tx_hash
+        )
+        tx_receipt = await client.wait_for_transaction_receipt(tx_hash, kind="transfer", sender=address)
+        gas_limits.record(client, tx['to'], tx.get('data'), tx_receipt)
         if tx_receipt.status == 1:
             net_name = network_names.get(network_slug, network_slug)
             logger.info(f"[{address}] Tx {tx_index}/{total_tx_count} - Перевод - {amount_to_send:.6f} {token_symbol}({net_name}) => {to_address}")
-            logger.info(f"[{address}] Hash - '{client.network.txn_explorer_url}{tx_hash.hex()}'")
+            logger.info(f"[{address}] Hash - '{client.network.txn_explorer_url}{tx_hash}'")
 
             try:
-                token_price = await get_token_price(token_symbol)
+                token_price = price_cache.get_cached_price(token_symbol)
+                if token_price is None:
+                    token_price = await get_token_price(token_symbol)
             except Exception:
                 token_price = 0.0
             usd_volume = amount_to_send * token_price
-            if address not in stats:
-                stats[address] = {"transactions_count": 0, "net_token_dollars": {}}
-            stats[address]["transactions_count"] += 1
-            pair = (network_slug, token_symbol)
-            current_dollars = stats[address]["net_token_dollars"].get(pair, 0.0)
-            stats[address]["net_token_dollars"][pair] = current_dollars + usd_volume
-            successful_transactions.append({
+            journal.record_result({
                 "WalletAddress": address,
                 "TransactionIndex": tx_index,
                 "SourceNetwork": network_slug,
@@ -527,8 +603,8 @@ async def send_transaction(
                 "Error": ""
             })
         else:
-            logger.error(f"[{address}] Транзакция не удалась: {tx_hash.hex()}")
-            failed_transactions.append({
+            logger.error(f"[{address}] Транзакция не удалась: {tx_hash}")
+            journal.record_result({
                 "WalletAddress": address,
                 "TransactionIndex": tx_index,
                 "SourceNetwork": network_slug,
@@ -542,7 +618,7 @@ async def send_transaction(
             })
     except Exception as e:
         logger.error(f"[{address}] Ошибка при переводе: {amount_to_send:.6f} {token_symbol}({network_slug}) => {to_address}. Ошибка: {str(e)}")
-        failed_transactions.append({
+        journal.record_result({
             "WalletAddress": address,
             "TransactionIndex": tx_index,
             "SourceNetwork": network_slug,
@@ -559,6 +635,40 @@ async def send_transaction(
     logger.info(f"[{address}] Завершил Tx {tx_index}/{total_tx_count}. Задержка {delay_tx:.2f} сек между транзакциями.")
     await asyncio.sleep(delay_tx)
 
+async def reconcile_pending_tx(address, checkpoint: CheckpointStore, networks_data):
+    pending = checkpoint.pending_tx(address)
+    if pending is None:
+        return
+    net_info = get_network_by_slug(pending["network"], networks_data)
+    if not net_info:
+        # Сеть убрали из конфигурации после прерванного запуска: проверить квитанцию негде,
+        # транзакцию повторно не отправляем, индекс считаем выполненным
+        logger.warning(f"[{address}] Сеть {pending['network']} не найдена в конфигурации. "
+                       f"Незавершённая транзакция {pending['hash']} не проверена и не будет повторена.")
+        journal.record(
+            "tx_reconciled", WalletAddress=address, TransactionIndex=pending["index"],
+            SourceNetwork=pending["network"], TxHash=pending["hash"], Status="UNKNOWN"
+        )
+        checkpoint.mark_done(address, pending["index"], "UNKNOWN")
+        return
+    client = await client_registry.get_client(pending["network"], net_info, config_json.get("useProxy", False))
+    logger.info(f"[{address}] Сверяю незавершённую транзакцию {pending['hash']} в сети {pending['network']}")
+    try:
+        receipt = await client.wait_for_transaction_receipt(
+            pending["hash"], timeout=config_json.get("resumeReceiptTimeout", 120), sender=address
+        )
+        status = "SUCCESS" if receipt.status == 1 else "FAILED"
+    except Exception as e:
+        # Квитанции нет - транзакцию повторно не отправляем, индекс считаем выполненным
+        logger.warning(f"[{address}] Не удалось получить квитанцию {pending['hash']}: {e}. Транзакция не будет повторена.")
+        status = "UNKNOWN"
+    logger.info(f"[{address}] Транзакция {pending['index']} из прошлого запуска: {status}")
+    journal.record(
+        "tx_reconciled", WalletAddress=address, TransactionIndex=pending["index"],
+        SourceNetwork=pending["network"], TxHash=pending["hash"], Status=status
+    )
+    checkpoint.mark_done(address, pending["index"], status)
+
 async def process_one_account(
     account,
     networks_data,
@@ -570,10 +680,14 @@ async def process_one_account(
     min_pct,
     max_pct,
     transaction_delay_config,
-    account_delay_config
+    account_delay_config,
+    checkpoint: CheckpointStore
 ):
     address, _priv = account
-    delay_wallet = get_random_delay(account_delay_config)
+    if checkpoint.is_finished(address):
+        logger.info(f"[{address}] Аккаунт уже обработан в прошлом запуске, пропускаю")
+        return
+    delay_wallet = get_random_delay(account_delay_config, "account")
     logger.info(f"[{address}] Начинаю обработку аккаунта. Задержка между кошельками: {delay_wallet:.2f} сек.")
     await asyncio.sleep(delay_wallet)
 
@@ -587,14 +701,26 @@ async def process_one_account(
         logger.error(f"[{address}] Нет допустимых пар (сеть, токен) для исходящей сети.")
         return
 
-    tc = config_json.get("transactionCount", 1)
-    if isinstance(tc, list) and len(tc) == 2:
-        transaction_count = random.randint(tc[0], tc[1])
+    await reconcile_pending_tx(address, checkpoint, networks_data)
+    state = checkpoint.get(address)
+    if state is not None:
+        transaction_count = state["planned"]
     else:
-        transaction_count = tc
+        tc = config_json.get("transactionCount", 1)
+        if isinstance(tc, list) and len(tc) == 2:
+            transaction_count = random.randint(tc[0], tc[1])
+        else:
+            transaction_count = tc
+        checkpoint.start(address, transaction_count)
+    completed = checkpoint.completed(address)
+    if completed:
+        logger.info(f"[{address}] Продолжаю с чекпоинта: выполнено {len(completed)}/{transaction_count} транзакций")
 
     tx_index = 1
     while tx_index <= transaction_count:
+        if tx_index in completed:
+            tx_index += 1
+            continue
         source_net_slug, from_symbol = random.choice(valid_source_pairs)
         dest_net_slug = random.choice(destination_networks)
         to_symbol = random.choice(to_tokens)
@@ -606,77 +732,84 @@ async def process_one_account(
         if get_token_for_network(dest_net_slug, to_symbol, tokens_data) is None:
             logger.info(f"[{address}] Токен {to_symbol} не найден в сети {dest_net_slug}. Выбираю другую пару.")
             continue
-        await process_one_transaction(
-            address, _priv, tx_index, transaction_count,
-            networks_data, tokens_data,
-            source_net_slug, from_symbol,
-            dest_net_slug, to_symbol,
-            min_pct, max_pct,
-            config_json.get("transactionDelay", [5, 5])
-        )
+        with tracer.span("transaction", account=address, network=source_net_slug,
+                         destination_network=dest_net_slug, tx_index=tx_index, mode="swap"):
+            status = await process_one_transaction(
+                address, _priv, tx_index, transaction_count,
+                networks_data, tokens_data,
+                source_net_slug, from_symbol,
+                dest_net_slug, to_symbol,
+                min_pct, max_pct,
+                config_json.get("transactionDelay", [5, 5]),
+                checkpoint
+            )
+        checkpoint.mark_done(address, tx_index, status)
         tx_index += 1
+    checkpoint.finish(address)
     logger.info(f"[{address}] Завершил обработку аккаунта")
 
 async def check_balances(accounts, networks_data, tokens_data, source_networks, from_tokens):
     logger.info("Начинаю проверку балансов...")
     use_proxy = config_json.get("useProxy", False)
-    balances_data = {}
+    chunk_size = config_json.get("balanceAccountsChunk", 500)
 
-    for address, _priv in accounts:
-        balances_data[address] = {}
-        balance_summary = []
-        print(f"[{address}] Проверка баланса для аккаунта")
-        for net_slug in source_networks:
-            net_info = get_network_by_slug(net_slug, networks_data)
-            if not net_info:
-                logger.error(f"Сеть {net_slug} не найдена в конфигурации")
+    # Колонки известны заранее: (сеть, токен) из конфига, найденные в tokens.json
+    clients = {}
+    network_tokens = {}
+    for net_slug in source_networks:
+        net_info = get_network_by_slug(net_slug, networks_data)
+        if not net_info:
+            logger.error(f"Сеть {net_slug} не найдена в конфигурации")
+            continue
+        clients[net_slug] = await client_registry.get_client(net_slug, net_info, use_proxy)
+        network_tokens[net_slug] = []
+        for token_symbol in from_tokens:
+            token_obj = get_token_for_network(net_slug, token_symbol, tokens_data)
+            if not token_obj:
+                print(f"Токен {token_symbol} не найден в сети {net_slug}")
                 continue
+            network_tokens[net_slug].append(token_obj)
 
-            client = Client(
-                network_slug=net_slug,
-                rpc_url=net_info["rpc_url"],
-                chain_id=net_info["chain_id"],
-                txn_explorer_url=net_info.get("txn_explorer_url", ""),
-                use_proxy=use_proxy
-            )
-            if use_proxy:
-                pass
-
-            for token_symbol in from_tokens:
-                token_obj = get_token_for_network(net_slug, token_symbol, tokens_data)
-                if not token_obj:
-                    print(f"[{address}] Токен {token_symbol} не найден в сети {net_slug}")
-                    continue
-
-                balance = await get_token_balance(client, address, token_obj)
-                net_name = network_names.get(net_slug, net_slug)
-                balances_data[address][f"{net_name}_{token_symbol}"] = balance
-                balance_summary.append(f"{net_name}: {balance:.6f} {token_symbol}")
+    all_columns = sorted(
+        f"{network_names.get(net_slug, net_slug)}_{token_obj.symbol}"
+        for net_slug, tokens in network_tokens.items()
+        for token_obj in tokens
+    )
 
-        summary = f"[{address}] - {'; '.join(balance_summary)}"
-        print(summary)
-        await asyncio.sleep(1)
+    async def fetch_network(net_slug, chunk):
+        requests_list = [(address, token_obj) for address, _ in chunk for token_obj in network_tokens[net_slug]]
+        balances = await balance_engine.get_balances(clients[net_slug], requests_list)
+        return net_slug, requests_list, balances
 
     current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    all_columns = set()
-    for balances in balances_data.values():
-        all_columns.update(balances.keys())
-    all_columns = sorted(list(all_columns))
-
     fieldnames = ["Date", "WalletAddress"] + all_columns
     with open("balances.csv", "w", newline="", encoding="utf-8-sig") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';')
         writer.writeheader()
-        for address, balances in balances_data.items():
-            row = {"WalletAddress": address, "Date": current_date}
-            for col in all_columns:
-                balance = balances.get(col, 0.0)
-                row[col] = f"{balance:.6f}"
-            writer.writerow(row)
+        for start in range(0, len(accounts), chunk_size):
+            chunk = accounts[start:start + chunk_size]
+            results = await asyncio.gather(*(fetch_network(net_slug, chunk) for net_slug in network_tokens))
+
+            balances_data = {address: {} for address, _ in chunk}
+            balance_summary = {address: [] for address, _ in chunk}
+            for net_slug, requests_list, balances in results:
+                net_name = network_names.get(net_slug, net_slug)
+                for (address, token_obj), balance in zip(requests_list, balances):
+                    balances_data[address][f"{net_name}_{token_obj.symbol}"] = balance
+                    balance_summary[address].append(f"{net_name}: {balance:.6f} {token_obj.symbol}")
+
+            for address, _ in chunk:
+                print(f"[{address}] - {'; '.join(balance_summary[address])}")
+                row = {"WalletAddress": address, "Date": current_date}
+                for col in all_columns:
+                    row[col] = f"{balances_data[address].get(col, 0.0):.6f}"
+                writer.writerow(row)
+            f.flush()
 
+    dump_metrics("balances_")
     print("Проверка балансов завершена! Результаты сохранены в balances.csv")
 
-async def swap_process(accounts, networks_data, tokens_data):
+async def swap_process(accounts, networks_data, tokens_data, resume=False):
     try:
         validate_networks(config_json)
     except ValueError as e:
@@ -693,68 +826,48 @@ async def swap_process(accounts, networks_data, tokens_data):
     account_delay_config = config_json.get("delayBetweenAccounts", [10, 10])
     concurrency = config_json.get("threads", 1)
 
+    await prefetch_prices(from_tokens)
+    await prefetch_allowances(accounts, networks_data, source_networks, from_tokens)
+    checkpoint = CheckpointStore.open("swap", resume, config_json.get("checkpointDir", "data/checkpoints"))
+    use_journal_session(checkpoint.bind_session(journal.session_id))
     semaphore = asyncio.Semaphore(concurrency)
 
     async def handle_account_with_sema(acc):
         async with semaphore:
-            await process_one_account(
-                acc,
-                networks_data,
-                tokens_data,
-                source_networks,
-                destination_networks,
-                from_tokens,
-                to_tokens,
-                min_pct,
-                max_pct,
-                transaction_delay_config,
-                account_delay_config
-            )
+            concurrency_slot.set(semaphore)
+            metrics.gauge_add("accounts_in_progress", 1)
+            try:
+                await process_one_account(
+                    acc,
+                    networks_data,
+                    tokens_data,
+                    source_networks,
+                    destination_networks,
+                    from_tokens,
+                    to_tokens,
+                    min_pct,
+                    max_pct,
+                    transaction_delay_config,
+                    account_delay_config,
+                    checkpoint
+                )
+            finally:
+                metrics.gauge_add("accounts_in_progress", -1)
 
     tasks = [asyncio.create_task(handle_account_with_sema(acc)) for acc in accounts]
-    await asyncio.gather(*tasks, return_exceptions=True)
-
-    current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    all_pairs = set()
-    for wal, info in stats.items():
-        for pair_nt in info["net_token_dollars"]:
-            all_pairs.add(pair_nt)
-    col_names = [f"{net_slug}-{token_sym}" for (net_slug, token_sym) in all_pairs]
-    col_names.sort()
-
-    fieldnames_summary = ["Date", "WalletAddress", "TotalTransactions"] + col_names
-    with open("summary.csv", "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames_summary, delimiter=';')
-        writer.writeheader()
-        for wal, info in stats.items():
-            row = {"WalletAddress": wal, "TotalTransactions": info["transactions_count"], "Date": current_date}
-            for (net_slug, token_sym) in all_pairs:
-                col_name = f"{net_slug}-{token_sym}"
-                usd_amount = info["net_token_dollars"].get((net_slug, token_sym), 0.0)
-                row[col_name] = f"{usd_amount:.2f}$"
-            writer.writerow(row)
-
-    if successful_transactions:
-        fieldnames_success = ["WalletAddress", "TransactionIndex", "SourceNetwork", "FromToken",
-                              "DestinationNetwork", "ToToken", "Amount", "USDVolume", "Status", "Error"]
-        with open("successful_transactions.csv", "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames_success, delimiter=';')
-            writer.writeheader()
-            for row in successful_transactions:
-                writer.writerow(row)
+    try:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        checkpoint.close()
 
-    if failed_transactions:
-        fieldnames_failed = ["WalletAddress", "TransactionIndex", "SourceNetwork", "FromToken",
-                             "DestinationNetwork", "ToToken", "Amount", "USDVolume", "Status", "Error"]
-        with open("failed_transactions.csv", "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames_failed, delimiter=';')
-            writer.writeheader()
-            for row in failed_transactions:
-                writer.writerow(row)
+    journal.write_reports("")
+    dump_metrics("")
+    tracer.flush()
 
+    log_quote_latency()
     logger.info("Готово! Итоги сохранены в summary.csv, successful_transactions.csv и failed_transactions.csv.")
 
-async def circular_swap_process(accounts, networks_data, tokens_data):
+async def circular_swap_process(accounts, networks_data, tokens_data, resume=False, end_network=None, final_token=None):
     logger.info("Запуск кругового прогона свапов...")
     source_networks = config_json["sourceNetworks"]
     from_tokens = config_json["fromTokens"]
@@ -765,15 +878,18 @@ async def circular_swap_process(accounts, networks_data, tokens_data):
     concurrency = config_json.get("threads", 1)
     circular_rounds = config_json.get("circularRounds", 1)
 
-    print("\nНастройки кругового прогона:")
-    print(f"Доступные сети: {source_networks}")
-    end_network = input("Введите конечную сеть для всех токенов: ").strip()
+    if end_network is None or final_token is None:
+        print("\nНастройки кругового прогона:")
+    if end_network is None:
+        print(f"Доступные сети: {source_networks}")
+        end_network = input("Введите конечную сеть для всех токенов: ").strip()
     if end_network not in source_networks:
         logger.error("Указанная конечная сеть отсутствует в sourceNetworks")
         return
 
-    print(f"Доступные токены для прогона: {to_tokens}")
-    final_token = input("Введите токен, который будет использоваться в прогоне: ").strip()
+    if final_token is None:
+        print(f"Доступные токены для прогона: {to_tokens}")
+        final_token = input("Введите токен, который будет использоваться в прогоне: ").strip()
     if final_token not in to_tokens:
         logger.error(f"Токен {final_token} не найден в toTokens")
         return
@@ -781,13 +897,93 @@ async def circular_swap_process(accounts, networks_data, tokens_data):
     logger.info(f"Конечная сеть: {end_network}, токен для прогона: {final_token}")
     logger.info(f"Количество кругов из конфига: {circular_rounds}")
 
+    await prefetch_prices([final_token])
+    await prefetch_allowances(accounts, networks_data, source_networks, [final_token])
+    checkpoint = CheckpointStore.open(
+        "circular", resume, config_json.get("checkpointDir", "data/checkpoints"),
+        params={"end_network": end_network, "final_token": final_token, "rounds": circular_rounds}
+    )
+    use_journal_session(checkpoint.bind_session(journal.session_id))
     semaphore = asyncio.Semaphore(concurrency)
 
     async def process_account_with_sema(address, _priv):
         async with semaphore:
-            await process_account_circular(address, _priv, networks_data, tokens_data, source_networks, end_network, final_token, circular_rounds, min_pct, max_pct, transaction_delay_config, account_delay_config)
+            concurrency_slot.set(semaphore)
+            if checkpoint.is_finished(address):
+                logger.info(f"[{address}] Круговой прогон уже завершён в прошлом запуске, пропускаю")
+                return
+            metrics.gauge_add("accounts_in_progress", 1)
+            try:
+                await reconcile_pending_tx(address, checkpoint, networks_data)
+                await process_account_circular(address, _priv, networks_data, tokens_data, source_networks, end_network, final_token, circular_rounds, min_pct, max_pct, transaction_delay_config, account_delay_config)
+            finally:
+                metrics.gauge_add("accounts_in_progress", -1)
 
     async def process_account_circular(address, _priv, networks_data, tokens_data, source_networks, end_network, final_token, circular_rounds, min_pct, max_pct, transaction_delay_config, account_delay_config):
+        state = checkpoint.get(address)
+        if state is not None and "circular" in state:
+            saved = state["circular"]
+            network_order = saved["order"]
+            start_round, start_position, tx_index = saved["round"], saved["position"], saved["tx_index"]
+            # Последний хоп уже сверен с сетью - не повторяем его
+            if tx_index in checkpoint.completed(address):
+                start_position += 1
+                tx_index += 1
+            total_tx_count = state["planned"]
+            logger.info(f"[{address}] Продолжаю круговой прогон с чекпоинта: круг {start_round + 1}, шаг {start_position + 1}, порядок сетей {network_order}")
+        else:
+            network_order = await plan_circular_order(address, networks_data, tokens_data, source_networks, end_network, final_token)
+            start_round, start_position, tx_index = 0, 0, 1
+            total_tx_count = circular_rounds * (len(network_order) - 1)
+            checkpoint.start(address, total_tx_count)
+            checkpoint.set_circular(address, network_order, start_round, start_position, tx_index)
+        logger.info(f"[{address}] Всего транзакций в круговом прогоне: {total_tx_count}")
+
+        for round in range(start_round, circular_rounds):
+            logger.info(f"[{address}] Начинаю круг {round + 1} из {circular_rounds}")
+            for i in range(start_position if round == start_round else 0, len(network_order) - 1):
+                source_net_slug = network_order[i]
+                dest_net_slug = network_order[i + 1]
+                client = await client_registry.get_client(
+                    source_net_slug,
+                    get_network_by_slug(source_net_slug, networks_data),
+                    config_json.get("useProxy", False)
+                )
+                token_obj = get_token_for_network(source_net_slug, final_token, tokens_data)
+                if not token_obj:
+                    logger.error(f"[{address}] Токен {final_token} не найден в сети {source_net_slug}")
+                    checkpoint.set_circular(address, network_order, round, i + 1, tx_index)
+                    continue
+                balance = await get_token_balance(client, address, token_obj)
+                if balance <= 0:
+                    logger.info(f"[{address}] Баланс {final_token} в сети {source_net_slug} равен 0, пропускаю транзакцию")
+                    checkpoint.set_circular(address, network_order, round, i + 1, tx_index)
+                    continue
+
+                logger.info(f"[{address}] Выполняю транзакцию {tx_index}/{total_tx_count} в круге {round + 1} ({source_net_slug} -> {dest_net_slug})")
+                with tracer.span("transaction", account=address, network=source_net_slug,
+                                 destination_network=dest_net_slug, tx_index=tx_index, mode="circular"):
+                    status = await process_one_transaction(
+                        address, _priv, tx_index, total_tx_count,
+                        networks_data, tokens_data,
+                        source_net_slug, final_token,
+                        dest_net_slug, final_token,
+                        min_pct, max_pct,
+                        transaction_delay_config,
+                        checkpoint
+                    )
+                checkpoint.mark_done(address, tx_index, status)
+                tx_index += 1
+                checkpoint.set_circular(address, network_order, round, i + 1, tx_index)
+
+            logger.info(f"[{address}] Завершил круг {round + 1} из {circular_rounds}")
+
+        checkpoint.finish(address)
+        delay_wallet = get_random_delay(account_delay_config, "account")
+        logger.info(f"[{address}] Завершил круговой прогон. Задержка между аккаунтами: {delay_wallet:.2f} сек.")
+        await asyncio.sleep(delay_wallet)
+
+    async def plan_circular_order(address, networks_data, tokens_data, source_networks, end_network, final_token):
         balances = {}
         use_proxy = config_json.get("useProxy", False)
         for net_slug in source_networks:
@@ -795,13 +991,7 @@ async def circular_swap_process(accounts, networks_data, tokens_data):
             if not net_info:
                 logger.error(f"[{address}] Сеть {net_slug} не найдена в конфигурации")
                 continue
-            client = Client(
-                network_slug=net_slug,
-                rpc_url=net_info["rpc_url"],
-                chain_id=net_info["chain_id"],
-                txn_explorer_url=net_info.get("txn_explorer_url", ""),
-                use_proxy=use_proxy
-            )
+            client = await client_registry.get_client(net_slug, net_info, use_proxy)
             token_obj = get_token_for_network(net_slug, final_token, tokens_data)
             if not token_obj:
                 logger.info(f"[{address}] Токен {final_token} не найден в сети {net_slug}, баланс считается 0")
@@ -820,90 +1010,19 @@ async def circular_swap_process(accounts, networks_data, tokens_data):
         network_order.extend(remaining_networks)
         network_order.append(end_network)
         logger.info(f"[{address}] Случайный порядок сетей для кругового прогона: {network_order}")
-
-        tx_index = 1
-        total_tx_count = circular_rounds * (len(network_order) - 1)
-        logger.info(f"[{address}] Всего транзакций в круговом прогоне: {total_tx_count}")
-
-        for round in range(circular_rounds):
-            logger.info(f"[{address}] Начинаю круг {round + 1} из {circular_rounds}")
-            for i in range(len(network_order) - 1):
-                source_net_slug = network_order[i]
-                dest_net_slug = network_order[i + 1]
-                client = Client(
-                    network_slug=source_net_slug,
-                    rpc_url=get_network_by_slug(source_net_slug, networks_data)["rpc_url"],
-                    chain_id=get_network_by_slug(source_net_slug, networks_data)["chain_id"],
-                    txn_explorer_url=get_network_by_slug(source_net_slug, networks_data).get("txn_explorer_url", ""),
-                    use_proxy=config_json.get("useProxy", False)
-                )
-                token_obj = get_token_for_network(source_net_slug, final_token, tokens_data)
-                if not token_obj:
-                    logger.error(f"[{address}] Токен {final_token} не найден в сети {source_net_slug}")
-                    continue
-                balance = await get_token_balance(client, address, token_obj)
-                if balance <= 0:
-                    logger.info(f"[{address}] Баланс {final_token} в сети {source_net_slug} равен 0, пропускаю транзакцию")
-                    continue
-
-                logger.info(f"[{address}] Выполняю транзакцию {tx_index}/{total_tx_count} в круге {round + 1} ({source_net_slug} -> {dest_net_slug})")
-                await process_one_transaction(
-                    address, _priv, tx_index, total_tx_count,
-                    networks_data, tokens_data,
-                    source_net_slug, final_token,
-                    dest_net_slug, final_token,
-                    min_pct, max_pct,
-                    transaction_delay_config
-                )
-                tx_index += 1
-
-            logger.info(f"[{address}] Завершил круг {round + 1} из {circular_rounds}")
-
-        delay_wallet = get_random_delay(account_delay_config)
-        logger.info(f"[{address}] Завершил круговой прогон. Задержка между аккаунтами: {delay_wallet:.2f} сек.")
-        await asyncio.sleep(delay_wallet)
+        return network_order
 
     tasks = [asyncio.create_task(process_account_with_sema(address, _priv)) for address, _priv in accounts]
-    await asyncio.gather(*tasks, return_exceptions=True)
-
-    current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    all_pairs = set()
-    for wal, info in stats.items():
-        for pair_nt in info["net_token_dollars"]:
-            all_pairs.add(pair_nt)
-    col_names = [f"{net_slug}-{token_sym}" for (net_slug, token_sym) in all_pairs]
-    col_names.sort()
-
-    fieldnames_summary = ["Date", "WalletAddress", "TotalTransactions"] + col_names
-    with open("circular_summary.csv", "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames_summary, delimiter=';')
-        writer.writeheader()
-        for wal, info in stats.items():
-            row = {"WalletAddress": wal, "TotalTransactions": info["transactions_count"], "Date": current_date}
-            for (net_slug, token_sym) in all_pairs:
-                col_name = f"{net_slug}-{token_sym}"
-                usd_amount = info["net_token_dollars"].get((net_slug, token_sym), 0.0)
-                row[col_name] = f"{usd_amount:.2f}$"
-            writer.writerow(row)
-
-    if successful_transactions:
-        fieldnames_success = ["WalletAddress", "TransactionIndex", "SourceNetwork", "FromToken",
-                              "DestinationNetwork", "ToToken", "Amount", "USDVolume", "Status", "Error"]
-        with open("circular_successful_transactions.csv", "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames_success, delimiter=';')
-            writer.writeheader()
-            for row in successful_transactions:
-                writer.writerow(row)
+    try:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        checkpoint.close()
 
-    if failed_transactions:
-        fieldnames_failed = ["WalletAddress", "TransactionIndex", "SourceNetwork", "FromToken",
-                             "DestinationNetwork", "ToToken", "Amount", "USDVolume", "Status", "Error"]
-        with open("circular_failed_transactions.csv", "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames_failed, delimiter=';')
-            writer.writeheader()
-            for row in failed_transactions:
-                writer.writerow(row)
+    journal.write_reports("circular_")
+    dump_metrics("circular_")
+    tracer.flush()
 
+    log_quote_latency()
     logger.info("Круговой прогон завершен! Итоги сохранены в circular_summary.csv, circular_successful_transactions.csv и circular_failed_transactions.csv.")
 
 async def withdraw_to_exchange(accounts, networks_data, tokens_data, exchange_wallets):
@@ -926,6 +1045,7 @@ async def withdraw_to_exchange(accounts, networks_data, tokens_data, exchange_wa
         logger.error(f"Токен вывода {withdraw_token} не найден в toTokens")
         return
 
+    await prefetch_prices([withdraw_token])
     total_accounts = len(accounts)
     total_exchanges = len(exchange_wallets)
     logger.info(f"Количество аккаунтов: {total_accounts}, количество биржевых кошельков: {total_exchanges}")
@@ -934,12 +1054,10 @@ async def withdraw_to_exchange(accounts, networks_data, tokens_data, exchange_wa
         exchange_wallet = exchange_wallets[idx % total_exchanges]
         logger.info(f"[{address}] Начинаю вывод на биржу {exchange_wallet}")
 
-        client = Client(
-            network_slug=source_network,
-            rpc_url=get_network_by_slug(source_network, networks_data)["rpc_url"],
-            chain_id=get_network_by_slug(source_network, networks_data)["chain_id"],
-            txn_explorer_url=get_network_by_slug(source_network, networks_data).get("txn_explorer_url", ""),
-            use_proxy=config_json.get("useProxy", False)
+        client = await client_registry.get_client(
+            source_network,
+            get_network_by_slug(source_network, networks_data),
+            config_json.get("useProxy", False)
         )
         token_obj = get_token_for_network(source_network, withdraw_token, tokens_data)
         if not token_obj:
@@ -964,87 +1082,102 @@ async def withdraw_to_exchange(accounts, networks_data, tokens_data, exchange_wa
             amount_to_withdraw, transaction_delay_config
         )
 
-        delay_wallet = get_random_delay(account_delay_config)
+        delay_wallet = get_random_delay(account_delay_config, "account")
         logger.info(f"[{address}] Завершил вывод на биржу. Задержка между аккаунтами: {delay_wallet:.2f} сек.")
         await asyncio.sleep(delay_wallet)
 
-    current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    all_pairs = set()
-    for wal, info in stats.items():
-        for pair_nt in info["net_token_dollars"]:
-            all_pairs.add(pair_nt)
-    col_names = [f"{net_slug}-{token_sym}" for (net_slug, token_sym) in all_pairs]
-    col_names.sort()
-
-    fieldnames_summary = ["Date", "WalletAddress", "TotalTransactions"] + col_names
-    with open("withdraw_summary.csv", "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames_summary, delimiter=';')
-        writer.writeheader()
-        for wal, info in stats.items():
-            row = {"WalletAddress": wal, "TotalTransactions": info["transactions_count"], "Date": current_date}
-            for (net_slug, token_sym) in all_pairs:
-                col_name = f"{net_slug}-{token_sym}"
-                usd_amount = info["net_token_dollars"].get((net_slug, token_sym), 0.0)
-                row[col_name] = f"{usd_amount:.2f}$"
-            writer.writerow(row)
-
-    if successful_transactions:
-        fieldnames_success = ["WalletAddress", "TransactionIndex", "SourceNetwork", "FromToken",
-                              "DestinationNetwork", "ToToken", "Amount", "USDVolume", "Status", "Error"]
-        with open("withdraw_successful_transactions.csv", "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames_success, delimiter=';')
-            writer.writeheader()
-            for row in successful_transactions:
-                writer.writerow(row)
-
-    if failed_transactions:
-        fieldnames_failed = ["WalletAddress", "TransactionIndex", "SourceNetwork", "FromToken",
-                             "DestinationNetwork", "ToToken", "Amount", "USDVolume", "Status", "Error"]
-        with open("withdraw_failed_transactions.csv", "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames_failed, delimiter=';')
-            writer.writeheader()
-            for row in failed_transactions:
-                writer.writerow(row)
+    journal.write_reports("withdraw_")
+    dump_metrics("withdraw_")
 
     logger.info("Вывод на биржу завершен! Итоги сохранены в withdraw_summary.csv, withdraw_successful_transactions.csv и withdraw_failed_transactions.csv.")
 
-async def main():
-    global tokens_data, stats, successful_transactions, failed_transactions, config_json
+async def run_mode(mode, accounts, networks_data, tokens_data, resume=False, end_network=None, final_token=None):
+    if mode == "deposit":
+        # ccxt импортируется только для ввода с биржи
+        from core.deposit_from_exchange import deposit_from_exchange
+        await deposit_from_exchange(accounts, config_json, journal)
+        dump_metrics("deposit_")
+        return
+
+    init_chain_stack()
+    if mode == "balances":
+        await check_balances(accounts, networks_data, tokens_data, config_json["sourceNetworks"], config_json["fromTokens"])
+    elif mode == "swap":
+        await swap_process(accounts, networks_data, tokens_data, resume)
+    elif mode == "circular":
+        await circular_swap_process(accounts, networks_data, tokens_data, resume, end_network, final_token)
+    elif mode == "withdraw":
+        exchange_wallets = load_exchange_wallets("data/exchange_wallets.txt")
+        await withdraw_to_exchange(accounts, networks_data, tokens_data, exchange_wallets)
+
+async def main(mode=None, config_path="data/config_bridge.json", resume=False, end_network=None, final_token=None):
+    global tokens_data, journal
+    load_config(config_path)
+    journal = TransactionJournal.open(
+        backend=config_json.get("journalBackend", "jsonl"),
+        path=config_json.get("journalPath")
+    )
+    logger.info(f"Журнал транзакций: сессия {journal.session_id}")
     networks_data = load_networks()
     tokens_json = load_json("extra/cfg/tokens.json")
-    tokens_data = tokens_json["network_token"]
+    tokens_data = TokenRegistry(tokens_json["network_token"])
     accounts = load_accounts("data/accounts.txt")
-    exchange_wallets = load_exchange_wallets("data/exchange_wallets.txt")
     random.shuffle(accounts)
-    source_networks = config_json["sourceNetworks"]
-    from_tokens = config_json["fromTokens"]
+    if config_json.get("metricsPort"):
+        await metrics.start_server(config_json["metricsPort"])
 
-    await check_rpc_health(networks_data)
-
-    while True:
-        print("\nМеню:")
-        print("1. Проверить баланс во всех сетях и токенах")
-        print("2. Запустить процесс свапа")
-        print("3. Круговой прогон свапов")
-        print("4. Вывод на биржу")
-        print("5. Ввод с биржи")
-        print("6. Выйти")
-        choice = input("Выберите опцию (1-6): ")
-
-        if choice == "1":
-            await check_balances(accounts, networks_data, tokens_data, source_networks, from_tokens)
-        elif choice == "2":
-            await swap_process(accounts, networks_data, tokens_data)
-        elif choice == "3":
-            await circular_swap_process(accounts, networks_data, tokens_data)
-        elif choice == "4":
-            await withdraw_to_exchange(accounts, networks_data, tokens_data, exchange_wallets)
-        elif choice == "5":
-            await deposit_from_exchange(accounts, config_json, stats, successful_transactions, failed_transactions)
-        elif choice == "6":
-            break
-        else:
-            print("Неверный выбор, попробуйте снова.")
+    try:
+        if mode is not None:
+            if mode != "deposit":
+                await check_rpc_health(networks_data)
+            await run_mode(mode, accounts, networks_data, tokens_data, resume, end_network, final_token)
+            return
+
+        await check_rpc_health(networks_data)
+        menu_modes = {"1": "balances", "2": "swap", "3": "circular", "4": "withdraw", "5": "deposit"}
+        while True:
+            print("\nМеню:")
+            print("1. Проверить баланс во всех сетях и токенах")
+            print("2. Запустить процесс свапа")
+            print("3. Круговой прогон свапов")
+            print("4. Вывод на биржу")
+            print("5. Ввод с биржи")
+            print("6. Выйти")
+            choice = input("Выберите опцию (1-6): ")
+
+            if choice in menu_modes:
+                await run_mode(menu_modes[choice], accounts, networks_data, tokens_data, resume)
+            elif choice == "6":
+                break
+            else:
+                print("Неверный выбор, попробуйте снова.")
+    finally:
+        # Сбрасываем буфер журнала и при Ctrl-C/аварийном выходе
+        journal.close()
+        if client_registry is not None:
+            from core.signer import signer
+            signer.close()
+            await client_registry.close()
+        await lifi_client.close()
+        await price_cache.close()
+        await metrics.stop_server()
+        tracer.flush()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=MODES, help="запустить режим без меню: " + ", ".join(MODES))
+    parser.add_argument("--config", default="data/config_bridge.json", help="путь к config_bridge.json")
+    parser.add_argument("--end-network", help="конечная сеть для кругового прогона")
+    parser.add_argument("--final-token", help="токен для кругового прогона")
+    parser.add_argument("--resume", action="store_true", help="продолжить прерванный прогон свапов с чекпоинта")
+    args = parser.parse_args()
+    if args.mode == "circular" and not (args.end_network and args.final_token):
+        # Режим без меню не должен останавливаться на input()
+        parser.error("--mode circular требует --end-network и --final-token")
+    asyncio.run(main(
+        mode=args.mode,
+        config_path=args.config,
+        resume=args.resume,
+        end_network=args.end_network,
+        final_token=args.final_token
+    ))
@@ -1,9 +1,50 @@
 
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import re
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from eth_account import Account
+from eth_account.hdaccount.mnemonic import Language, Mnemonic
 from eth_account.signers.local import LocalAccount
-from solders.keypair import Keypair
-from mnemonic import Mnemonic
-from hdwallets import BIP32
+from eth_utils import to_checksum_address
+
+logger = logging.getLogger(__name__)
+
+Account.enable_unaudited_hdwallet_features()
+
+HEX_KEY_RE = re.compile(r"^(0x)?[0-9a-fA-F]{64}$")
+EVM_ADDRESS_RE = re.compile(r"^0x[0-9a-fA-F]{40}$")
+BASE58_KEY_RE = re.compile(r"^[1-9A-HJ-NP-Za-km-z]{86,88}$")
+MNEMONIC_WORD_COUNTS = {12, 15, 18, 21, 24}
+
+ACCOUNTS_CACHE_PATH = "data/accounts_cache.json"
+# Меньше этого числа выводов пул процессов не окупает свой запуск
+POOL_MIN_DERIVATIONS = 32
+NONCE_SIZE = 12
+
+
+def classify_secret(account_data: str) -> str | None:
+    # Тип ключевого материала по синтаксису, без дорогих PBKDF2/BIP32:
+    # "evm_key", "mnemonic" (EVM или Solana), "solana_key" или None
+    account_data = account_data.strip()
+    if HEX_KEY_RE.match(account_data):
+        return "evm_key"
+    words = account_data.split()
+    if len(words) in MNEMONIC_WORD_COUNTS and all(word.isalpha() and word.islower() for word in words):
+        # Проверка слов по словарю и контрольной суммы - один sha256
+        return "mnemonic" if Mnemonic(Language.ENGLISH).is_mnemonic_valid(" ".join(words)) else None
+    if BASE58_KEY_RE.match(account_data):
+        return "solana_key"
+    return None
 
 
 def evm_check_private_key(account_data: str) -> tuple[bool, LocalAccount | None]:
@@ -22,7 +63,8 @@ def evm_check_mnemonic(account_data: str) -> tuple[bool, LocalAccount | None]:
         return False, None
 
 
-def solana_check_private_key(account_data: str) -> tuple[bool, Keypair | None]:
+def solana_check_private_key(account_data: str):
+    from solders.keypair import Keypair
     try:
         kp = Keypair.from_base58_string(account_data.strip())
         return True, kp
@@ -30,9 +72,12 @@ def solana_check_private_key(account_data: str) -> tuple[bool, Keypair | None]:
         return False, None
 
 
-def solana_check_mnemonic(account_data: str) -> tuple[bool, Keypair | None]:
+def solana_check_mnemonic(account_data: str):
+    from solders.keypair import Keypair
+    from mnemonic import Mnemonic as Bip39Mnemonic
+    from hdwallets import BIP32
     try:
-        seed = Mnemonic('english').to_seed(account_data)
+        seed = Bip39Mnemonic('english').to_seed(account_data)
         root = BIP32.from_seed(seed)
         path = "m/44'/501'/0'/0'"
         derived = root.get_privkey_from_path(path)
@@ -42,22 +87,156 @@ def solana_check_mnemonic(account_data: str) -> tuple[bool, Keypair | None]:
         return False, None
 
 
-def get_account(account_data: str) -> tuple[int, LocalAccount | Keypair | None]:
-
-    is_evm_mnemonic, evm_acc = evm_check_mnemonic(account_data)
-    if is_evm_mnemonic:
-        return (1, evm_acc)
+def get_account(account_data: str):
+    # (1, LocalAccount) для EVM, (2, Keypair) для Solana, (0, None) если формат не распознан
+    kind = classify_secret(account_data)
 
-    is_evm_pkey, evm_acc2 = evm_check_private_key(account_data)
-    if is_evm_pkey:
-        return (1, evm_acc2)
+    if kind == "mnemonic":
+        is_evm_mnemonic, evm_acc = evm_check_mnemonic(account_data)
+        if is_evm_mnemonic:
+            return (1, evm_acc)
+        is_sol_mnemonic, sol_kp = solana_check_mnemonic(account_data)
+        if is_sol_mnemonic:
+            return (2, sol_kp)
 
-    is_sol_pkey, sol_kp = solana_check_private_key(account_data)
-    if is_sol_pkey:
-        return (2, sol_kp)
+    if kind == "evm_key":
+        is_evm_pkey, evm_acc = evm_check_private_key(account_data)
+        if is_evm_pkey:
+            return (1, evm_acc)
 
-    is_sol_mnemonic, sol_kp2 = solana_check_mnemonic(account_data)
-    if is_sol_mnemonic:
-        return (2, sol_kp2)
+    if kind == "solana_key":
+        is_sol_pkey, sol_kp = solana_check_private_key(account_data)
+        if is_sol_pkey:
+            return (2, sol_kp)
 
     return (0, None)
+
+
+def _derive_evm(item: tuple[str, str]) -> tuple[str, str]:
+    # Выполняется в процессе пула: (тип, секрет) -> (адрес, приватный ключ)
+    kind, secret = item
+    account = Account.from_mnemonic(secret) if kind == "mnemonic" else Account.from_key(secret)
+    return account.address, "0x" + bytes(account.key).hex()
+
+
+class AccountCache:
+    # Выведенные адреса и ключи, зашифрованные AES-256-GCM ключом, производным от самого секрета (HKDF):
+    # запись ищется по HMAC-SHA256 секрета, и без исходной строки из accounts.txt файл бесполезен
+
+    def __init__(self, path: str = ACCOUNTS_CACHE_PATH):
+        self._path = path
+        self._entries: dict[str, str] = {}
+        self._dirty = False
+
+    @staticmethod
+    def _keys(secret: str) -> tuple[str, AESGCM]:
+        material = secret.strip().encode()
+        entry_id = hmac.new(material, b"accounts-cache-id", hashlib.sha256).hexdigest()
+        enc_key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"accounts-cache-enc").derive(material)
+        return entry_id, AESGCM(enc_key)
+
+    def load(self):
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            self._entries = {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Кэш аккаунтов {self._path} не прочитан ({e}), ключи будут выведены заново")
+            self._entries = {}
+        return self
+
+    def get(self, secret: str) -> tuple[str, str] | None:
+        entry_id, cipher = self._keys(secret)
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            return None
+        blob = bytes.fromhex(entry)
+        try:
+            plain = cipher.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], entry_id.encode())
+        except InvalidTag:
+            # Запись повреждена или из старого формата кэша - ключ будет выведен заново
+            return None
+        return to_checksum_address(plain[:20]), "0x" + plain[20:].hex()
+
+    def put(self, secret: str, address: str, private_key: str):
+        entry_id, cipher = self._keys(secret)
+        plain = bytes.fromhex(address[2:]) + bytes.fromhex(private_key.removeprefix("0x"))
+        nonce = secrets.token_bytes(NONCE_SIZE)
+        self._entries[entry_id] = (nonce + cipher.encrypt(nonce, plain, entry_id.encode())).hex()
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self._path)
+        self._dirty = False
+
+
+def load_accounts(file_path: str, cache_path: str | None = ACCOUNTS_CACHE_PATH, workers: int | None = None) -> list[tuple[str, str]]:
+    # Строки accounts.txt: "address,private_key", "private_key" или мнемоника (с адресом или без).
+    # Ключи и мнемоники без готового адреса выводятся в пуле процессов, результат кэшируется
+    rows: list[tuple[int, str | None, str, str]] = []
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line_no, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            parts = [part.strip() for part in line.split(",")]
+            if len(parts) == 2 and EVM_ADDRESS_RE.match(parts[0]):
+                address, secret = parts
+            elif len(parts) == 1:
+                address, secret = None, parts[0]
+            else:
+                raise ValueError(f"Строка {line_no} в {file_path}: формат должен быть 'address,private_key', 'private_key' или мнемоника")
+            kind = classify_secret(secret)
+            if kind is None and address is not None:
+                # Ключ при готовом адресе раньше не проверялся - оставляем как есть, его проверит подпись
+                kind = "evm_key"
+            if kind not in ("evm_key", "mnemonic"):
+                raise ValueError(f"Строка {line_no} в {file_path}: не удалось распознать приватный ключ EVM или мнемонику")
+            rows.append((line_no, address, kind, " ".join(secret.split()) if kind == "mnemonic" else secret))
+
+    cache = AccountCache(cache_path).load() if cache_path else None
+    accounts: list[tuple[str, str] | None] = [None] * len(rows)
+    to_derive: list[int] = []
+    cache_hits = 0
+    for i, (_, address, kind, secret) in enumerate(rows):
+        if kind == "evm_key" and address is not None:
+            accounts[i] = (to_checksum_address(address), secret)
+            continue
+        cached = cache.get(secret) if cache else None
+        if cached is not None:
+            accounts[i] = (cached[0], secret if kind == "evm_key" else cached[1])
+            cache_hits += 1
+        else:
+            to_derive.append(i)
+
+    if to_derive:
+        items = [(rows[i][2], rows[i][3]) for i in to_derive]
+        workers = min(4, os.cpu_count() or 1) if workers is None else workers
+        if len(items) >= POOL_MIN_DERIVATIONS and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                derived = list(pool.map(_derive_evm, items, chunksize=max(1, len(items) // (workers * 4))))
+        else:
+            derived = [_derive_evm(item) for item in items]
+        for i, (derived_address, private_key) in zip(to_derive, derived):
+            _, _, kind, secret = rows[i]
+            accounts[i] = (derived_address, secret if kind == "evm_key" else private_key)
+            if cache:
+                cache.put(secret, derived_address, private_key)
+        logger.info(f"Выведено ключей: {len(to_derive)}, из кэша: {cache_hits}")
+
+    for (line_no, address, _, _), (derived_address, _) in zip(rows, accounts):
+        if address is not None and address.lower() != derived_address.lower():
+            raise ValueError(f"Строка {line_no}: адрес {address} не соответствует ключу")
+
+    if cache:
+        cache.save()
+    return accounts
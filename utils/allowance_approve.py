@@ -1,6 +1,10 @@
 
 import logging
 from eth_typing import ChecksumAddress
+from core.tracing import tracer
+from core.allowance_cache import allowance_cache, approval_amount
+from core.gas_limits import gas_limits
+from core import erc20
 
 logger = logging.getLogger(__name__)
 
@@ -9,26 +13,49 @@ async def check_allowance_or_approve(
     token_amount,
     allowance_factor: float,
     spender_address: ChecksumAddress,
+    known_allowance: int | None = None,
+    approval_policy: str = "buffered",
 ):
 
     client = account_client.client
     account_address = account_client.address
-    network = client.network
-
-    token_allowance = await account_client.get_token_allowance(
-        token=token_amount.token,
-        spender_address=spender_address,
-    )
-
-    required_allowance = int(int(token_amount.Wei) * allowance_factor)
-
-    if token_allowance < required_allowance:
-        txn_hash = await account_client.approve_token_spend(
+    token_address = token_amount.token.address
+
+    # Allowance уже мог прийти в preflight-батче или из prefetch перед режимом
+    token_allowance = known_allowance
+    if token_allowance is None:
+        token_allowance = allowance_cache.get(client, account_address, token_address, spender_address)
+    if token_allowance is None:
+        token_allowance = await account_client.get_token_allowance(
             token=token_amount.token,
-            amount=required_allowance,
             spender_address=spender_address,
         )
+        allowance_cache.set(client, account_address, token_address, spender_address, token_allowance)
+
+    # Запас allowance_factor закладывается в сам approve (approvalPolicy), а не в проверку:
+    # оставшегося после прошлого approve allowance хватает, если он покрывает сумму
+    required_allowance = int(token_amount.Wei)
 
-        client.wait_for_transaction_receipt(txn_hash)
-    else:
-        pass
+    if token_allowance < required_allowance:
+        amount = approval_amount(approval_policy, required_allowance, allowance_factor)
+        try:
+            with tracer.span("approve_send", approval_policy=approval_policy):
+                txn_hash = await account_client.approve_token_spend(
+                    token=token_amount.token,
+                    amount=amount,
+                    spender_address=spender_address,
+                )
+
+            with tracer.span("approve_confirm", tx_hash=txn_hash):
+                receipt = await client.wait_for_transaction_receipt(txn_hash, kind="approve", sender=account_address)
+        except BaseException:
+            # Approve мог попасть в блок, несмотря на ошибку или таймаут - allowance перечитается из сети
+            allowance_cache.invalidate(client, account_address, token_address, spender_address)
+            raise
+        allowance_cache.update_from_receipt(client, receipt, account_address, token_address, spender_address, amount)
+        gas_limits.record(client, token_address, erc20.APPROVE_SELECTOR, receipt)
+        if receipt.get("status") != 1:
+            # Мост без allowance гарантированно откатится - не отправляем его
+            raise ValueError(f"Approve {txn_hash} откатился on-chain")
+        return True
+    return False
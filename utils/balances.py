@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from web3 import Web3
+from core import erc20
+from utils.multicall import aggregate3, get_multicall_address, MulticallUnavailableError
+
+logger = logging.getLogger(__name__)
+
+GET_ETH_BALANCE_SELECTOR = bytes.fromhex("4d2301cc")
+
+
+class BalanceEngine:
+    # Собирает нативные балансы (getEthBalance) и balanceOf в чанкованные Multicall3 вызовы.
+    # Одиночные get_balance, пришедшие в одном тике event loop, объединяются в один multicall.
+
+    def __init__(self, chunk_size: int = 200):
+        self._chunk_size = chunk_size
+        self._pending = {}
+        self._unsupported_networks = set()
+
+    def _build_call(self, client, address: str, token) -> tuple[str, bytes]:
+        if token.is_native:
+            return get_multicall_address(client.network.slug), GET_ETH_BALANCE_SELECTOR + erc20.address_word(address)
+        return token.address, erc20.balance_of_data(address)
+
+    async def _get_balance_direct(self, client, address: str, token) -> float:
+        web3 = client.web3
+        if token.is_native:
+            balance_wei = await web3.eth.get_balance(Web3.to_checksum_address(address))
+            return balance_wei / (10 ** token.decimals)
+        target, calldata = self._build_call(client, address, token)
+        try:
+            raw = await web3.eth.call({"to": Web3.to_checksum_address(target), "data": erc20.hex_data(calldata)})
+            return erc20.decode_uint(raw) / (10 ** token.decimals)
+        except Exception as e:
+            logger.error(f"Ошибка при получении баланса ERC20: {e}")
+            return 0
+
+    async def get_balances(self, client, requests: list[tuple[str, object]]) -> list[float]:
+        if not requests:
+            return []
+        slug = client.network.slug
+        if slug not in self._unsupported_networks:
+            calls = [self._build_call(client, address, token) for address, token in requests]
+            try:
+                results = await aggregate3(client, calls, self._chunk_size)
+            except MulticallUnavailableError as e:
+                logger.warning(f"{e}. Перехожу на одиночные запросы.")
+                self._unsupported_networks.add(slug)
+            except Exception as e:
+                logger.warning(f"Ошибка Multicall3 в сети {slug}, запрашиваю балансы по одному: {e}")
+            else:
+                balances = []
+                for (address, token), (success, return_data) in zip(requests, results):
+                    if not success or len(return_data) < 32:
+                        logger.error(f"Ошибка при получении баланса {token.symbol} для {address} в сети {slug}")
+                        balances.append(0)
+                        continue
+                    balances.append(erc20.decode_uint(return_data) / (10 ** token.decimals))
+                return balances
+        return list(await asyncio.gather(
+            *(self._get_balance_direct(client, address, token) for address, token in requests)
+        ))
+
+    async def _flush(self, client):
+        batch = self._pending.pop(client, [])
+        if not batch:
+            return
+        try:
+            balances = await self.get_balances(client, [(address, token) for address, token, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), balance in zip(batch, balances):
+            if not future.done():
+                future.set_result(balance)
+
+    async def get_balance(self, client, address: str, token) -> float:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(client, [])
+        batch.append((address, token, future))
+        if len(batch) == 1:
+            loop.call_soon(lambda: asyncio.ensure_future(self._flush(client)))
+        return await future
@@ -1,23 +1,102 @@
+import asyncio
+import json
+import time
 import aiohttp
 
+# Список стейблкоинов (верхний регистр для консистентности)
+STABLE_TOKENS = {"USDC", "USDT", "DAI", "USDC.E"}
+QUOTE_ASSETS = ("USDT", "USDC")
+TICKER_URL = "https://api.binance.com/api/v3/ticker/price"
+
+
+class TokenPriceCache:
+    # Цены всех нужных токенов одним запросом /ticker/price?symbols=[...], кэш с TTL
+    # и общая сессия; get_cached_price - синхронное чтение снимка для учёта объёмов
+
+    def __init__(self, ttl: float = 60):
+        self._ttl = ttl
+        self._prices: dict[str, tuple[float, float]] = {}
+        self._misses: dict[str, float] = {}
+        self._session: aiohttp.ClientSession | None = None
+        self._lock = asyncio.Lock()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        return self._session
+
+    def get_cached_price(self, token_symbol: str) -> float | None:
+        token_symbol = token_symbol.upper()
+        if token_symbol in STABLE_TOKENS:
+            return 1.0
+        cached = self._prices.get(token_symbol)
+        if cached is None or time.monotonic() - cached[1] > self._ttl:
+            return None
+        return cached[0]
+
+    async def _fetch_tickers(self, pairs: list[str]) -> dict[str, float]:
+        session = self._get_session()
+        params = {"symbols": json.dumps(pairs, separators=(",", ":"))}
+        async with session.get(TICKER_URL, params=params) as response:
+            data = await response.json(content_type=None)
+        if isinstance(data, list):
+            return {item["symbol"]: float(item["price"]) for item in data if "price" in item}
+
+        # Binance отклоняет весь запрос, если хотя бы одной пары нет - запрашиваем пары по одной
+        async def fetch_one(pair):
+            async with session.get(TICKER_URL, params={"symbol": pair}) as one_response:
+                item = await one_response.json(content_type=None)
+            return pair, float(item["price"]) if "price" in item else None
+
+        results = await asyncio.gather(*(fetch_one(pair) for pair in pairs), return_exceptions=True)
+        return {result[0]: result[1] for result in results if isinstance(result, tuple) and result[1] is not None}
+
+    def _recently_missed(self, token_symbol: str) -> bool:
+        missed_at = self._misses.get(token_symbol)
+        return missed_at is not None and time.monotonic() - missed_at < self._ttl
+
+    async def prefetch(self, token_symbols):
+        symbols = {symbol.upper() for symbol in token_symbols}
+        async with self._lock:
+            missing = [
+                symbol for symbol in symbols
+                if self.get_cached_price(symbol) is None and not self._recently_missed(symbol)
+            ]
+            if not missing:
+                return
+            tickers = await self._fetch_tickers([f"{symbol}{quote}" for symbol in missing for quote in QUOTE_ASSETS])
+            now = time.monotonic()
+            for symbol in missing:
+                for quote in QUOTE_ASSETS:
+                    price = tickers.get(f"{symbol}{quote}")
+                    if price is not None:
+                        self._prices[symbol] = (price, now)
+                        break
+                else:
+                    self._misses[symbol] = now
+
+    def seed(self, prices: dict[str, float]):
+        now = time.monotonic()
+        for symbol, price in prices.items():
+            self._prices[symbol.upper()] = (price, now)
+
+    async def get_price(self, token_symbol: str) -> float:
+        price = self.get_cached_price(token_symbol)
+        if price is None:
+            await self.prefetch([token_symbol])
+            price = self.get_cached_price(token_symbol)
+        if price is None:
+            raise ValueError(f"Не удалось получить цену для токена {token_symbol.upper()}")
+        return price
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+price_cache = TokenPriceCache()
+
+
 async def get_token_price(token_symbol: str) -> float:
-    token_symbol = token_symbol.upper()  # Приводим к верхнему регистру
-
-    # Список стейблкоинов
-    stable_tokens = ["USDC", "USDT", "DAI", "USDC.E"]  # Используем верхний регистр для консистентности
-    if token_symbol in stable_tokens:
-        return 1.0
-
-    # Если токен не в списке стейблкоинов, пробуем получить цену через Binance API
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f'https://api.binance.com/api/v3/ticker/price?symbol={token_symbol}USDT') as response:
-            data = await response.json()
-            if 'price' in data:
-                return float(data['price'])
-
-        async with session.get(f'https://api.binance.com/api/v3/ticker/price?symbol={token_symbol}USDC') as response:
-            data = await response.json()
-            if 'price' in data:
-                return float(data['price'])
-
-    raise ValueError(f"Не удалось получить цену для токена {token_symbol}")
\ No newline at end of file
+    return await price_cache.get_price(token_symbol)
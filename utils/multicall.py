@@ -0,0 +1,36 @@
+import asyncio
+from eth_abi import encode, decode
+from web3 import Web3
+from data.config import MULTICALL3_ADDRESS, MULTICALL3_ADDRESSES
+
+AGGREGATE3_SELECTOR = bytes.fromhex("82ad56cb")
+
+
+class MulticallUnavailableError(Exception):
+    pass
+
+
+def get_multicall_address(network_slug: str) -> str:
+    return Web3.to_checksum_address(MULTICALL3_ADDRESSES.get(network_slug, MULTICALL3_ADDRESS))
+
+
+async def aggregate3(client, calls: list[tuple[str, bytes]], chunk_size: int = 200) -> list[tuple[bool, bytes]]:
+    # calls: [(target, calldata)]; каждый чанк - один eth_call, чанки уходят параллельно
+    multicall_address = get_multicall_address(client.network.slug)
+
+    async def run_chunk(chunk):
+        data = AGGREGATE3_SELECTOR + encode(
+            ["(address,bool,bytes)[]"],
+            [[(Web3.to_checksum_address(target), True, calldata) for target, calldata in chunk]]
+        )
+        raw = await client.web3.eth.call({"to": multicall_address, "data": "0x" + data.hex()})
+        if not raw:
+            raise MulticallUnavailableError(f"Multicall3 не задеплоен по адресу {multicall_address} в сети {client.network.slug}")
+        results = decode(["(bool,bytes)[]"], raw)[0]
+        if len(results) != len(chunk):
+            raise ValueError(f"Multicall3 вернул {len(results)} результатов вместо {len(chunk)}")
+        return results
+
+    chunks = [calls[i:i + chunk_size] for i in range(0, len(calls), chunk_size)]
+    chunk_results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+    return [result for results in chunk_results for result in results]
@@ -16,6 +16,33 @@ try:
 except FileNotFoundError:
     print("Файл data/proxies.txt не найден, прокси не будут использоваться.")
 
+# aiohttp понимает только HTTP-прокси в параметре запроса; socks4/socks5 подключаются
+# коннектором сессии из aiohttp-socks
+SOCKS_PROXY_SCHEMES = ('socks4://', 'socks4a://', 'socks5://', 'socks5h://')
+AIOHTTP_PROXY_SCHEMES = ('http://', 'https://') + SOCKS_PROXY_SCHEMES
+
+def is_socks_proxy(proxy: str | None) -> bool:
+    return proxy is not None and proxy.lower().startswith(SOCKS_PROXY_SCHEMES)
+
+def unsupported_aiohttp_proxies() -> list[str]:
+    try:
+        import aiohttp_socks  # noqa: F401
+        schemes = AIOHTTP_PROXY_SCHEMES
+    except ImportError:
+        schemes = AIOHTTP_PROXY_SCHEMES[:2]
+    return [proxy for proxy in proxy_list if not proxy.lower().startswith(schemes)]
+
+def make_connector(proxy: str | None = None, **kwargs):
+    # Для socks-прокси - отдельная сессия на прокси, http(s) передаётся параметром proxy у запроса
+    if is_socks_proxy(proxy):
+        from aiohttp_socks import ProxyConnector
+        return ProxyConnector.from_url(proxy, **kwargs)
+    import aiohttp
+    return aiohttp.TCPConnector(**kwargs)
+
+def request_proxy(proxy: str | None) -> str | None:
+    return None if is_socks_proxy(proxy) else proxy
+
 def get_proxy() -> str | None:
     if proxy_list:
         return choice(proxy_list)
@@ -0,0 +1,99 @@
+import asyncio
+import time
+import aiohttp
+
+
+class ProbeResult:
+    def __init__(self, network_slug: str, rpc_url: str):
+        self.network_slug = network_slug
+        self.rpc_url = rpc_url
+        self.latencies: list[float] = []
+        self.head: int | None = None
+        self.lag: int | None = None
+        self.error: str | None = None
+
+    def percentile(self, pct: float) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+    @property
+    def p50(self):
+        return self.percentile(50)
+
+    @property
+    def p95(self):
+        return self.percentile(95)
+
+    @property
+    def healthy(self) -> bool:
+        return self.error is None and self.head is not None
+
+
+async def _probe_endpoint(session: aiohttp.ClientSession, network_slug: str, rpc_url: str, samples: int) -> ProbeResult:
+    result = ProbeResult(network_slug, rpc_url)
+    payload = {"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []}
+    # Замеры идут последовательно по одному keep-alive соединению, первый включает установку TLS
+    for _ in range(samples):
+        started = time.monotonic()
+        try:
+            async with session.post(rpc_url, json=payload) as response:
+                if response.status == 429:
+                    result.error = "Ошибка 429: Too Many Requests"
+                    return result
+                if response.status >= 400:
+                    result.error = f"Ошибка HTTP: {response.status}"
+                    return result
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            result.error = f"Ошибка: {type(e).__name__} {e}".strip()
+            return result
+        result.latencies.append(time.monotonic() - started)
+        if "result" not in data:
+            result.error = f"Ошибка RPC: {data.get('error')}"
+            return result
+        head = data["result"]
+        result.head = int(head, 16) if isinstance(head, str) else int(head)
+    return result
+
+
+async def probe_networks(candidates: dict[str, list[str]], samples: int = 3, timeout: float = 5,
+                         max_lag: int = 5) -> dict[str, list[ProbeResult]]:
+    # Все endpoint'ы всех сетей опрашиваются одновременно; результат - endpoint'ы каждой сети,
+    # отсортированные от лучшего: здоровые и не отстающие по p50, затем отстающие, затем с ошибками
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        results = await asyncio.gather(*(
+            _probe_endpoint(session, slug, rpc_url, samples)
+            for slug, rpc_urls in candidates.items()
+            for rpc_url in rpc_urls
+        ))
+
+    ranked: dict[str, list[ProbeResult]] = {slug: [] for slug in candidates}
+    for result in results:
+        ranked[result.network_slug].append(result)
+    for slug, network_results in ranked.items():
+        heads = [result.head for result in network_results if result.healthy]
+        best_head = max(heads, default=None)
+        for result in network_results:
+            if result.healthy:
+                result.lag = best_head - result.head
+        network_results.sort(key=lambda result: (
+            not result.healthy,
+            result.lag is None or result.lag > max_lag,
+            result.p50 if result.p50 is not None else float("inf")
+        ))
+    return ranked
+
+
+def format_probe_table(ranked: dict[str, list[ProbeResult]], network_names: dict[str, str] | None = None) -> str:
+    network_names = network_names or {}
+    lines = [f"{'Сеть':<16}{'p50, мс':>10}{'p95, мс':>10}{'Отставание':>12}  RPC"]
+    for slug, results in ranked.items():
+        for result in results:
+            name = network_names.get(slug, slug)
+            if result.healthy:
+                lines.append(f"{name:<16}{result.p50 * 1000:>10.0f}{result.p95 * 1000:>10.0f}{result.lag:>12}  {result.rpc_url}")
+            else:
+                lines.append(f"{name:<16}{'-':>10}{'-':>10}{'-':>12}  {result.rpc_url} ({result.error})")
+    return "\n".join(lines)